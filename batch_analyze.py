@@ -0,0 +1,208 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import pandas as pd
+from instrumentation import StageRecorder, recording, serve_metrics, stage, timed_iter
+from metrics_store import DEFAULT_STORE_PATH, MetricsStore
+from feature_matrix import chapter_frame
+from readability_utils import ChapterStream, get_sentence_tokenizer, iter_manuscript_lines
+from result_cache import DEFAULT_CACHE_PATH, open_cache
+
+SUPPORTED_EXTENSIONS = (".txt", ".docx")
+
+def find_manuscripts(inputs):
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                paths.extend(os.path.join(root, name) for name in files if name.lower().endswith(SUPPORTED_EXTENSIONS))
+        else:
+            paths.extend(p for p in glob.glob(item, recursive=True) if p.lower().endswith(SUPPORTED_EXTENSIONS))
+    return sorted(set(paths))
+
+def score_manuscript(path, cache_path=None, profile=False, trace_memory=False):
+    # Runs inside a pool worker: one manuscript, streamed chapter by chapter
+    # and scored a block of chapters at a time by feature_matrix, straight
+    # into a DataFrame. The returned StageRecorder holds the worker's stage
+    # timings; reading and parsing the file are recorded as
+    # parse_metadata_and_chapters.
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    recorder = StageRecorder(profile=profile, trace_memory=trace_memory)
+    with recording(recorder):
+        stream = ChapterStream(iter_manuscript_lines(path, ext))
+        cache = open_cache(cache_path) if cache_path else None
+        chapters = timed_iter(stream, "parse_metadata_and_chapters")
+        frame = chapter_frame(chapters, cache=cache)
+    return path, stream.metadata, frame, recorder
+
+def write_outputs(path, metadata, frame, output_dir, write_pdf):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    df = frame.copy()
+    if df.empty:
+        return df
+    with stage("write_csv"):
+        df.to_csv(os.path.join(output_dir, f"{stem}_chapter_readability_analysis.csv"), index=False)
+
+    if write_pdf:
+        from validation_report_generator_wrapped import generate_enhanced_report
+        pdf_buffer = generate_enhanced_report(df, metadata)
+        with open(os.path.join(output_dir, f"{stem}_Validation_Report.pdf"), "wb") as f:
+            f.write(pdf_buffer.getvalue())
+
+    df.insert(0, "Author", metadata.get("Author", "Unknown"))
+    df.insert(0, "Title", metadata.get("Title", "Untitled"))
+    df.insert(0, "Source File", path)
+    return df
+
+def write_combined(frames, combined_path):
+    combined = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    if combined_path.endswith(".parquet"):
+        combined.to_parquet(combined_path, index=False)
+    else:
+        combined.to_csv(combined_path, index=False)
+    return combined
+
+def write_comparison(combined, compare_path):
+    # Titles shared by several files are told apart by file name.
+    from comparison_report import generate_comparison_report
+    frame = combined.copy()
+    files_per_title = frame.groupby("Title")["Source File"].transform("nunique")
+    shared = files_per_title > 1
+    frame.loc[shared, "Title"] = (
+        frame.loc[shared, "Title"] + " (" + frame.loc[shared, "Source File"].map(os.path.basename) + ")"
+    )
+    pdf_buffer, summary = generate_comparison_report(frame)
+    with open(compare_path, "wb") as f:
+        f.write(pdf_buffer.getvalue())
+    return summary
+
+def run_batch(paths, output_dir, max_workers=None, write_pdf=False, combined_path=None, cache_path=None,
+              profile=False, trace_memory=False, metrics_jsonl=None, metrics_port=None, store_path=None,
+              compare_path=None):
+    # metrics_jsonl gets one line of stage timings per manuscript and a
+    # final line for the whole batch; metrics_port serves the running
+    # totals in Prometheus text format while the batch runs. compare_path
+    # gets one PDF comparing every title in the batch.
+    os.makedirs(output_dir, exist_ok=True)
+    workers = max(1, max_workers or os.cpu_count() or 1)
+    frames = []
+    failures = []
+    chapter_total = 0
+    word_total = 0
+    total = StageRecorder()
+    store = MetricsStore(store_path) if store_path else None
+    server = serve_metrics(total, metrics_port) if metrics_port else None
+    jsonl = open(metrics_jsonl, "w", encoding="utf-8") if metrics_jsonl else None
+    start = time.perf_counter()
+
+    # Keep at most two manuscripts per worker in flight so a large back-list
+    # never sits in memory all at once.
+    pending = iter(paths)
+    with ProcessPoolExecutor(max_workers=workers, initializer=get_sentence_tokenizer) as pool:
+        in_flight = {}
+        for path in pending:
+            in_flight[pool.submit(score_manuscript, path, cache_path, profile, trace_memory)] = path
+            if len(in_flight) >= workers * 2:
+                break
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = in_flight.pop(future)
+                try:
+                    _, metadata, frame, recorder = future.result()
+                    with recording(recorder):
+                        df = write_outputs(path, metadata, frame, output_dir, write_pdf)
+                        if store is not None:
+                            with stage("metrics_store_append"):
+                                store.append(metadata, frame)
+                except Exception as exc:
+                    failures.append(path)
+                    print(f"FAILED {path}: {exc}", file=sys.stderr)
+                    continue
+                total.merge(recorder)
+                if jsonl is not None:
+                    line = {"path": path, "title": metadata.get("Title", "Untitled"), **recorder.as_dict()}
+                    jsonl.write(json.dumps(line) + "\n")
+                    jsonl.flush()
+                frames.append((path, df))
+                chapter_total += len(frame)
+                word_total += int(frame["Word Count"].sum())
+                print(f"{path}: {len(frame)} chapters")
+                next_path = next(pending, None)
+                if next_path is not None:
+                    in_flight[pool.submit(score_manuscript, next_path, cache_path, profile, trace_memory)] = next_path
+
+    if combined_path is None:
+        combined_path = os.path.join(output_dir, "combined_readability_analysis.csv")
+    with recording(total):
+        with stage("write_combined"):
+            combined = write_combined([df for _, df in sorted(frames, key=lambda item: item[0])], combined_path)
+        if compare_path and not combined.empty:
+            write_comparison(combined, compare_path)
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        "manuscripts": len(paths) - len(failures),
+        "failures": failures,
+        "chapters": chapter_total,
+        "words": word_total,
+        "seconds": elapsed,
+        "chapters_per_sec": chapter_total / elapsed if elapsed else 0.0,
+        "words_per_sec": word_total / elapsed if elapsed else 0.0,
+    }
+    perf = total.as_dict()
+    if jsonl is not None:
+        batch = {key: value for key, value in stats.items() if key != "failures"}
+        jsonl.write(json.dumps({"batch": batch, "stages": perf["stages"], "profile": perf.get("profile")}) + "\n")
+        jsonl.close()
+    if server is not None:
+        server.shutdown()
+    stats["stages"] = perf["stages"]
+    return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score .txt/.docx manuscripts without the Streamlit apps.")
+    parser.add_argument("inputs", nargs="+", help="Manuscript directories, files or glob patterns.")
+    parser.add_argument("-o", "--output-dir", default="readability_output", help="Directory for per-title CSVs and PDFs.")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument("--pdf", action="store_true", help="Also write a validation report PDF per title.")
+    parser.add_argument("--combined", default=None,
+                        help="Combined output path; a .parquet suffix writes Parquet, anything else CSV.")
+    parser.add_argument("--compare", default=None, metavar="PDF",
+                        help="Also write one report comparing all titles: rankings, cross-title z-scores, score trends.")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="Chapter metrics cache file (SQLite).")
+    parser.add_argument("--no-cache", action="store_true", help="Re-score every chapter, ignoring the cache.")
+    parser.add_argument("--store", nargs="?", const=DEFAULT_STORE_PATH, default=None,
+                        help="Also append each title's chapter metrics to the columnar metrics store "
+                             f"(default directory: {DEFAULT_STORE_PATH}).")
+    parser.add_argument("--metrics-jsonl", default=None,
+                        help="Write per-manuscript stage timings (wall, CPU, allocations, words/sec) to this JSONL file.")
+    parser.add_argument("--profile", action="store_true", help="Run cProfile inside each stage (slow).")
+    parser.add_argument("--trace-memory", action="store_true", help="Record each stage's tracemalloc peak (slow).")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Serve running stage totals in Prometheus text format at http://127.0.0.1:PORT/metrics.")
+    args = parser.parse_args(argv)
+
+    paths = find_manuscripts(args.inputs)
+    if not paths:
+        parser.error("no .txt or .docx manuscripts matched the given inputs")
+
+    stats = run_batch(paths, args.output_dir, max_workers=args.workers, write_pdf=args.pdf,
+                      combined_path=args.combined, cache_path=None if args.no_cache else args.cache,
+                      profile=args.profile, trace_memory=args.trace_memory, metrics_jsonl=args.metrics_jsonl,
+                      metrics_port=args.metrics_port, store_path=args.store, compare_path=args.compare)
+    print(f"Scored {stats['manuscripts']} manuscripts, {stats['chapters']} chapters, "
+          f"{stats['words']} words in {stats['seconds']:.2f}s")
+    print(f"Throughput: {stats['chapters_per_sec']:.2f} chapters/sec, {stats['words_per_sec']:.0f} words/sec")
+    if stats["failures"]:
+        print(f"{len(stats['failures'])} manuscripts failed", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
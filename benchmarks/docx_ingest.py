@@ -0,0 +1,113 @@
+# Compares the three ways a .docx manuscript can be turned into text:
+# docx_stream (streamed XML), python-docx (full document model, what the
+# novel app used) and docx2txt (what the single-text app used). Each reader
+# is timed best of --repeat on a synthetic manuscript written with
+# python-docx, then re-run under tracemalloc for its peak allocation. The
+# streamed paragraphs are checked against python-docx's before timing.
+#
+#     python benchmarks/docx_ingest.py --chapters 200
+#     python benchmarks/docx_ingest.py --docx manuscripts/long_novel.docx
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from tests.corpora import generate_novel
+from docx_stream import iter_docx_paragraphs
+from readability_utils import ChapterStream, iter_manuscript_lines
+
+def write_docx(text, path):
+    from docx import Document
+    document = Document()
+    for line in text.split("\n"):
+        paragraph = document.add_paragraph()
+        # Split prose paragraphs into a few runs, as real documents have.
+        sentences = line.split(". ")
+        for i, sentence in enumerate(sentences):
+            run = paragraph.add_run(sentence + (". " if i < len(sentences) - 1 else ""))
+            run.bold = i % 3 == 1
+    document.save(path)
+
+def read_python_docx(path):
+    from docx import Document
+    return "\n".join(p.text for p in Document(path).paragraphs)
+
+def read_docx2txt(path):
+    import docx2txt
+    return docx2txt.process(path)
+
+def read_streamed(path):
+    return "\n".join(iter_docx_paragraphs(path))
+
+def read_chapters(path):
+    # Streaming all the way into the chapter parser.
+    return list(ChapterStream(iter_manuscript_lines(path, "docx")))
+
+READERS = [
+    ("docx_stream", read_streamed),
+    ("docx_stream_to_chapters", read_chapters),
+    ("python_docx", read_python_docx),
+    ("docx2txt", read_docx2txt),
+]
+
+def run(path, repeat):
+    from docx import Document
+    streamed = list(iter_docx_paragraphs(path))
+    expected = [p.text for p in Document(path).paragraphs]
+    if streamed != expected:
+        raise SystemExit(f"docx_stream read {len(streamed)} paragraphs that differ from python-docx's {len(expected)}")
+
+    results = {}
+    for name, reader in READERS:
+        try:
+            reader(path)
+        except ImportError as exc:
+            print(f"skipping {name}: {exc}", file=sys.stderr)
+            continue
+        best = min(timed(reader, path) for _ in range(repeat))
+        tracemalloc.start()
+        reader(path)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = {"seconds": best, "peak_mb": peak / (1024 * 1024)}
+    return {"docx": path, "bytes": os.path.getsize(path), "paragraphs": len(streamed), "readers": results}
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark .docx text extraction.")
+    parser.add_argument("--docx", default=None, help="Benchmark this file instead of a synthetic one.")
+    parser.add_argument("--chapters", type=int, default=100)
+    parser.add_argument("--words-per-chapter", type=int, default=3000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per reader; the fastest is kept.")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.docx
+        if path is None:
+            path = os.path.join(tmp, "synthetic.docx")
+            write_docx(generate_novel(args.chapters, args.words_per_chapter, seed=args.seed), path)
+        report = run(path, args.repeat)
+
+    print(f"{report['paragraphs']} paragraphs, {report['bytes'] / (1024 * 1024):.1f} MB .docx")
+    print(f"{'reader':26} {'seconds':>9} {'peak MB':>8}")
+    for name, reader in report["readers"].items():
+        print(f"{name:26} {reader['seconds']:9.4f} {reader['peak_mb']:8.1f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+# Counts and times the passes over a document's text needed for the single-
+# document app's numbers: the helper functions the app used to have, each
+# running its own regex over the whole text, against one features.Document
+# that builds every shared intermediate once. The synthetic novel is scored
+# as a single upload. Exits 1 if the engine builds any intermediate twice.
+#
+#     python benchmarks/feature_passes.py
+#     python benchmarks/feature_passes.py --chapters 80 --json passes.json
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from tests.corpora import generate_novel
+from features import FEATURE_TOTALS, INTERMEDIATES, Document
+from lexicon import SENSE_LEXICON
+from readability_utils import get_sentence_tokenizer
+from syllables import count_syllables
+
+APP_FEATURES = FEATURE_TOTALS + ("sentence_count", "unique_words", "sense_counts")
+
+class Scans:
+    # The old helpers, as the app called them, each whole-text scan counted.
+
+    def __init__(self):
+        self.passes = 0
+
+    def findall(self, pattern, text):
+        self.passes += 1
+        return re.findall(pattern, text)
+
+    def lower(self, text):
+        self.passes += 1
+        return text.lower()
+
+    def count_sentences(self, text):
+        return len(self.findall(r'[.!?]', text))
+
+    def count_words(self, text):
+        return len(self.findall(r'\b\w+\b', text))
+
+    def run(self, text):
+        sentence_count = self.count_sentences(text)
+        word_count = self.count_words(text)
+        avg_sentence_len = self.count_words(text) / max(1, self.count_sentences(text))
+        words = self.findall(r'\b\w+\b', text)
+        avg_word_len = sum(len(word) for word in words) / max(1, len(words))
+        words = self.findall(r'\b\w+\b', text)
+        avg_syllables = sum(count_syllables(word) for word in words) / max(1, len(words))
+        passive = len(self.findall(r'\b(is|was|were|been|being|are|am|be)\b\s+\w+ed\b', text))
+        lowered = self.findall(r'\b\w+\b', self.lower(text))
+        unique_words = len(set(lowered))
+        rare_words = sum(1 for w in lowered if len(w) > 10 or w.endswith(('ion', 'ity', 'ment')))
+        self.passes += 1  # Lexicon.count splits the text into words again
+        senses = SENSE_LEXICON.count(text)
+        return (sentence_count, word_count, avg_sentence_len, avg_word_len, avg_syllables, passive, unique_words,
+                rare_words, senses)
+
+def best_time(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Count and time the text passes behind the app's metrics.")
+    parser.add_argument("--chapters", type=int, default=40)
+    parser.add_argument("--words-per-chapter", type=int, default=3000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs; the fastest is kept.")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    text = generate_novel(chapters=args.chapters, words_per_chapter=args.words_per_chapter, seed=args.seed)
+    splitter = get_sentence_tokenizer()
+
+    scans = Scans()
+    scans.run(text)
+    document = Document(text, splitter=splitter)
+    document.extract(APP_FEATURES)
+    text_passes = [step for step in document.built if "text" in INTERMEDIATES[step][0]]
+
+    report = {
+        "words": len(text.split()),
+        "separate_helpers": {"text_passes": scans.passes,
+                             "seconds": best_time(lambda: Scans().run(text), args.repeat)},
+        "feature_engine": {"text_passes": len(text_passes), "intermediates": document.built,
+                           "seconds": best_time(lambda: Document(text, splitter=splitter).extract(APP_FEATURES),
+                                                args.repeat)},
+    }
+
+    print(f"{report['words']} words as one document")
+    print(f"{'':18} {'text passes':>11} {'seconds':>9}")
+    for name in ("separate_helpers", "feature_engine"):
+        row = report[name]
+        print(f"{name:18} {row['text_passes']:11d} {row['seconds']:9.4f}")
+    print(f"intermediates built: {', '.join(document.built)}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if len(set(document.built)) != len(document.built):
+        print("an intermediate was built more than once", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+# Import-time benchmark for the modules the apps load before any upload.
+#
+# Each module is imported in a fresh interpreter under -X importtime. The
+# median cumulative import time must stay within its budget, and the import
+# must not pull in libraries that are only needed once analysis or report
+# generation actually runs.
+#
+#     python benchmarks/import_time.py
+#     python benchmarks/import_time.py --repeat 10 --json import_times.json
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative import budgets in milliseconds.
+BUDGETS_MS = {
+    "readability_utils": 100,
+    "result_cache": 150,
+}
+
+# Libraries that must only be imported on the code paths that use them.
+DEFERRED_MODULES = ("nltk", "matplotlib", "seaborn", "fpdf", "docx", "docx2txt")
+
+def measure(module):
+    code = (
+        f"import sys; import {module}; "
+        f"print(','.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+    )
+    cumulative_us = None
+    for line in proc.stderr.splitlines():
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            cumulative_us = int(parts[1])
+    loaded = [m for m in proc.stdout.strip().split(",") if m]
+    return cumulative_us / 1000.0, loaded
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check import times against startup budgets.")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per module.")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    results = {}
+    failed = False
+    for module, budget in BUDGETS_MS.items():
+        samples = []
+        loaded = []
+        for _ in range(args.repeat):
+            ms, loaded = measure(module)
+            samples.append(ms)
+        median = statistics.median(samples)
+        ok = median <= budget and not loaded
+        failed |= not ok
+        results[module] = {"median_ms": median, "budget_ms": budget, "deferred_loaded": loaded}
+        status = "ok" if ok else "FAIL"
+        extra = f" (imported {', '.join(loaded)})" if loaded else ""
+        print(f"{status:4} {module:24} {median:8.1f} ms / {budget} ms{extra}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
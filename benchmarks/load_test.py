@@ -0,0 +1,151 @@
+# Load-tests scoring_service.py: many clients POSTing the same 3,000-word
+# chapter to /score over keep-alive connections, with latency percentiles
+# and throughput at the end. The service is started on a free local port
+# unless --url points at one already running. Every response is checked
+# against analyze_text run in-process. Exits 1 on a wrong answer, an error
+# response or a p99 latency over --p99-ms.
+#
+#     python benchmarks/load_test.py
+#     python benchmarks/load_test.py --concurrency 32 --requests 2000 --workers 4 --json load.json
+#     python benchmarks/load_test.py --url http://127.0.0.1:8765 --p99-ms 80
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from tests.corpora import generate_chapter
+from readability_utils import analyze_text
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_service(port, workers, max_batch):
+    command = [sys.executable, os.path.join(REPO_ROOT, "scoring_service.py"), "--port", str(port),
+               "--max-batch", str(max_batch)]
+    if workers:
+        command += ["--workers", str(workers)]
+    process = subprocess.Popen(command, cwd=REPO_ROOT, stdout=subprocess.PIPE, text=True)
+    # The service prints one line once every worker has the model loaded.
+    line = process.stdout.readline()
+    if not line:
+        process.wait()
+        raise RuntimeError(f"scoring_service.py exited with {process.returncode}")
+    return process
+
+async def post(reader, writer, host, path, body):
+    writer.write(f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: text/plain; charset=utf-8\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+async def client(host, port, body, count, latencies, failures, expected):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(count):
+            start = time.perf_counter()
+            status, payload = await post(reader, writer, host, "/score", body)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                failures.append(f"HTTP {status}: {payload[:200]!r}")
+            elif json.loads(payload) != expected:
+                failures.append(f"wrong metrics: {payload[:200]!r}")
+    finally:
+        writer.close()
+
+async def run_load(host, port, body, concurrency, requests, expected):
+    # Warm-up request, then `requests` spread over `concurrency` connections.
+    await client(host, port, body, 1, [], [], expected)
+    latencies = []
+    failures = []
+    shares = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+    start = time.perf_counter()
+    await asyncio.gather(*[client(host, port, body, n, latencies, failures, expected) for n in shares if n])
+    return latencies, failures, time.perf_counter() - start
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the scoring service with concurrent /score requests.")
+    parser.add_argument("--url", default=None, help="A running service; by default one is started locally.")
+    parser.add_argument("--workers", type=int, default=None, help="Workers for the service started here.")
+    parser.add_argument("--max-batch", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=4, help="Open client connections.")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--words", type=int, default=3000, help="Words in the chapter each request sends.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--p99-ms", type=float, default=50.0, help="Exit 1 if p99 latency is above this.")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    chapter = generate_chapter(random.Random(args.seed), args.words, 0.04, 0.1, 0.03)
+    expected = analyze_text(chapter)
+    body = chapter.encode("utf-8")
+
+    process = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        host, port = "127.0.0.1", free_port()
+        process = start_service(port, args.workers, args.max_batch)
+    try:
+        latencies, failures, elapsed = asyncio.run(
+            run_load(host, port, body, args.concurrency, args.requests, expected))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    ordered = sorted(latencies)
+    report = {
+        "words": len(chapter.split()),
+        "requests": len(ordered),
+        "concurrency": args.concurrency,
+        "failures": len(failures),
+        "seconds": elapsed,
+        "requests_per_s": len(ordered) / elapsed if elapsed else None,
+        "latency_ms": {name: percentile(ordered, q) * 1000 for name, q in
+                       (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("max", 1.0))} if ordered else {},
+    }
+
+    print(f"{report['requests']} requests of {report['words']} words, {args.concurrency} connections, "
+          f"{elapsed:.2f}s ({report['requests_per_s']:.1f} req/s)")
+    for name, value in report["latency_ms"].items():
+        print(f"{name:>4} {value:8.2f} ms")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    for failure in failures[:5]:
+        print(failure, file=sys.stderr)
+    if failures:
+        print(f"{len(failures)} failed requests", file=sys.stderr)
+        return 1
+    if ordered and report["latency_ms"]["p99"] > args.p99_ms:
+        print(f"p99 {report['latency_ms']['p99']:.2f} ms is over the {args.p99_ms:g} ms target", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
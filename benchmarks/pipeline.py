@@ -0,0 +1,175 @@
+# Stage-by-stage benchmark of the novel analysis pipeline on a synthetic
+# manuscript. Each stage is timed on its own (best of --repeat runs) and then
+# re-run once under tracemalloc for its peak Python allocation.
+#
+#     python benchmarks/pipeline.py --json bench.json
+#     python benchmarks/pipeline.py --save-baseline benchmarks/baseline.json
+#     python benchmarks/pipeline.py --baseline benchmarks/baseline.json --tolerance 0.25
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import pandas as pd
+from tests.corpora import generate_novel
+from readability_utils import analyze_text, extract_features, get_sentence_tokenizer, parse_metadata_and_chapters
+from novel_report import generate_validation_report
+from validation_report_generator_wrapped import _chart_cache, generate_enhanced_report
+
+def build_stages(raw):
+    # Each stage takes the previous stage's output; state is filled in by a
+    # first untimed pass so every stage can be re-run in isolation.
+    state = {}
+
+    def decode():
+        return raw.decode("utf-8")
+
+    def parse():
+        return parse_metadata_and_chapters(state["text"])
+
+    def tokenize():
+        tokenizer = get_sentence_tokenizer()
+        return [tokenizer.tokenize(t) for _, t in state["chapters"]]
+
+    def features():
+        return [extract_features(t) for _, t in state["chapters"]]
+
+    def analyze():
+        results = []
+        for chap_title, chap_text in state["chapters"]:
+            metrics = analyze_text(chap_text)
+            metrics["Chapter"] = chap_title
+            results.append(metrics)
+        return results
+
+    def assemble():
+        df = pd.DataFrame(state["results"])
+        return df[["Chapter"] + [col for col in df.columns if col != "Chapter"]]
+
+    def enhanced_report():
+        _chart_cache.clear()
+        return generate_enhanced_report(state["df"], state["metadata"])
+
+    def pdfpages_report():
+        return generate_validation_report(state["df"], state["metadata"])
+
+    stages = [
+        ("decode", decode, "text"),
+        ("parse_metadata_and_chapters", parse, "parsed"),
+        ("punkt_tokenize", tokenize, None),
+        ("extract_features", features, None),
+        ("analyze_text", analyze, "results"),
+        ("dataframe_assembly", assemble, "df"),
+        ("generate_enhanced_report", enhanced_report, None),
+        ("pdfpages_validation_report", pdfpages_report, None),
+    ]
+    for name, fn, key in stages:
+        result = fn()
+        if key == "parsed":
+            state["metadata"], state["chapters"] = result
+        elif key:
+            state[key] = result
+    return stages
+
+def run(config, repeat):
+    get_sentence_tokenizer()
+    raw = generate_novel(**config).encode("utf-8")
+    words = len(raw.split())
+    stages = build_stages(raw)
+
+    results = {}
+    for name, fn, _ in stages:
+        best = min(timed(fn) for _ in range(repeat))
+        tracemalloc.start()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = {
+            "seconds": best,
+            "words_per_sec": words / best if best else None,
+            "peak_mb": peak / (1024 * 1024),
+        }
+    return {
+        "config": config,
+        "words": words,
+        "bytes": len(raw),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "stages": results,
+    }
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+def compare(report, baseline, tolerance, min_delta):
+    regressions = []
+    print(f"{'stage':30} {'baseline s':>11} {'current s':>11} {'ratio':>7}")
+    for name, current in report["stages"].items():
+        before = baseline["stages"].get(name)
+        if not before:
+            print(f"{name:30} {'-':>11} {current['seconds']:11.4f}")
+            continue
+        ratio = current["seconds"] / before["seconds"] if before["seconds"] else float("inf")
+        slower = current["seconds"] - before["seconds"]
+        flag = "  REGRESSION" if ratio > 1 + tolerance and slower > min_delta else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:30} {before['seconds']:11.4f} {current['seconds']:11.4f} {ratio:7.2f}{flag}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark each stage of the novel analysis pipeline.")
+    parser.add_argument("--chapters", type=int, default=40)
+    parser.add_argument("--words-per-chapter", type=int, default=3000)
+    parser.add_argument("--sensory-density", type=float, default=0.04)
+    parser.add_argument("--passive-density", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage; the fastest is kept.")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file.")
+    parser.add_argument("--save-baseline", default=None, help="Write results as a new baseline file.")
+    parser.add_argument("--baseline", default=None, help="Compare against this baseline file.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before a stage counts as a regression.")
+    parser.add_argument("--min-delta", type=float, default=0.005,
+                        help="Ignore slowdowns smaller than this many seconds, which are timer noise.")
+    args = parser.parse_args(argv)
+
+    config = {
+        "chapters": args.chapters,
+        "words_per_chapter": args.words_per_chapter,
+        "sensory_density": args.sensory_density,
+        "passive_density": args.passive_density,
+        "seed": args.seed,
+    }
+    report = run(config, args.repeat)
+
+    print(f"{report['words']} words, {args.chapters} chapters")
+    print(f"{'stage':30} {'seconds':>9} {'words/s':>12} {'peak MB':>8}")
+    for name, stage in report["stages"].items():
+        print(f"{name:30} {stage['seconds']:9.4f} {stage['words_per_sec'] or 0:12.0f} {stage['peak_mb']:8.1f}")
+
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != config:
+            print("warning: baseline was recorded with a different configuration", file=sys.stderr)
+        regressions = compare(report, baseline, args.tolerance, args.min_delta)
+        if regressions:
+            print(f"{len(regressions)} stage(s) regressed: {', '.join(regressions)}", file=sys.stderr)
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
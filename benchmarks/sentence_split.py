@@ -0,0 +1,109 @@
+# Checks sentence_splitter against NLTK's Punkt tokenizer, boundary for
+# boundary, and times the two. The reference corpus is a synthetic novel
+# plus a seeded stream of awkward prose: abbreviations, initials, numbers,
+# ellipses, runs of "!?", quotes and brackets after a break, dashes and
+# hard line breaks. Both are checked with the shipped model and with one
+# trained by nltk's PunktTrainer on the awkward prose, so the abbreviation,
+# collocation, sentence-starter and orthographic tables are all exercised.
+# Any disagreement is printed and the script exits 1.
+#
+#     python benchmarks/sentence_split.py
+#     python benchmarks/sentence_split.py --chapters 80 --fuzz-sentences 50000 --json split.json
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from tests.corpora import fuzz_text, generate_novel, paragraphs, train_model
+from readability_utils import PUNKT_PATH, get_punkt_tokenizer
+from sentence_splitter import SentenceSplitter
+
+def compare(reference, splitter, texts):
+    # Returns (texts checked, reference boundaries, mismatching texts).
+    boundaries = 0
+    mismatches = []
+    for text in texts:
+        expected = list(reference.span_tokenize(text))
+        boundaries += len(expected)
+        if list(splitter.span_tokenize(text)) != expected:
+            mismatches.append(text)
+    return len(texts), boundaries, mismatches
+
+def best_time(fn, texts, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            fn(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check and time the fast sentence splitter against NLTK Punkt.")
+    parser.add_argument("--chapters", type=int, default=40)
+    parser.add_argument("--words-per-chapter", type=int, default=3000)
+    parser.add_argument("--fuzz-sentences", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per tokenizer; the fastest is kept.")
+    parser.add_argument("--min-speedup", type=float, default=5.0, help="Exit 1 if the novel speedup is below this.")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    novel = generate_novel(args.chapters, args.words_per_chapter, seed=args.seed)
+    chapters = novel.split("### ")
+    fuzz = fuzz_text(args.fuzz_sentences, seed=args.seed)
+    fuzz_pieces = paragraphs(fuzz, 400) + [
+        "", " ", ".", "!!!", "...", "a.", "Mr. Smith.", "“No.”\n", "end. ", "(x.) y", "e.g. x", "A. B. C.",
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        trained_path = os.path.join(tmp, "trained.pickle")
+        models = [
+            ("english.pickle", get_punkt_tokenizer(), SentenceSplitter.from_pickle(PUNKT_PATH)),
+            ("trained on fuzz", train_model(fuzz, trained_path), SentenceSplitter.from_pickle(trained_path)),
+        ]
+
+    report = {"agreement": {}, "timing": {}}
+    failed = False
+    for model, reference, splitter in models:
+        for corpus, texts in (("novel", chapters), ("fuzz", fuzz_pieces)):
+            checked, boundaries, mismatches = compare(reference, splitter, texts)
+            report["agreement"][f"{model} / {corpus}"] = {
+                "texts": checked, "sentences": boundaries, "mismatches": len(mismatches),
+            }
+            for text in mismatches[:3]:
+                failed = True
+                print(f"MISMATCH ({model} / {corpus}): {text[:200]!r}", file=sys.stderr)
+                print(f"  punkt: {list(reference.span_tokenize(text))}", file=sys.stderr)
+                print(f"  fast:  {list(splitter.span_tokenize(text))}", file=sys.stderr)
+            failed = failed or bool(mismatches)
+
+    reference, splitter = models[0][1], models[0][2]
+    for corpus, texts in (("novel", chapters), ("fuzz", fuzz_pieces)):
+        punkt_s = best_time(reference.tokenize, texts, args.repeat)
+        fast_s = best_time(splitter.tokenize, texts, args.repeat)
+        report["timing"][corpus] = {"punkt_s": punkt_s, "fast_s": fast_s, "speedup": punkt_s / fast_s}
+
+    print(f"{'model / corpus':30} {'texts':>7} {'sentences':>10} {'mismatches':>11}")
+    for name, row in report["agreement"].items():
+        print(f"{name:30} {row['texts']:7} {row['sentences']:10} {row['mismatches']:11}")
+    print(f"\n{'corpus':10} {'punkt s':>9} {'fast s':>9} {'speedup':>8}")
+    for corpus, row in report["timing"].items():
+        print(f"{corpus:10} {row['punkt_s']:9.4f} {row['fast_s']:9.4f} {row['speedup']:7.1f}x")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if report["timing"]["novel"]["speedup"] < args.min_speedup:
+        print(f"speedup below {args.min_speedup}x", file=sys.stderr)
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,28 @@
+# Writes a deterministic synthetic manuscript (tests.corpora.generate_novel)
+# to a file, for trying the apps and the batch CLI on a known text.
+#
+#     python benchmarks/synthetic.py novel.txt --chapters 80 --seed 3
+import argparse
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from tests.corpora import generate_novel
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a deterministic synthetic manuscript.")
+    parser.add_argument("output", help="Path of the .txt file to write.")
+    parser.add_argument("--chapters", type=int, default=40)
+    parser.add_argument("--words-per-chapter", type=int, default=3000)
+    parser.add_argument("--sensory-density", type=float, default=0.04)
+    parser.add_argument("--passive-density", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    text = generate_novel(args.chapters, args.words_per_chapter, args.sensory_density, args.passive_density, seed=args.seed)
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.write(text)
+
+if __name__ == "__main__":
+    main()
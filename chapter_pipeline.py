@@ -0,0 +1,173 @@
+import queue
+import threading
+import time
+from contextlib import nullcontext
+from contextvars import copy_context
+
+from instrumentation import StageRecorder, current_recorder, recording
+
+# A chain of stages, each running in its own thread and connected to the
+# next by a bounded queue, so parsing, analysis, aggregation and rendering
+# overlap and a slow stage holds back the ones before it instead of letting
+# work pile up in memory. A stage is a function taking an iterator of its
+# inputs and returning an iterable of its outputs, usually by yielding
+# them; the first stage is called with an empty iterator. A stage that
+# needs everything (z-scores over the whole book, say) just finishes
+# reading its input before yielding.
+
+QUEUE_SIZE = 8
+# How often a thread blocked on a queue checks whether the run was stopped.
+POLL_SECONDS = 0.1
+END = object()
+
+class PipelineStopped(Exception):
+    pass
+
+class StageStats:
+    def __init__(self, name, capacity):
+        self.name = name
+        self.capacity = capacity
+        self.queue = None
+        self.items_in = 0
+        self.items_out = 0
+        self.wait_in_s = 0.0
+        self.wait_out_s = 0.0
+        self.cpu_s = 0.0
+        self.started = None
+        self.finished = None
+        self.max_depth = 0
+        self.depth_total = 0
+
+    def as_dict(self):
+        # wait_in_s is time starved for input, wait_out_s time held up by a
+        # full queue downstream; busy_s is the rest.
+        end = self.finished or time.perf_counter()
+        wall = end - self.started if self.started is not None else 0.0
+        busy = max(0.0, wall - self.wait_in_s - self.wait_out_s)
+        # The first stage has no input queue; count what it produced.
+        items = self.items_in if self.queue is not None else self.items_out
+        return {
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "wall_s": wall,
+            "busy_s": busy,
+            "cpu_s": self.cpu_s,
+            "wait_in_s": self.wait_in_s,
+            "wait_out_s": self.wait_out_s,
+            "items_per_sec": items / busy if items and busy else None,
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "queue_capacity": self.capacity if self.queue is not None else 0,
+            "queue_max_depth": self.max_depth,
+            "queue_mean_depth": self.depth_total / self.items_in if self.items_in else 0.0,
+            "running": self.started is not None and self.finished is None,
+        }
+
+class Pipeline:
+    # `stages` is a list of (name, function). stats() can be read from any
+    # thread while the pipeline runs; each stage's queue is the one it reads
+    # from. Setting `stop` (or any stage raising) makes every stage give up
+    # at its next queue operation.
+
+    def __init__(self, stages, queue_size=QUEUE_SIZE, stop=None):
+        self.stages = stages
+        self.stop = stop or threading.Event()
+        self._stats = [StageStats(name, queue_size) for name, _ in stages]
+        self._queues = [queue.Queue(maxsize=queue_size) for _ in stages[1:]]
+        for stats, q in zip(self._stats[1:], self._queues):
+            stats.queue = q
+        self._error = None
+        self.outputs = []
+
+    def stats(self):
+        return {stats.name: stats.as_dict() for stats in self._stats}
+
+    def run(self):
+        # Runs every stage to completion and returns the last stage's
+        # outputs. Raises the first stage error, or PipelineStopped if `stop`
+        # was set from outside.
+        parent = current_recorder()
+        recorders = []
+        threads = []
+        for i, (name, fn) in enumerate(self.stages):
+            recorder = None
+            if parent is not None:
+                recorder = StageRecorder(profile=parent.profile, trace_memory=parent.trace_memory)
+                recorders.append(recorder)
+            context = copy_context()
+            thread = threading.Thread(target=context.run, args=(self._run_stage, i, fn, recorder),
+                                      name=f"pipeline-{name}", daemon=True)
+            threads.append(thread)
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for recorder in recorders:
+            parent.merge(recorder)
+        if parent is not None:
+            for stats in self._stats:
+                summary = stats.as_dict()
+                parent.record(f"pipeline.{stats.name}", summary["busy_s"], stats.cpu_s)
+        if self._error is not None:
+            raise self._error
+        if self.stop.is_set():
+            raise PipelineStopped()
+        return self.outputs
+
+    def _run_stage(self, i, fn, recorder):
+        stats = self._stats[i]
+        inbox = self._queues[i - 1] if i else None
+        outbox = self._queues[i] if i < len(self._queues) else None
+        stats.started = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            with recording(recorder) if recorder is not None else nullcontext():
+                items = self._inputs(inbox, stats) if inbox is not None else iter(())
+                for item in fn(items):
+                    stats.items_out += 1
+                    if outbox is None:
+                        self.outputs.append(item)
+                    else:
+                        self._put(outbox, item, stats)
+            if outbox is not None:
+                self._put(outbox, END, stats)
+        except PipelineStopped:
+            pass
+        except BaseException as exc:
+            if self._error is None:
+                self._error = exc
+            self.stop.set()
+        finally:
+            stats.cpu_s = time.thread_time() - cpu
+            stats.finished = time.perf_counter()
+
+    def _inputs(self, inbox, stats):
+        while True:
+            waited = time.perf_counter()
+            while True:
+                try:
+                    item = inbox.get(timeout=POLL_SECONDS)
+                    break
+                except queue.Empty:
+                    if self.stop.is_set():
+                        raise PipelineStopped()
+            stats.wait_in_s += time.perf_counter() - waited
+            if item is END:
+                return
+            if self.stop.is_set():
+                raise PipelineStopped()
+            # Items waiting when this one was taken, itself included.
+            depth = inbox.qsize() + 1
+            stats.items_in += 1
+            stats.depth_total += depth
+            stats.max_depth = max(stats.max_depth, depth)
+            yield item
+
+    def _put(self, outbox, item, stats):
+        waited = time.perf_counter()
+        while True:
+            try:
+                outbox.put(item, timeout=POLL_SECONDS)
+                break
+            except queue.Full:
+                if self.stop.is_set():
+                    raise PipelineStopped()
+        stats.wait_out_s += time.perf_counter() - waited
@@ -0,0 +1,202 @@
+import argparse
+import sys
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+from fpdf import FPDF
+from matplotlib.figure import Figure
+from matplotlib.ticker import MaxNLocator
+from features import METRIC_COLUMNS
+from instrumentation import instrumented, stage
+from running_stats import RunningStats, group_stats
+from validation_report_generator_wrapped import add_chart, render_figure, sanitize_text
+
+# One report comparing many titles: a ranking table, cross-title z-scores
+# of each title's mean metrics, and small-multiple score trends. Everything
+# is computed from one pooled chapter frame (Title, Author, Chapter and the
+# metric columns, as batch_analyze.py's combined output or
+# MetricsStore.scan() give it): the metric columns are taken as one matrix,
+# reduced per title with numpy group sums, and the titles' means are
+# z-scored leave-one-out with running_stats. The trend grid is drawn
+# on a single Figure that is cleared and reused for every page.
+
+METRICS = METRIC_COLUMNS
+SCORE = "Dyslexia-Friendly Score"
+FRIENDLY_THRESHOLD = 55
+GRID_ROWS = 4
+GRID_COLS = 3
+
+def compare_titles(frame):
+    # One row per title, best mean score first: chapter and word counts,
+    # mean of every metric, each mean's z-score against the other titles'
+    # means, the weakest chapter, how many chapters fall below the
+    # threshold or are outliers against the pooled chapters, and the rank.
+    metrics = [col for col in METRICS if col in frame.columns]
+    values = frame[metrics].to_numpy(dtype=np.float64)
+    pooled = RunningStats(metrics).update_many(values)
+    # Rows without a title count towards the pooled statistics only.
+    codes, titles = pd.factorize(frame["Title"])
+    titled = codes >= 0
+    frame, values, codes = frame[titled], values[titled], codes[titled]
+    n_titles = len(titles)
+
+    means = np.array([stats.mean for stats in group_stats(values, codes, n_titles, metrics)])
+    scores = frame[SCORE].to_numpy(dtype=np.float64)
+    lowest = np.full(n_titles, np.inf)
+    np.minimum.at(lowest, codes, scores)
+    summary = pd.DataFrame(means, index=pd.Index(titles, name="Title"), columns=metrics)
+    if "Author" in frame.columns:
+        authors = frame["Author"].to_numpy()[np.unique(codes, return_index=True)[1]]
+    else:
+        authors = "Unknown"
+    summary.insert(0, "Author", authors)
+    summary.insert(1, "Chapters", np.bincount(codes, minlength=n_titles))
+    summary.insert(2, "Words", np.bincount(codes, weights=frame["Word Count"].to_numpy(), minlength=n_titles)
+                   .astype(frame["Word Count"].dtype))
+    summary["Lowest Chapter Score"] = lowest
+    summary["Below Threshold"] = np.bincount(codes, weights=scores < FRIENDLY_THRESHOLD, minlength=n_titles).astype(int)
+    summary["Outlier Chapters"] = np.bincount(codes, weights=pooled.outliers(values).any(axis=1),
+                                              minlength=n_titles).astype(int)
+
+    z = RunningStats(metrics).update_many(means).leave_one_out_z_scores(means)
+    for j, col in enumerate(metrics):
+        summary[f"{col} Z"] = z[:, j]
+    summary["Rank"] = summary[SCORE].rank(ascending=False, method="min").astype(int)
+    return summary.sort_values(["Rank", "Words"], ascending=[True, False]), pooled
+
+def shorten(name, width):
+    # Titles can come in as numbers or None from a CSV.
+    name = str(name)
+    return name if len(name) <= width else name[:width - 1] + "..."
+
+def draw_trend_grid(fig, frame, titles, ylim):
+    # Small multiples on the shared Figure `fig`: one score trend per title,
+    # same axes limits throughout so titles compare at a glance.
+    fig.clear()
+    axes = fig.subplots(GRID_ROWS, GRID_COLS, sharey=True).ravel()
+    groups = frame.groupby("Title", sort=False)[SCORE]
+    for ax, title in zip(axes, titles):
+        scores = groups.get_group(title).to_numpy()
+        ax.plot(np.arange(1, len(scores) + 1), scores, marker="o", markersize=2, linewidth=1)
+        ax.axhline(FRIENDLY_THRESHOLD, color="green", linestyle="--", linewidth=0.8)
+        ax.set_ylim(*ylim)
+        ax.set_title(shorten(title, 32), fontsize=8)
+        ax.tick_params(labelsize=6)
+        ax.xaxis.set_major_locator(MaxNLocator(integer=True))
+    for ax in axes[len(titles):]:
+        ax.set_visible(False)
+    fig.supxlabel("Chapter", fontsize=8)
+    fig.supylabel("DF Score", fontsize=8)
+    fig.tight_layout()
+    return render_figure(fig)
+
+def draw_profile_heatmap(summary, metrics):
+    import seaborn as sns
+    fig = Figure(figsize=(10, max(3, 0.3 * len(summary) + 2)))
+    ax = fig.subplots()
+    z = summary[[f"{col} Z" for col in metrics]]
+    z.columns = metrics
+    sns.heatmap(z, cmap="coolwarm", center=0, cbar_kws={"label": "Z-score across titles"}, ax=ax,
+                yticklabels=[shorten(t, 40) for t in summary.index])
+    ax.set_title("Mean Feature Profile by Title")
+    fig.tight_layout()
+    return render_figure(fig)
+
+@instrumented("generate_comparison_report")
+def generate_comparison_report(frame, title="Manuscript Comparison"):
+    with stage("comparison.summary"):
+        summary, pooled = compare_titles(frame)
+    metrics = [col for col in METRICS if col in frame.columns]
+
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", 'B', 20)
+    pdf.cell(0, 10, sanitize_text(title), ln=True)
+    pdf.set_font("Arial", 'I', 14)
+    pdf.cell(0, 10, sanitize_text("Powered by Howard Forge Press"), ln=True)
+    pdf.set_font("Arial", '', 12)
+    pdf.ln(6)
+    score_col = pooled.columns.index(SCORE)
+    pdf.multi_cell(0, 8, sanitize_text(
+        f"{len(summary)} titles, {pooled.count} chapters in all. Pooled mean DF Score "
+        f"{pooled.mean[score_col]:.2f} (SD {pooled.std[score_col]:.2f}). Titles are ranked by mean "
+        f"Dyslexia-Friendly Score; Z compares each title's mean with the other titles' means."))
+    pdf.ln(4)
+
+    headers = [("Rank", 12), ("Title", 62), ("Chapters", 18), ("Mean DF", 18), ("DF Z", 16), ("Lowest", 16),
+               ("< 55", 14), ("Outliers", 18)]
+    pdf.set_font("Arial", 'B', 9)
+    for label, width in headers:
+        pdf.cell(width, 7, label, border=1)
+    pdf.ln()
+    pdf.set_font("Arial", '', 9)
+    for name, row in summary.iterrows():
+        cells = [
+            str(row["Rank"]), shorten(name, 38), str(row["Chapters"]),
+            f"{row[SCORE]:.2f}", "-" if pd.isna(row[SCORE + ' Z']) else f"{row[SCORE + ' Z']:.2f}", f"{row['Lowest Chapter Score']:.2f}",
+            str(row["Below Threshold"]), str(row["Outlier Chapters"]),
+        ]
+        for (_, width), cell in zip(headers, cells):
+            pdf.cell(width, 6, sanitize_text(cell), border=1)
+        pdf.ln()
+
+    with stage("comparison.trend_grid"):
+        scores = frame[SCORE]
+        ylim = (min(scores.min(), FRIENDLY_THRESHOLD) - 2, max(scores.max(), FRIENDLY_THRESHOLD) + 2)
+        fig = Figure(figsize=(10, 12))
+        titles = list(summary.index)
+        per_page = GRID_ROWS * GRID_COLS
+        for page, first in enumerate(range(0, len(titles), per_page)):
+            image = draw_trend_grid(fig, frame, titles[first:first + per_page], ylim)
+            pdf.add_page()
+            pdf.set_font("Arial", 'B', 16)
+            pdf.cell(0, 10, sanitize_text("Dyslexia-Friendly Score by Chapter"), ln=True)
+            add_chart(pdf, f"trend_grid_{page}", image, x=10, y=22, w=180)
+
+    # Leave-one-out z-scores need at least three titles.
+    if len(summary) > 2:
+        with stage("comparison.profile_heatmap"):
+            image = draw_profile_heatmap(summary, metrics)
+        pdf.add_page()
+        pdf.set_font("Arial", 'B', 16)
+        pdf.cell(0, 10, sanitize_text("Feature Profile Across Titles"), ln=True)
+        height = 180 * image['h'] / image['w']
+        add_chart(pdf, "profile", image, x=10, y=25, w=180 if height <= 250 else 180 * 250 / height)
+
+    with stage("report.pdf_output"):
+        pdf_output = pdf.output(dest='S').encode('latin1')
+    return BytesIO(pdf_output), summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare many titles in one PDF report.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--csv", help="Combined chapter CSV, as batch_analyze.py writes.")
+    source.add_argument("--store", nargs="?", const="", default=None,
+                        help="Read titles from the metrics store (default location if no directory is given).")
+    parser.add_argument("--title", action="append", default=None, help="Compare only this title; repeatable.")
+    parser.add_argument("-o", "--output", default="comparison_report.pdf")
+    parser.add_argument("--summary-csv", default=None, help="Also write the ranking table to this CSV.")
+    args = parser.parse_args(argv)
+
+    if args.csv:
+        frame = pd.read_csv(args.csv)
+        if args.title:
+            frame = frame[frame["Title"].isin(args.title)]
+    else:
+        from metrics_store import open_metrics_store
+        store = open_metrics_store(args.store) if args.store else open_metrics_store()
+        frame = store.scan(titles=args.title)
+    if frame.empty:
+        parser.error("no chapters to compare")
+
+    pdf_buffer, summary = generate_comparison_report(frame)
+    with open(args.output, "wb") as f:
+        f.write(pdf_buffer.getvalue())
+    if args.summary_csv:
+        summary.to_csv(args.summary_csv, index_label="Title")
+    print(f"Compared {len(summary)} titles; wrote {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+import zipfile
+from xml.etree.ElementTree import iterparse
+
+# Reads paragraph text out of a .docx without building a document model:
+# word/document.xml is streamed from the zip through an incremental parser
+# and each body paragraph is yielded as soon as its closing tag is seen.
+# Elements are dropped once read, so memory stays flat however long the
+# manuscript is. The text matches python-docx's Document(...).paragraphs:
+# only runs directly in the paragraph or in a hyperlink count (tracked
+# insertions, content controls and text boxes are skipped), tables are
+# skipped, and tabs, line breaks and non-breaking hyphens become "\t", "\n"
+# and "-".
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+BODY = W + "body"
+PARAGRAPH = W + "p"
+RUN = W + "r"
+HYPERLINK = W + "hyperlink"
+TEXT = W + "t"
+BREAK = W + "br"
+BREAK_TYPE = W + "type"
+RUN_CONTENT = {
+    W + "tab": "\t",
+    W + "ptab": "\t",
+    W + "cr": "\n",
+    W + "noBreakHyphen": "-",
+}
+DOCUMENT_PART = "word/document.xml"
+
+def iter_docx_paragraphs(source):
+    # `source` is a path or a seekable binary file object.
+    with zipfile.ZipFile(source) as archive, archive.open(DOCUMENT_PART) as part:
+        path = []
+        parts = []
+        body = None
+        for event, elem in iterparse(part, events=("start", "end")):
+            if event == "start":
+                path.append(elem.tag)
+                if elem.tag == BODY:
+                    body = elem
+                continue
+
+            depth = len(path)
+            # document/body/p/r/<content> or document/body/p/hyperlink/r/<content>
+            if depth >= 5 and path[1] == BODY and path[2] == PARAGRAPH and path[-2] == RUN and (
+                depth == 5 or (depth == 6 and path[3] == HYPERLINK)
+            ):
+                tag = elem.tag
+                if tag == TEXT:
+                    if elem.text:
+                        parts.append(elem.text)
+                elif tag == BREAK:
+                    if elem.get(BREAK_TYPE, "textWrapping") == "textWrapping":
+                        parts.append("\n")
+                elif tag in RUN_CONTENT:
+                    parts.append(RUN_CONTENT[tag])
+            elif depth == 3 and path[1] == BODY:
+                if elem.tag == PARAGRAPH:
+                    yield "".join(parts)
+                    parts = []
+                # Every finished body child has been read; let it go.
+                body.clear()
+            path.pop()
+
+def read_docx_text(source):
+    # The whole document as one string, one paragraph per line.
+    return "\n".join(iter_docx_paragraphs(source))
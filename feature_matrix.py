@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+from features import METRIC_COLUMNS, RARE_SUFFIXES, SENSORY_WORDS, Document
+from instrumentation import stage
+from readability_utils import get_sentence_tokenizer
+from running_stats import RunningStats
+from syllables import count_syllables
+
+FEATURE_COLUMNS = METRIC_COLUMNS
+# Characters of chapter text chapter_frame scores in one feature_matrix call.
+BLOCK_CHARS = 2_000_000
+
+def extract_word_arrays(texts):
+    # Flat per-word arrays for a whole batch; the words of document i are
+    # offsets[i]:offsets[i+1]. Per-word features are computed once per
+    # distinct word in the batch and gathered through vocabulary ids.
+    vocab = {}
+    word_ids = []
+    offsets = [0]
+    sentence_counts = []
+    passive_counts = []
+    sentence_tokenizer = get_sentence_tokenizer()
+    for text in texts:
+        document = Document(text, splitter=sentence_tokenizer)
+        word_ids.extend([vocab.setdefault(w, len(vocab)) for w in document.get("words")])
+        offsets.append(len(word_ids))
+        sentence_counts.append(document.feature("sentence_count"))
+        passive_counts.append(document.feature("passive_count"))
+
+    types = list(vocab)
+    lowered = [w.lower() for w in types]
+    type_lengths = np.fromiter(map(len, types), dtype=np.int32, count=len(types))
+    type_syllables = np.fromiter(map(count_syllables, lowered), dtype=np.int32, count=len(types))
+    type_rare = (type_lengths > 10) | np.fromiter((w.endswith(RARE_SUFFIXES) for w in types), dtype=bool, count=len(types))
+    type_sensory = np.fromiter((w in SENSORY_WORDS for w in lowered), dtype=bool, count=len(types))
+
+    ids = np.asarray(word_ids, dtype=np.int64)
+    return {
+        "offsets": np.asarray(offsets, dtype=np.int64),
+        "lengths": type_lengths[ids],
+        "syllables": type_syllables[ids],
+        "rare": type_rare[ids],
+        "sensory": type_sensory[ids],
+        "sentence_counts": np.asarray(sentence_counts, dtype=np.int64),
+        "passive_counts": np.asarray(passive_counts, dtype=np.int64),
+    }
+
+def segment_sums(values, offsets):
+    totals = np.concatenate(([0], np.cumsum(values, dtype=np.int64)))
+    return totals[offsets[1:]] - totals[offsets[:-1]]
+
+def dyslexia_friendly_scores(avg_sentence_len, avg_word_len, avg_syllables, passive_ratio, sensory_ratio, rare_ratio):
+    # Same formula, evaluation order and rounding as analyze_text, over
+    # whole arrays. The rounding goes through Python's round(): np.round
+    # scales by 100 first and lands on the other side of some halfway
+    # values.
+    score = (
+        30 * (1 - np.minimum(avg_sentence_len / 20, 1)) +
+        15 * (1 - np.minimum(avg_word_len / 8, 1)) +
+        15 * (1 - np.minimum(avg_syllables / 3, 1)) +
+        10 * (1 - passive_ratio) +
+        10 * sensory_ratio +
+        20 * (1 - rare_ratio)
+    )
+    return np.fromiter((round(value, 2) for value in score.tolist()), dtype=np.float64, count=len(score))
+
+def feature_matrix(texts, titles=None):
+    arrays = extract_word_arrays(texts)
+    offsets = arrays["offsets"]
+    word_count = np.diff(offsets)
+    sentence_count = arrays["sentence_counts"]
+    passive_count = arrays["passive_counts"]
+    rare_words = segment_sums(arrays["rare"], offsets)
+    sensory_words = segment_sums(arrays["sensory"], offsets)
+
+    words = np.maximum(word_count, 1)
+    sentences = np.maximum(sentence_count, 1)
+    avg_sentence_len = word_count / sentences
+    avg_word_len = segment_sums(arrays["lengths"], offsets) / words
+    avg_syllables = segment_sums(arrays["syllables"], offsets) / words
+    score = dyslexia_friendly_scores(
+        avg_sentence_len, avg_word_len, avg_syllables,
+        passive_count / sentences, sensory_words / words, rare_words / words,
+    )
+
+    df = pd.DataFrame({
+        "Sentence Count": sentence_count,
+        "Word Count": word_count,
+        "Avg Sentence Length": avg_sentence_len,
+        "Avg Word Length": avg_word_len,
+        "Avg Syllables per Word": avg_syllables,
+        "Passive Sentences": passive_count,
+        "Rare/Abstract Words": rare_words,
+        "Sensory Words": sensory_words,
+        "Dyslexia-Friendly Score": score,
+    })
+    if titles is not None:
+        df.insert(0, "Chapter", list(titles))
+    return df
+
+def chapter_frame(chapters, cache=None, block_chars=BLOCK_CHARS):
+    # Metrics for an iterable of (title, text) chapters, such as a
+    # ChapterStream, as one DataFrame in chapter order. Chapters are scored
+    # through feature_matrix a block of about block_chars characters at a
+    # time, so a long manuscript is never held whole. With a
+    # result_cache.ResultCache, cached chapters are read from it and the
+    # rest are written back.
+    frames = []
+    block = []
+    size = 0
+    for chapter in chapters:
+        block.append(chapter)
+        size += len(chapter[1])
+        if size >= block_chars:
+            frames.append(_score_block(block, cache))
+            block, size = [], 0
+    if block or not frames:
+        frames.append(_score_block(block, cache))
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+def _score_block(chapters, cache):
+    texts = [chap_text for _, chap_text in chapters]
+    keys = [cache.key(text) for text in texts] if cache is not None else [None] * len(texts)
+    cached = [cache.get(key) for key in keys] if cache is not None else [None] * len(texts)
+    todo = [i for i, metrics in enumerate(cached) if metrics is None]
+    with stage("feature_matrix") as info:
+        scored = feature_matrix([texts[i] for i in todo])
+        info["words"] = int(scored["Word Count"].sum())
+    scored.index = todo
+    if cache is not None:
+        for i, row in zip(todo, scored.to_dict("records")):
+            cache.put(keys[i], row)
+    hits = [i for i, metrics in enumerate(cached) if metrics is not None]
+    if hits:
+        found = pd.DataFrame([cached[i] for i in hits], index=hits)[FEATURE_COLUMNS]
+        scored = pd.concat([scored, found]).sort_index() if todo else found
+    scored = scored.reset_index(drop=True)
+    scored.insert(0, "Chapter", [chap_title for chap_title, _ in chapters])
+    return scored
+
+def z_scores(df, columns=None):
+    # Column-wise z-scores with the sample standard deviation, as pandas'
+    # .std() computes them in the report generators.
+    columns = columns or [col for col in FEATURE_COLUMNS if col in df.columns]
+    stats = RunningStats.from_frame(df, columns)
+    return pd.DataFrame(stats.z_scores(df[columns].to_numpy(dtype=np.float64)), columns=columns, index=df.index)
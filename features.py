@@ -0,0 +1,183 @@
+import re
+
+from lexicon import SENSE_LEXICON
+from syllables import count_syllables
+
+# The one feature-extraction engine behind every scorer. Features are
+# declared in a registry together with the intermediates they read (word
+# tokens, lowercased tokens, sentence spans, ...), and intermediates declare
+# what they are built from. Registering a feature resolves its whole chain
+# of intermediates once, in dependency order; a Document then builds each
+# intermediate at most once, the first time any feature asks for it, so a
+# document's text is split into words once and into sentences once however
+# many features are read from it.
+
+WORD_PATTERN = re.compile(r'\b\w+\b')
+# Splitting on word runs yields the words and the text between them in one
+# pass: [before, word, gap, word, gap, ..., word, after].
+TOKEN_SPLIT = re.compile(r'(\w+)')
+
+PASSIVE_AUXILIARIES = frozenset(['is', 'was', 'were', 'been', 'being', 'are', 'am', 'be'])
+RARE_SUFFIXES = ('ion', 'ity', 'ment')
+SENSORY_WORDS = SENSE_LEXICON.single_words
+
+# Chapter metric columns, in report order.
+METRIC_COLUMNS = [
+    "Sentence Count",
+    "Word Count",
+    "Avg Sentence Length",
+    "Avg Word Length",
+    "Avg Syllables per Word",
+    "Passive Sentences",
+    "Rare/Abstract Words",
+    "Sensory Words",
+    "Dyslexia-Friendly Score",
+]
+
+# name -> (needs, function); "text" is every document's starting point.
+INTERMEDIATES = {}
+FEATURES = {}
+
+class Feature:
+    def __init__(self, name, needs, fn):
+        self.name = name
+        self.needs = needs
+        self.fn = fn
+        self.steps = resolve(needs)
+
+def resolve(needs):
+    # Every intermediate behind `needs`, each after the ones it is built from.
+    steps = []
+
+    def visit(name, chain):
+        if name in steps or name == "text":
+            return
+        if name not in INTERMEDIATES:
+            raise KeyError(f"unknown intermediate {name!r}")
+        if name in chain:
+            raise ValueError(f"intermediate {name!r} depends on itself")
+        for need in INTERMEDIATES[name][0]:
+            visit(need, chain + (name,))
+        steps.append(name)
+
+    for need in needs:
+        visit(need, ())
+    return tuple(steps)
+
+def intermediate(name, needs=("text",)):
+    def register(fn):
+        INTERMEDIATES[name] = (tuple(needs), fn)
+        return fn
+    return register
+
+def feature(name, needs):
+    # The function is called with the listed intermediates, in order.
+    def register(fn):
+        FEATURES[name] = Feature(name, tuple(needs), fn)
+        return fn
+    return register
+
+class Document:
+    # One text and the intermediates built from it so far. Values known in
+    # advance (a shared "splitter", say) can be passed in by name.
+    # `built` lists the intermediates in the order they were computed.
+
+    def __init__(self, text, **known):
+        self.values = {"text": text, **known}
+        self.built = []
+
+    def get(self, name):
+        if name not in self.values:
+            self._build(resolve((name,)))
+        return self.values[name]
+
+    def feature(self, name):
+        spec = FEATURES[name]
+        self._build(spec.steps)
+        values = self.values
+        return spec.fn(*[values[need] for need in spec.needs])
+
+    def _build(self, steps):
+        values = self.values
+        for step in steps:
+            if step not in values:
+                needs, fn = INTERMEDIATES[step]
+                values[step] = fn(*[values[need] for need in needs])
+                self.built.append(step)
+
+    def extract(self, names=None):
+        return {name: self.feature(name) for name in (FEATURES if names is None else names)}
+
+def extract(text, names=None, **known):
+    return Document(text, **known).extract(names)
+
+@intermediate("tokens")
+def _tokens(text):
+    return TOKEN_SPLIT.split(text)
+
+@intermediate("words", needs=("tokens",))
+def _words(tokens):
+    return tokens[1::2]
+
+@intermediate("gaps", needs=("tokens",))
+def _gaps(tokens):
+    # gaps[i] is the text between words[i] and words[i + 1].
+    return tokens[2::2]
+
+@intermediate("lower_words", needs=("words",))
+def _lower_words(words):
+    return list(map(str.lower, words))
+
+@intermediate("splitter", needs=())
+def _splitter():
+    from readability_utils import get_sentence_tokenizer
+    return get_sentence_tokenizer()
+
+@intermediate("sentence_spans", needs=("splitter", "text"))
+def _sentence_spans(splitter, text):
+    return list(splitter.span_tokenize(text))
+
+@feature("sentence_count", needs=("sentence_spans",))
+def sentence_count(spans):
+    return len(spans)
+
+@feature("word_count", needs=("words",))
+def word_count(words):
+    return len(words)
+
+@feature("total_length", needs=("words",))
+def total_length(words):
+    return sum(map(len, words))
+
+@feature("total_syllables", needs=("words",))
+def total_syllables(words):
+    return sum(map(count_syllables, words))
+
+@feature("rare_words", needs=("words",))
+def rare_words(words):
+    return sum(1 for word in words if len(word) > 10 or word.endswith(RARE_SUFFIXES))
+
+@feature("sensory_words", needs=("lower_words",))
+def sensory_words(lower_words):
+    return sum(1 for word in lower_words if word in SENSORY_WORDS)
+
+@feature("passive_count", needs=("words", "gaps"))
+def passive_count(words, gaps):
+    # An auxiliary followed, across whitespace only, by a word ending in "ed".
+    return sum(
+        1 for aux, gap, word in zip(words, gaps, words[1:])
+        if aux in PASSIVE_AUXILIARIES and len(word) > 2 and word.endswith("ed") and gap.isspace()
+    )
+
+@feature("unique_words", needs=("lower_words",))
+def unique_words(lower_words):
+    return len(set(lower_words))
+
+@feature("sense_counts", needs=("lower_words",))
+def sense_counts(lower_words):
+    # Per-sense lexicon hits, phrases included.
+    return SENSE_LEXICON.count_tokens(lower_words)
+
+# The totals extract_features returns and metrics_from_features reads; they
+# add up across pieces of a text.
+FEATURE_TOTALS = ("word_count", "total_length", "total_syllables", "rare_words", "sensory_words", "passive_count")
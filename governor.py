@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+
+# Limits that keep one enormous upload from holding the server: a cap on
+# upload size, a wall-clock budget per job, a budget on the chapter text a
+# job has in flight to the workers at once, and a cap on how many heavy
+# jobs run together (jobs.JobManager gives them their own runner threads).
+# Oversized chapters are split into segments
+# (readability_utils.segment_bounds) whose totals merge into the same
+# metrics. Every limit can be set from the environment; 0 turns the upload,
+# time and memory limits off.
+
+MAX_UPLOAD_MB = float(os.environ.get("READABILITY_MAX_UPLOAD_MB", "50"))
+JOB_SECONDS = float(os.environ.get("READABILITY_JOB_SECONDS", "600"))
+JOB_MEMORY_MB = float(os.environ.get("READABILITY_JOB_MEMORY_MB", "256"))
+SEGMENT_CHARS = int(os.environ.get("READABILITY_SEGMENT_CHARS", "200000"))
+# A job with more text than this waits for a heavy-job slot.
+HEAVY_JOB_CHARS = int(os.environ.get("READABILITY_HEAVY_JOB_CHARS", "2000000"))
+MAX_HEAVY_JOBS = int(os.environ.get("READABILITY_MAX_HEAVY_JOBS", "1"))
+
+class BudgetExceeded(Exception):
+    pass
+
+def upload_error(size, limit_mb=MAX_UPLOAD_MB):
+    # The message to show for an upload of `size` bytes, or None if it fits.
+    if limit_mb and size > limit_mb * 1024 * 1024:
+        return f"The file is {size / 1024 / 1024:.1f} MB; uploads are limited to {limit_mb:g} MB."
+    return None
+
+def text_bytes(text):
+    return sys.getsizeof(text)
+
+class Budget:
+    # One job's limits. The clock starts at start(), once the job has been
+    # admitted. Memory counts the chapter text sent to workers and not yet
+    # back, which is what a job adds to the server's footprint beyond its
+    # upload; when fits() says no, the caller collects results before
+    # sending more. Nothing in flight always fits, so one segment larger
+    # than the budget still gets through.
+
+    def __init__(self, seconds=JOB_SECONDS, memory_mb=JOB_MEMORY_MB):
+        self.seconds = seconds
+        self.memory_bytes = int(memory_mb * 1024 * 1024)
+        self.deadline = None
+        self.in_flight = 0
+        self.peak = 0
+        self.reason = None
+
+    def start(self):
+        if self.seconds:
+            self.deadline = time.monotonic() + self.seconds
+        return self
+
+    def remaining(self):
+        # Seconds left, or None without a time limit.
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def expired(self):
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def check(self):
+        if self.expired():
+            raise self.out_of_time()
+
+    def out_of_time(self):
+        # Marks the budget spent and returns the exception to raise.
+        self.reason = f"time budget of {self.seconds:g}s ran out"
+        return BudgetExceeded(self.reason)
+
+    def fits(self, nbytes):
+        return not self.memory_bytes or not self.in_flight or self.in_flight + nbytes <= self.memory_bytes
+
+    def reserve(self, nbytes):
+        self.in_flight += nbytes
+        self.peak = max(self.peak, self.in_flight)
+
+    def release(self, nbytes):
+        self.in_flight -= nbytes
+
+    def as_dict(self):
+        return {"seconds": self.seconds, "memory_bytes": self.memory_bytes, "peak_bytes": self.peak,
+                "remaining_s": self.remaining(), "reason": self.reason}
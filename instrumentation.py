@@ -0,0 +1,275 @@
+import cProfile
+import functools
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+# Per-stage timings for the analysis pipeline. Code marks its stages with
+# stage("name") (or @instrumented("name")); those calls cost a context
+# variable lookup and do nothing unless a StageRecorder has been made
+# active with recording(). Each thread, and each pool worker, has its own
+# active recorder; worker recorders are pickled back and merged.
+
+_active = ContextVar("readability_stage_recorder", default=None)
+PROFILE_ROWS = 25
+
+class StageRecorder:
+    # Totals per stage name: calls, wall and CPU seconds, net allocated
+    # blocks and words processed, plus one entry per analyzed chapter.
+    # profile=True runs cProfile inside every stage; trace_memory=True adds
+    # each stage's tracemalloc peak. Both are off by default as they slow
+    # the pipeline down considerably.
+
+    def __init__(self, profile=False, trace_memory=False):
+        self.profile = profile
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self.chapters = []
+        self.chapter_count = 0
+        self.profile_stats = {}
+        self._lock = threading.Lock()
+        self._profiler = None
+        self._profile_depth = 0
+        self._memory_frames = []
+        self._started_tracing = False
+
+    def __getstate__(self):
+        self._collect_profile()
+        state = self.__dict__.copy()
+        state.update(_lock=None, _profiler=None, _profile_depth=0, _memory_frames=[], _started_tracing=False)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name, words=0):
+        # Yields a dict; set info["words"] inside the block when the word
+        # count is only known at the end. wall_s and cpu_s are filled in on
+        # exit.
+        info = {"words": words}
+        if self.trace_memory:
+            self._push_memory()
+        if self.profile:
+            self._start_profile()
+        blocks = sys.getallocatedblocks()
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            yield info
+        finally:
+            info["wall_s"] = time.perf_counter() - wall
+            info["cpu_s"] = time.thread_time() - cpu
+            allocated = sys.getallocatedblocks() - blocks
+            if self.profile:
+                self._stop_profile()
+            peak = self._pop_memory() if self.trace_memory else None
+            self.record(name, info["wall_s"], info["cpu_s"], allocated, info["words"], peak)
+
+    def record(self, name, wall_s, cpu_s, alloc_blocks=0, words=0, peak_bytes=None):
+        with self._lock:
+            entry = self.stages.get(name)
+            if entry is None:
+                entry = self.stages[name] = {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "alloc_blocks": 0, "words": 0}
+            entry["calls"] += 1
+            entry["wall_s"] += wall_s
+            entry["cpu_s"] += cpu_s
+            entry["alloc_blocks"] += alloc_blocks
+            entry["words"] += words
+            if peak_bytes is not None:
+                entry["peak_bytes"] = max(entry.get("peak_bytes", 0), peak_bytes)
+
+    def add_chapter(self, title, info):
+        with self._lock:
+            self.chapter_count += 1
+            self.chapters.append({
+                "chapter": title,
+                "words": info["words"],
+                "wall_s": info["wall_s"],
+                "cpu_s": info["cpu_s"],
+                "words_per_sec": info["words"] / info["wall_s"] if info["wall_s"] else None,
+            })
+
+    def merge(self, other, chapters=True):
+        # chapters=False keeps only the chapter count, for long-lived totals.
+        other._collect_profile()
+        with self._lock:
+            for name, theirs in other.stages.items():
+                entry = self.stages.setdefault(name, {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "alloc_blocks": 0, "words": 0})
+                for field in ("calls", "wall_s", "cpu_s", "alloc_blocks", "words"):
+                    entry[field] += theirs[field]
+                if "peak_bytes" in theirs:
+                    entry["peak_bytes"] = max(entry.get("peak_bytes", 0), theirs["peak_bytes"])
+            self.chapter_count += other.chapter_count
+            if chapters:
+                self.chapters.extend(other.chapters)
+            for func, stat in other.profile_stats.items():
+                mine = self.profile_stats.get(func)
+                self.profile_stats[func] = pstats.add_func_stats(mine, stat) if mine else stat
+        return self
+
+    def as_dict(self, profile_rows=PROFILE_ROWS):
+        # JSON-ready summary: the shape shown in the app's performance panel
+        # and written per manuscript by batch_analyze.py --metrics-jsonl.
+        self._collect_profile()
+        with self._lock:
+            stages = {}
+            for name, entry in self.stages.items():
+                stage = dict(entry)
+                stage["words_per_sec"] = entry["words"] / entry["wall_s"] if entry["words"] and entry["wall_s"] else None
+                stages[name] = stage
+            summary = {"stages": stages, "chapters": list(self.chapters)}
+            if self.profile_stats:
+                rows = sorted(self.profile_stats.items(), key=lambda item: -item[1][3])[:profile_rows]
+                summary["profile"] = [
+                    {"function": pstats.func_std_string(func), "calls": stat[1], "tottime": stat[2], "cumtime": stat[3]}
+                    for func, stat in rows
+                ]
+            return summary
+
+    def to_prometheus(self, prefix="readability"):
+        with self._lock:
+            stages = {name: dict(entry) for name, entry in self.stages.items()}
+            chapters = self.chapter_count
+        metrics = [
+            ("stage_calls_total", "counter", "Times each pipeline stage ran.", "calls"),
+            ("stage_wall_seconds_total", "counter", "Wall-clock seconds spent in each stage.", "wall_s"),
+            ("stage_cpu_seconds_total", "counter", "CPU seconds spent in each stage.", "cpu_s"),
+            ("stage_words_total", "counter", "Words processed by each stage.", "words"),
+            ("stage_alloc_blocks", "gauge", "Net memory blocks allocated by each stage.", "alloc_blocks"),
+            ("stage_peak_bytes", "gauge", "Largest tracemalloc peak seen in each stage.", "peak_bytes"),
+        ]
+        lines = []
+        for metric, kind, help_text, field in metrics:
+            samples = [(name, entry[field]) for name, entry in sorted(stages.items()) if field in entry]
+            if not samples:
+                continue
+            lines.append(f"# HELP {prefix}_{metric} {help_text}")
+            lines.append(f"# TYPE {prefix}_{metric} {kind}")
+            for name, value in samples:
+                label = name.replace("\\", "\\\\").replace('"', '\\"')
+                lines.append(f'{prefix}_{metric}{{stage="{label}"}} {value}')
+        lines.append(f"# HELP {prefix}_chapters_total Chapters analyzed.")
+        lines.append(f"# TYPE {prefix}_chapters_total counter")
+        lines.append(f"{prefix}_chapters_total {chapters}")
+        return "\n".join(lines) + "\n"
+
+    def _start_profile(self):
+        if self._profile_depth == 0:
+            if self._profiler is None:
+                self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        self._profile_depth += 1
+
+    def _stop_profile(self):
+        self._profile_depth -= 1
+        if self._profile_depth == 0:
+            self._profiler.disable()
+
+    def _collect_profile(self):
+        # Fold the live profiler's counts into profile_stats.
+        if self._profiler is None or self._profile_depth:
+            return
+        self._profiler.create_stats()
+        for func, stat in self._profiler.stats.items():
+            mine = self.profile_stats.get(func)
+            self.profile_stats[func] = pstats.add_func_stats(mine, stat) if mine else stat
+        self._profiler = None
+
+    def _push_memory(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        current, peak = tracemalloc.get_traced_memory()
+        # A nested stage resets the peak, so the enclosing stage keeps the
+        # highest peak seen before that.
+        if self._memory_frames:
+            self._memory_frames[-1][1] = max(self._memory_frames[-1][1], peak)
+        tracemalloc.reset_peak()
+        self._memory_frames.append([current, current])
+
+    def _pop_memory(self):
+        start, peak = self._memory_frames.pop()
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        if self._memory_frames:
+            self._memory_frames[-1][1] = max(self._memory_frames[-1][1], peak)
+        elif self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        return peak - start
+
+def current_recorder():
+    return _active.get()
+
+@contextmanager
+def recording(recorder):
+    token = _active.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _active.reset(token)
+
+def stage(name, words=0):
+    recorder = _active.get()
+    if recorder is None:
+        return nullcontext({"words": words})
+    return recorder.stage(name, words)
+
+def instrumented(name):
+    # Records every call of the decorated function as stage `name`.
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            recorder = _active.get()
+            if recorder is None:
+                return fn(*args, **kwargs)
+            with recorder.stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def timed_iter(iterable, name):
+    # Records the time spent producing each item of `iterable` (a chapter
+    # stream reading and parsing its file, say) without the consumer's time.
+    recorder = _active.get()
+    if recorder is None:
+        yield from iterable
+        return
+    it = iter(iterable)
+    while True:
+        with recorder.stage(name):
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+        yield item
+
+def serve_metrics(recorder, port, host="127.0.0.1"):
+    # Serves recorder.to_prometheus() at http://host:port/metrics from a
+    # daemon thread. Returns the server; call shutdown() to stop it.
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = recorder.to_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="readability-metrics", daemon=True).start()
+    return server
@@ -0,0 +1,461 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from functools import lru_cache
+
+from governor import (HEAVY_JOB_CHARS, JOB_MEMORY_MB, JOB_SECONDS, MAX_HEAVY_JOBS, SEGMENT_CHARS, Budget,
+                      BudgetExceeded, text_bytes)
+from instrumentation import StageRecorder, current_recorder, recording, serve_metrics, stage
+from readability_utils import (analyze_segment_recorded, analyze_text_recorded, get_sentence_tokenizer,
+                               merge_segments, segment_bounds)
+from result_cache import chapter_key, open_cache
+
+DEFAULT_JOB_DB = os.environ.get(
+    "READABILITY_JOB_DB",
+    os.path.join(os.path.expanduser("~"), ".cache", "dyslexia-readability", "jobs.sqlite3"),
+)
+JOB_RETENTION_SECONDS = 7 * 24 * 3600
+# A queued or running job not updated for this long belongs to a process
+# that has gone away.
+STALE_JOB_SECONDS = 15 * 60
+# "partial" jobs ran out of budget; their report covers the chapters
+# finished in time and `error` says which budget ran out.
+FINISHED = ("done", "partial", "failed", "cancelled", "interrupted")
+
+class JobStore:
+    # Jobs and their per-chapter results in SQLite, so finished and partial
+    # work survives browser refreshes and app restarts.
+
+    def __init__(self, path=DEFAULT_JOB_DB):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.executescript(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, status TEXT NOT NULL, total INTEGER NOT NULL, completed INTEGER NOT NULL,"
+                " created REAL NOT NULL, updated REAL NOT NULL, metadata TEXT NOT NULL, previous TEXT,"
+                " error TEXT, window_scores TEXT, pdf BLOB);"
+                "CREATE TABLE IF NOT EXISTS job_results ("
+                " job_id TEXT NOT NULL, idx INTEGER NOT NULL, key TEXT NOT NULL, metrics TEXT NOT NULL,"
+                " PRIMARY KEY (job_id, idx));"
+            )
+            # Job databases from before stage timings were kept lack the column.
+            if "perf" not in {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN perf TEXT")
+            self._conn.commit()
+
+    def create(self, metadata, total, previous=None):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, total, completed, created, updated, metadata, previous)"
+                " VALUES (?, 'queued', ?, 0, ?, ?, ?, ?)",
+                (job_id, total, now, now, json.dumps(metadata), json.dumps(previous) if previous else None),
+            )
+            self._conn.commit()
+        return job_id
+
+    def add_result(self, job_id, idx, key, metrics):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO job_results (job_id, idx, key, metrics) VALUES (?, ?, ?, ?)",
+                (job_id, idx, key, json.dumps(metrics)),
+            )
+            self._conn.execute(
+                "UPDATE jobs SET completed = completed + 1, updated = ? WHERE id = ?", (time.time(), job_id)
+            )
+            self._conn.commit()
+
+    def set_status(self, job_id, status, error=None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = COALESCE(?, error), updated = ? WHERE id = ?",
+                (status, error, time.time(), job_id),
+            )
+            self._conn.commit()
+
+    def set_report(self, job_id, pdf_bytes, window_scores=None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET pdf = ?, window_scores = ?, updated = ? WHERE id = ?",
+                (pdf_bytes, window_scores, time.time(), job_id),
+            )
+            self._conn.commit()
+
+    def set_perf(self, job_id, perf):
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET perf = ? WHERE id = ?", (json.dumps(perf), job_id))
+            self._conn.commit()
+
+    def perf(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT perf FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, status, total, completed, created, updated, metadata, previous, error, pdf IS NOT NULL"
+                " FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0], "status": row[1], "total": row[2], "completed": row[3], "created": row[4],
+            "updated": row[5], "metadata": json.loads(row[6]), "previous": json.loads(row[7]) if row[7] else None,
+            "error": row[8], "has_report": bool(row[9]),
+        }
+
+    def results(self, job_id):
+        # (keys, metrics) for the chapters finished so far, in chapter order.
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, metrics FROM job_results WHERE job_id = ? ORDER BY idx", (job_id,)
+            ).fetchall()
+        return [r[0] for r in rows], [json.loads(r[1]) for r in rows]
+
+    def report(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT pdf FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bytes(row[0]) if row and row[0] is not None else None
+
+    def mark_interrupted(self, stale_after=STALE_JOB_SECONDS):
+        # Jobs left queued or running by a dead process will never finish.
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'interrupted', updated = ?"
+                " WHERE status IN ('queued', 'running') AND updated < ?",
+                (now, now - stale_after),
+            )
+            self._conn.commit()
+
+    def purge(self, older_than=JOB_RETENTION_SECONDS):
+        cutoff = time.time() - older_than
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM job_results WHERE job_id IN (SELECT id FROM jobs WHERE updated < ?)", (cutoff,)
+            )
+            self._conn.execute("DELETE FROM jobs WHERE updated < ?", (cutoff,))
+            self._conn.commit()
+
+class Part:
+    # One pool task of a job: a whole chapter, or one segment of an
+    # oversized chapter (joined is then True or False, as segment_bounds
+    # gives it).
+    __slots__ = ("future", "nbytes", "joined", "result")
+
+    def __init__(self, future, nbytes, joined=None):
+        self.future = future
+        self.nbytes = nbytes
+        self.joined = joined
+        self.result = None
+
+class JobManager:
+    # Runs analysis jobs in the background. Each job is a chapter_pipeline
+    # whose analysis and passage-scoring stages feed a process pool shared
+    # by all jobs, each keeping at most two chapters per worker in flight so
+    # concurrent jobs interleave instead of queueing behind each other.
+    # Results land in the JobStore chapter by chapter; the report is
+    # finished once the last one is in.
+    # Each job's stage timings are stored with it when it finishes and added
+    # to `recorder`, the running totals for the whole process. Completed
+    # titles are also added to `metrics_store`, if one is given.
+    # Jobs run under governor budgets: chapters over segment_chars go to the
+    # workers as segments, and a job out of time stops with a report on the
+    # chapters finished so far. A job with more than heavy_job_chars of text
+    # runs on its own set of max_heavy_jobs runner threads and queues there,
+    # so heavy jobs waiting their turn never hold up the max_jobs runners
+    # that everything else uses.
+
+    def __init__(self, store=None, max_workers=None, max_jobs=4, cache=None, profile=False, trace_memory=False,
+                 metrics_store=None, job_seconds=JOB_SECONDS, job_memory_mb=JOB_MEMORY_MB,
+                 segment_chars=SEGMENT_CHARS, heavy_job_chars=HEAVY_JOB_CHARS, max_heavy_jobs=MAX_HEAVY_JOBS):
+        self.store = store or JobStore()
+        self.metrics_store = metrics_store
+        self.store.mark_interrupted()
+        self.store.purge()
+        self.cache = cache
+        self.profile = profile
+        self.trace_memory = trace_memory
+        self.recorder = StageRecorder()
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=get_sentence_tokenizer)
+        self._runners = ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix="readability-job")
+        self._heavy_runners = ThreadPoolExecutor(max_workers=max(1, max_heavy_jobs),
+                                                 thread_name_prefix="readability-heavy-job")
+        self._cancel = {}
+        self._futures = {}
+        self._pipelines = {}
+        self.job_seconds = job_seconds
+        self.job_memory_mb = job_memory_mb
+        self.segment_chars = segment_chars
+        self.heavy_job_chars = heavy_job_chars
+
+    def submit(self, chapters, metadata, previous=None, window_size=0, recorder=None):
+        # `recorder` may carry timings taken before submission, such as parsing.
+        job_id = self.store.create(metadata, len(chapters), previous)
+        self._cancel[job_id] = threading.Event()
+        job_recorder = StageRecorder(profile=self.profile, trace_memory=self.trace_memory)
+        if recorder is not None:
+            job_recorder.merge(recorder)
+        chapters = list(chapters)
+        heavy = sum(len(chap_text) for _, chap_text in chapters) > self.heavy_job_chars
+        runners = self._heavy_runners if heavy else self._runners
+        future = runners.submit(self._run, job_id, chapters, metadata, previous, window_size, job_recorder)
+        self._futures[job_id] = future
+        future.add_done_callback(lambda _: self._futures.pop(job_id, None))
+        return job_id
+
+    def cancel(self, job_id):
+        event = self._cancel.get(job_id)
+        if event is not None:
+            event.set()
+        # A job still waiting for a runner never starts.
+        future = self._futures.get(job_id)
+        if future is not None and future.cancel():
+            self._cancel.pop(job_id, None)
+            self.store.set_status(job_id, "cancelled")
+
+    def shutdown(self):
+        for job_id in list(self._futures):
+            self.cancel(job_id)
+        self._runners.shutdown(wait=True)
+        self._heavy_runners.shutdown(wait=True)
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def _run(self, job_id, chapters, metadata, previous, window_size, recorder):
+        # The clock starts when a runner picks the job up, not at submission.
+        self.store.set_status(job_id, "running")
+        budget = Budget(self.job_seconds, self.job_memory_mb).start()
+        error = None
+        try:
+            with recording(recorder):
+                status = self._analyze(job_id, chapters, metadata, previous, window_size, budget)
+            if status == "partial":
+                error = budget.reason
+        except Exception as exc:
+            status, error = "failed", f"{type(exc).__name__}: {exc}"
+        finally:
+            self._cancel.pop(job_id, None)
+        # Timings go in before the final status, so a finished job always has them.
+        perf = recorder.as_dict()
+        perf["budget"] = budget.as_dict()
+        pipeline = self._pipelines.pop(job_id, None)
+        if pipeline is not None:
+            perf["pipeline"] = pipeline.stats()
+        self.store.set_perf(job_id, perf)
+        self.recorder.merge(recorder, chapters=False)
+        self.store.set_status(job_id, status, error=error)
+
+    def _analyze(self, job_id, chapters, metadata, previous, window_size, budget):
+        # parse -> analyze -> aggregate -> render, each stage in its own
+        # thread (chapter_pipeline). Passage scores for the hotspot page are
+        # worked out chapter by chapter while later chapters are still being
+        # analyzed; the pages that need the whole book wait for the last one.
+        # Work goes out to the pool only while fewer than two tasks per
+        # worker, and less than the budget's worth of text, are in flight.
+        # When the time budget runs out the unfinished chapters are dropped
+        # and the report is rendered from the rest.
+        from chapter_pipeline import Pipeline, PipelineStopped
+        from running_stats import RunningStats
+        from windowed import chapter_window_scores, window_score_frame
+
+        cancelled = self._cancel[job_id]
+        # Chapters already scored in the previous revision are not re-run.
+        known = dict(zip(previous["keys"], previous["results"])) if previous else {}
+        in_flight = self.max_workers * 2
+
+        def parse(_):
+            yield from enumerate(chapters)
+
+        def pieces(chap_title, chap_text):
+            # (text, joined, title) tasks for one chapter; joined is None
+            # for a chapter sent whole.
+            if len(chap_text) <= self.segment_chars:
+                return [(chap_text, None, chap_title)]
+            bounds = segment_bounds(chap_text, self.segment_chars)
+            return [(chap_text[start:end], joined, f"{chap_title} [{n}/{len(bounds)}]")
+                    for n, (start, end, joined) in enumerate(bounds, 1)]
+
+        def analyze(items):
+            pending = deque()
+            unresolved = deque()
+
+            def finished(keep):
+                # Hand on head chapters whose parts have all come back (or
+                # that were cached), leaving at least `keep` behind.
+                while len(pending) > keep and all(part.result is not None for part in pending[0][5]):
+                    yield self._finish(job_id, pending.popleft())
+
+            try:
+                for idx, (chap_title, chap_text) in items:
+                    # Out of budget: keep reading so parsing can finish, but
+                    # start nothing new.
+                    if budget.reason is not None:
+                        continue
+                    try:
+                        budget.check()
+                        key = chapter_key(chap_text)
+                        metrics = known.get(key)
+                        if metrics is None and self.cache is not None:
+                            metrics = self.cache.get(key)
+                        parts = []
+                        pending.append((idx, chap_title, chap_text, key, metrics, parts))
+                        for piece, joined, piece_title in pieces(chap_title, chap_text) if metrics is None else ():
+                            nbytes = text_bytes(piece)
+                            while unresolved and (len(unresolved) >= in_flight or not budget.fits(nbytes)):
+                                self._collect(unresolved.popleft(), budget)
+                                yield from finished(1)
+                            fn = analyze_text_recorded if joined is None else analyze_segment_recorded
+                            part = Part(self._pool.submit(fn, piece, piece_title, self.profile, self.trace_memory),
+                                        nbytes, joined)
+                            budget.reserve(nbytes)
+                            parts.append(part)
+                            unresolved.append(part)
+                        yield from finished(0)
+                    except BudgetExceeded:
+                        pass
+                try:
+                    while unresolved and budget.reason is None:
+                        self._collect(unresolved.popleft(), budget)
+                        yield from finished(0)
+                except BudgetExceeded:
+                    pass
+                # Whatever was complete when time ran out still counts.
+                yield from finished(0)
+            finally:
+                for part in unresolved:
+                    part.future.cancel()
+
+        def aggregate(items):
+            results = []
+            stats = None
+            for chap_title, chap_text, metrics in items:
+                results.append(metrics)
+                if stats is None:
+                    stats = RunningStats([col for col in metrics if col != "Chapter"])
+                stats.update(metrics)
+                yield "chapter", chap_title, chap_text
+            yield "book", results, stats
+
+        def render(items):
+            # Oversized chapters are windowed segment by segment, so no
+            # window spans a segment cut.
+            windows = deque()
+            rows = []
+            results = stats = None
+            try:
+                for kind, first, second in items:
+                    if kind == "book":
+                        results, stats = first, second
+                    elif window_size and budget.reason is None:
+                        texts = [piece for piece, _, _ in pieces(first, second)]
+                        windows.append((first, [self._pool.submit(chapter_window_scores, piece, window_size,
+                                                                  max(1, window_size // 4)) for piece in texts]))
+                        while len(windows) > in_flight:
+                            rows.append(self._window_row(windows.popleft(), budget))
+                with stage("window_scores"):
+                    while windows:
+                        rows.append(self._window_row(windows.popleft(), budget))
+            except BudgetExceeded:
+                rows = None
+            finally:
+                for _, futures in windows:
+                    for future in futures:
+                        future.cancel()
+            if results:
+                window_scores = window_score_frame(rows) if window_size and rows is not None else None
+                self._render_report(job_id, metadata, results, stats, window_scores, complete=budget.reason is None)
+            return ()
+
+        pipeline = Pipeline([("parse", parse), ("analyze", analyze), ("aggregate", aggregate), ("render", render)],
+                            stop=cancelled)
+        self._pipelines[job_id] = pipeline
+        try:
+            pipeline.run()
+        except PipelineStopped:
+            return "cancelled"
+        return "partial" if budget.reason is not None else "done"
+
+    def pipeline_stats(self, job_id):
+        # Live per-stage counts, throughput and queue depths of a running job.
+        pipeline = self._pipelines.get(job_id)
+        return pipeline.stats() if pipeline is not None else None
+
+    def _collect(self, part, budget):
+        # Waits for one pool task, no longer than the time budget allows.
+        try:
+            part.result, worker_recorder = part.future.result(timeout=budget.remaining())
+        except FutureTimeout:
+            raise budget.out_of_time() from None
+        current_recorder().merge(worker_recorder)
+        budget.release(part.nbytes)
+
+    def _window_row(self, entry, budget):
+        chap_title, futures = entry
+        scores = []
+        for future in futures:
+            try:
+                scores.extend(future.result(timeout=budget.remaining()))
+            except FutureTimeout:
+                raise budget.out_of_time() from None
+        return chap_title, scores
+
+    def _finish(self, job_id, entry):
+        idx, chap_title, chap_text, key, metrics, parts = entry
+        if metrics is None:
+            if parts[0].joined is None:
+                metrics = parts[0].result
+            else:
+                metrics = merge_segments([(*part.result, part.joined) for part in parts])
+            if self.cache is not None:
+                self.cache.put(key, metrics)
+        metrics = dict(metrics)
+        metrics["Chapter"] = chap_title
+        self.store.add_result(job_id, idx, key, metrics)
+        return chap_title, chap_text, metrics
+
+    def _render_report(self, job_id, metadata, results, stats, window_scores, complete=True):
+        # An incomplete (out of budget) report says so in its title and is
+        # kept out of the metrics store.
+        import pandas as pd
+        from validation_report_generator_wrapped import generate_enhanced_report
+
+        with stage("dataframe_assembly"):
+            df = pd.DataFrame(results)
+            df = df[["Chapter"] + [col for col in df.columns if col != "Chapter"]]
+        baseline = None
+        if self.metrics_store is not None:
+            # The catalogue as it was before this title, for comparison.
+            with stage("catalogue_baseline"):
+                baseline = self.metrics_store.baseline(exclude=[str(metadata.get("Title", "Untitled"))])
+        shown = metadata
+        if not complete:
+            total = self.store.get(job_id)["total"]
+            shown = dict(metadata, Title=f"{metadata.get('Title', 'Untitled')} (partial: {len(results)} of {total} chapters)")
+        pdf_buffer = generate_enhanced_report(df, shown, window_scores=window_scores, stats=stats, baseline=baseline)
+        self.store.set_report(job_id, pdf_buffer.getvalue(),
+                              window_scores.to_json() if window_scores is not None else None)
+        if self.metrics_store is not None and complete:
+            with stage("metrics_store_append"):
+                self.metrics_store.append(metadata, results)
+
+@lru_cache(maxsize=None)
+def get_job_manager(max_workers=None, profile=False, trace_memory=False, metrics_port=None):
+    # One manager per server process, shared by every session. With
+    # metrics_port, its stage totals are served for Prometheus on localhost.
+    from metrics_store import open_metrics_store
+    manager = JobManager(max_workers=max_workers, cache=open_cache(), profile=profile, trace_memory=trace_memory,
+                         metrics_store=open_metrics_store())
+    if metrics_port:
+        serve_metrics(manager.recorder, metrics_port)
+    return manager
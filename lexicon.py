@@ -0,0 +1,109 @@
+import csv
+import json
+import re
+from collections import Counter
+
+WORD_PATTERN = re.compile(r'\b\w+\b')
+
+SENSE_WORDS = {
+    'sight': ['look', 'see', 'glance', 'watch', 'glow', 'color', 'shine'],
+    'sound': ['hear', 'sound', 'ring', 'roar', 'echo', 'clang'],
+    'touch': ['feel', 'touch', 'warm', 'cold', 'rough', 'smooth'],
+    'smell': ['smell', 'scent', 'odor', 'fragrance'],
+    'taste': ['taste', 'flavor', 'bitter', 'sweet']
+}
+
+class Lexicon:
+    # Whole-word matcher for a {category: [entries]} word list, compiled once
+    # into a hash index keyed by each entry's first (lowercased) token.
+    # Matching is one pass over the text's tokens with a dict lookup per
+    # token, so its cost does not grow with the size of the lexicon. Entries
+    # may be multi-word phrases ("pitch black"); the longest phrase starting
+    # at a token wins.
+
+    def __init__(self, categories):
+        self.categories = list(categories)
+        self._index = {}
+        for category, entries in categories.items():
+            for entry in entries:
+                tokens = tuple(WORD_PATTERN.findall(entry.lower()))
+                if not tokens:
+                    continue
+                phrases = self._index.setdefault(tokens[0], {})
+                phrases.setdefault(tokens[1:], []).append(category)
+        # Longest continuation first, so the first phrase that fits wins.
+        self._index = {
+            first: sorted(((rest, tuple(cats)) for rest, cats in phrases.items()), key=lambda p: -len(p[0]))
+            for first, phrases in self._index.items()
+        }
+        self.single_words = frozenset(first for first, phrases in self._index.items() if any(not rest for rest, _ in phrases))
+        self._has_phrases = any(rest for phrases in self._index.values() for rest, _ in phrases)
+        self._word_categories = {first: phrases[-1][1] for first, phrases in self._index.items()}
+
+    @classmethod
+    def from_file(cls, path):
+        # JSON {"category": ["word", ...]} or CSV/TSV rows of "word,category".
+        if path.endswith(".json"):
+            with open(path, encoding="utf-8") as f:
+                return cls(json.load(f))
+        categories = {}
+        delimiter = "\t" if path.endswith((".tsv", ".tab")) else ","
+        with open(path, encoding="utf-8", newline="") as f:
+            for row in csv.reader(f, delimiter=delimiter):
+                if len(row) >= 2 and row[0].strip() and not row[0].startswith("#"):
+                    categories.setdefault(row[1].strip(), []).append(row[0].strip())
+        return cls(categories)
+
+    def matches(self, text):
+        # Yields (start, end, matched text, categories) for each whole-word hit.
+        spans = [m.span() for m in WORD_PATTERN.finditer(text)]
+        for first, last, cats in self._match_tokens([text[start:end].lower() for start, end in spans]):
+            start_pos, end_pos = spans[first][0], spans[last - 1][1]
+            yield start_pos, end_pos, text[start_pos:end_pos], cats
+
+    def _match_tokens(self, tokens):
+        # (first, end, categories) token ranges of each hit in a list of
+        # lowercased tokens.
+        i = 0
+        while i < len(tokens):
+            phrases = self._index.get(tokens[i])
+            matched = False
+            if phrases is not None:
+                for rest, cats in phrases:
+                    end = i + 1 + len(rest)
+                    if end <= len(tokens) and all(tokens[i + 1 + k] == word for k, word in enumerate(rest)):
+                        yield i, end, cats
+                        i = end
+                        matched = True
+                        break
+            if not matched:
+                i += 1
+
+    def count(self, text):
+        return self.count_tokens(list(map(str.lower, WORD_PATTERN.findall(text))))
+
+    def count_tokens(self, tokens):
+        # count() for text already split into lowercased word tokens.
+        counts = dict.fromkeys(self.categories, 0)
+        if not self._has_phrases:
+            # Single-word lexicons only need a tally of distinct tokens.
+            for word, n in Counter(tokens).items():
+                for category in self._word_categories.get(word, ()):
+                    counts[category] += n
+            return counts
+        for _, _, cats in self._match_tokens(tokens):
+            for category in cats:
+                counts[category] += 1
+        return counts
+
+    def analyze(self, text):
+        # Per-category counts plus the character offsets of every match.
+        counts = dict.fromkeys(self.categories, 0)
+        offsets = {category: [] for category in self.categories}
+        for start, end, _, cats in self.matches(text):
+            for category in cats:
+                counts[category] += 1
+                offsets[category].append((start, end))
+        return counts, offsets
+
+SENSE_LEXICON = Lexicon(SENSE_WORDS)
@@ -0,0 +1,392 @@
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from running_stats import RunningStats, group_stats, merged
+
+# Catalogue-wide chapter metrics in a columnar layout: one flat binary file
+# per column (int32 counts, float32 averages and scores), titles, authors
+# and chapter names dictionary-encoded to int32 codes, and a small JSON
+# manifest holding the dictionaries and the committed row count. Columns
+# are memory-mapped for reading, so a scan only pages in the columns it
+# filters or returns and never parses text.
+#
+# Storing a title appends its chapters under a new generation number and
+# points the title at it; earlier rows for that title become dead and
+# compact() drops them. An append writes the column files first and the
+# manifest last (atomically), so an interrupted write is never visible and
+# its partial tail is truncated by the next append. One writer at a time.
+#
+# The manifest also keeps each live title's running mean and variance per
+# metric, so a catalogue baseline over thousands of titles is a merge of
+# small per-title summaries rather than a pass over every stored chapter.
+
+DEFAULT_STORE_PATH = os.environ.get(
+    "READABILITY_METRICS_STORE",
+    os.path.join(os.path.expanduser("~"), ".cache", "dyslexia-readability", "metrics_store"),
+)
+FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+
+# (report column, file name, dtype)
+METRIC_COLUMNS = [
+    ("Sentence Count", "sentence_count", np.int32),
+    ("Word Count", "word_count", np.int32),
+    ("Avg Sentence Length", "avg_sentence_length", np.float32),
+    ("Avg Word Length", "avg_word_length", np.float32),
+    ("Avg Syllables per Word", "avg_syllables_per_word", np.float32),
+    ("Passive Sentences", "passive_sentences", np.int32),
+    ("Rare/Abstract Words", "rare_words", np.int32),
+    ("Sensory Words", "sensory_words", np.int32),
+    ("Dyslexia-Friendly Score", "score", np.float32),
+]
+KEY_COLUMNS = [
+    ("title_id", np.int32),
+    ("author_id", np.int32),
+    ("chapter_id", np.int32),
+    ("chapter_index", np.int32),
+    ("generation", np.int32),
+]
+METRIC_NAMES = [column for column, _, _ in METRIC_COLUMNS]
+DTYPES = dict(KEY_COLUMNS + [(name, dtype) for _, name, dtype in METRIC_COLUMNS])
+FILE_NAMES = {column: name for column, name, _ in METRIC_COLUMNS}
+DICTIONARIES = {"title_id": "Title", "author_id": "Author", "chapter_id": "Chapter"}
+FILTER_OPS = {
+    "<": np.less, "<=": np.less_equal, ">": np.greater, ">=": np.greater_equal,
+    "==": np.equal, "!=": np.not_equal,
+}
+WHERE_PATTERN = re.compile(r'^(.+?)\s*(<=|>=|==|!=|<|>)\s*(.+)$')
+
+class MetricsStore:
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._load_manifest()
+
+    @property
+    def rows(self):
+        return self._manifest["rows"]
+
+    def append(self, metadata, results):
+        # Stores one title's chapter metrics (analyze_chapters output or a
+        # feature_matrix.chapter_frame, in chapter order), replacing any
+        # earlier version of the title.
+        frame = pd.DataFrame(results).assign(Title=str(metadata.get("Title", "Untitled")),
+                                             Author=str(metadata.get("Author", "Unknown")))
+        self.append_frame(frame)
+
+    def append_frame(self, frame, extend=()):
+        # `frame` has Title, Author, Chapter and the metric columns and may
+        # hold several titles. Titles listed in `extend` keep their current
+        # rows and have these added after them, which lets a large file be
+        # imported in chunks; every other title is replaced.
+        if frame.empty:
+            return
+        with self._lock:
+            self._load_manifest()
+            manifest = self._manifest
+            n = len(frame)
+            title_ids = self._encode_values("title_id", frame["Title"].astype(str))
+            columns = {
+                "title_id": title_ids,
+                "author_id": self._encode_values("author_id", frame["Author"].astype(str)),
+                "chapter_id": self._encode_values("chapter_id", frame["Chapter"].astype(str)),
+            }
+            for column, name, dtype in METRIC_COLUMNS:
+                columns[name] = frame[column].to_numpy(dtype=dtype)
+
+            current = manifest["current"]
+            current.extend([-1] * (len(manifest["dictionaries"]["title_id"]) - len(current)))
+            groups, title_codes = pd.factorize(title_ids)
+            generations = np.empty(len(title_codes), dtype=np.int32)
+            offsets = np.zeros(len(title_codes), dtype=np.int32)
+            live_counts = None
+            for i, title_id in enumerate(title_codes):
+                title = manifest["dictionaries"]["title_id"][title_id]
+                if title in extend and current[title_id] >= 0:
+                    if live_counts is None:
+                        live_counts = np.bincount(self.column("title_id")[self._live()], minlength=len(current))
+                    offsets[i] = live_counts[title_id]
+                else:
+                    manifest["generation"] += 1
+                    current[title_id] = manifest["generation"]
+                generations[i] = current[title_id]
+            title_stats = group_stats(frame[METRIC_NAMES].to_numpy(dtype=np.float64), groups, len(title_codes),
+                                      METRIC_NAMES)
+            stats = manifest.setdefault("stats", {})
+            for i, title_id in enumerate(title_codes):
+                key = str(title_id)
+                if not offsets[i]:
+                    stats[key] = stats_entry(title_stats[i])
+                elif key in stats:
+                    # Extending a title: add to its summary, if it has one.
+                    stats[key] = stats_entry(entry_stats(stats[key]).merge(title_stats[i]))
+            columns["generation"] = generations[groups]
+            columns["chapter_index"] = offsets[groups] + pd.Series(groups).groupby(groups).cumcount().to_numpy(dtype=np.int32)
+
+            for name, dtype in DTYPES.items():
+                with open(self._column_path(name), "a+b") as f:
+                    # Drop whatever an interrupted append left past the last commit.
+                    f.truncate(manifest["rows"] * np.dtype(dtype).itemsize)
+                    f.write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+            manifest["rows"] += n
+            self._save_manifest()
+
+    def remove(self, title):
+        with self._lock:
+            self._load_manifest()
+            title_id = self._codes["title_id"].get(title)
+            if title_id is not None and title_id < len(self._manifest["current"]):
+                self._manifest["current"][title_id] = -1
+                self._manifest.get("stats", {}).pop(str(title_id), None)
+                self._save_manifest()
+
+    def column(self, name):
+        # Read-only memory map of a stored column; report column names
+        # ("Dyslexia-Friendly Score") and file names ("score") both work.
+        name = FILE_NAMES.get(name, name)
+        mapped = self._maps.get(name)
+        if mapped is None:
+            dtype = DTYPES[name]
+            if self.rows:
+                mapped = np.memmap(self._column_path(name), dtype=dtype, mode="r", shape=(self.rows,))
+            else:
+                mapped = np.empty(0, dtype=dtype)
+            self._maps[name] = mapped
+        return mapped
+
+    def scan(self, where=(), titles=None, authors=None, columns=None):
+        # Live chapters matching every (column, op, value) in `where`, e.g.
+        # [("Dyslexia-Friendly Score", "<", 40)], optionally limited to some
+        # titles or authors. Returns Title, Author and Chapter plus the
+        # requested metric columns (all by default), in storage order.
+        self.refresh()
+        mask = self._live()
+        for column, op, value in where:
+            mask &= FILTER_OPS[op](self.column(column), value)
+        for key, names in (("title_id", titles), ("author_id", authors)):
+            if names is not None:
+                codes = [self._codes[key][name] for name in names if name in self._codes[key]]
+                mask &= np.isin(self.column(key), codes)
+        return self._frame(np.flatnonzero(mask), columns)
+
+    def baseline(self, titles=None, exclude=()):
+        # RunningStats over the metric columns of every live chapter (of
+        # `titles`, if given, less any title in `exclude`), for comparing a
+        # new title with the catalogue.
+        self.refresh()
+        with self._lock:
+            current = self._manifest["current"]
+            stats = self._manifest.get("stats", {})
+            names = self._manifest["dictionaries"]["title_id"]
+            wanted = [
+                title_id for title_id, generation in enumerate(current)
+                if generation >= 0 and names[title_id] not in exclude and (titles is None or names[title_id] in titles)
+            ]
+            parts = [entry_stats(stats[str(t)]) for t in wanted if str(t) in stats]
+            missing = [t for t in wanted if str(t) not in stats]
+        if missing:
+            # Titles stored before summaries were kept: work theirs out from
+            # the columns.
+            df = self.scan(titles=[names[t] for t in missing])
+            groups, found = pd.factorize(df["Title"])
+            parts.extend(group_stats(df[METRIC_NAMES].to_numpy(dtype=np.float64), groups, len(found), METRIC_NAMES))
+        return merged(parts, METRIC_NAMES)
+
+    def title_frame(self, title):
+        # One title in the shape the reports take: Chapter plus the metrics,
+        # in chapter order.
+        df = self.scan(titles=[title])
+        order = np.argsort(self.column("chapter_index")[df.index.to_numpy()], kind="stable")
+        return df.iloc[order].drop(columns=["Title", "Author"]).reset_index(drop=True)
+
+    def titles(self):
+        # One row per stored title: author, chapters, words and mean score.
+        df = self.scan(columns=["Word Count", "Dyslexia-Friendly Score"])
+        if df.empty:
+            return pd.DataFrame(columns=["Title", "Author", "Chapters", "Word Count", "Mean Score"])
+        return (
+            df.groupby("Title", sort=True)
+            .agg(**{
+                "Author": ("Author", "first"),
+                "Chapters": ("Chapter", "size"),
+                "Word Count": ("Word Count", "sum"),
+                "Mean Score": ("Dyslexia-Friendly Score", "mean"),
+            })
+            .reset_index()
+        )
+
+    def compact(self):
+        # Rewrites the columns without dead rows into a new segment, then
+        # switches the manifest over and deletes the old files.
+        with self._lock:
+            self._load_manifest()
+            if not self._manifest["rows"]:
+                return
+            live = self._live()
+            old = {name: self.column(name) for name in DTYPES}
+            old_files = [self._column_path(name) for name in DTYPES]
+            self._manifest["segment"] += 1
+            for name, values in old.items():
+                values[live].tofile(self._column_path(name))
+            self._manifest["rows"] = int(live.sum())
+            self._maps = {}
+            self._save_manifest()
+            for path in old_files:
+                os.remove(path)
+
+    def refresh(self):
+        # Picks up appends made through another MetricsStore or process.
+        with self._lock:
+            self._load_manifest()
+
+    def import_csv(self, path, title=None, author=None, chunksize=200_000):
+        # Loads a combined_readability_analysis.csv (or, with `title`, a
+        # single title's chapter CSV) in chunks, so even a very large
+        # catalogue file is never held in memory at once.
+        seen = set()
+        rows = 0
+        for chunk in pd.read_csv(path, chunksize=chunksize):
+            if title is not None:
+                chunk["Title"] = title
+            if "Author" not in chunk:
+                chunk["Author"] = author or "Unknown"
+            self.append_frame(chunk, extend=seen)
+            seen.update(chunk["Title"].astype(str).unique())
+            rows += len(chunk)
+        return rows
+
+    def _frame(self, index, columns=None):
+        data = {}
+        for key, label in DICTIONARIES.items():
+            values = np.asarray(self._manifest["dictionaries"][key], dtype=object)
+            data[label] = values[self.column(key)[index]] if len(values) else np.empty(0, dtype=object)
+        for column in columns or [column for column, _, _ in METRIC_COLUMNS]:
+            values = self.column(column)[index]
+            if values.dtype == np.float32:
+                values = values.astype(np.float64)
+                # Scores are computed to two decimals; undo float32's noise.
+                if FILE_NAMES.get(column, column) == "score":
+                    values = values.round(2)
+            data[column] = values
+        return pd.DataFrame(data, index=index)
+
+    def _live(self):
+        current = np.asarray(self._manifest["current"] or [-1], dtype=np.int64)
+        return current[self.column("title_id")] == self.column("generation")
+
+    def _encode_values(self, key, values):
+        # Dictionary-encodes a column of strings, adding unseen ones.
+        inverse, uniques = pd.factorize(values)
+        codes = self._codes[key]
+        dictionary = self._manifest["dictionaries"][key]
+        mapping = np.empty(len(uniques), dtype=np.int32)
+        for i, value in enumerate(uniques):
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(dictionary)
+                dictionary.append(value)
+            mapping[i] = code
+        return mapping[inverse]
+
+    def _column_path(self, name):
+        return os.path.join(self.path, f"{name}.{self._manifest['segment']}.bin")
+
+    def _load_manifest(self):
+        try:
+            with open(os.path.join(self.path, MANIFEST), encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            manifest = {
+                "version": FORMAT_VERSION, "rows": 0, "segment": 0, "generation": 0, "current": [],
+                "dictionaries": {key: [] for key in DICTIONARIES},
+            }
+        if manifest["version"] != FORMAT_VERSION:
+            raise ValueError(f"{self.path} is metrics store format {manifest['version']}, expected {FORMAT_VERSION}")
+        if getattr(self, "_manifest", None) != manifest:
+            self._manifest = manifest
+            self._codes = {key: {v: i for i, v in enumerate(values)} for key, values in manifest["dictionaries"].items()}
+            self._maps = {}
+
+    def _save_manifest(self):
+        path = os.path.join(self.path, MANIFEST)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self._manifest, f)
+        os.replace(path + ".tmp", path)
+        self._maps = {}
+
+def stats_entry(stats):
+    # A title's RunningStats as kept in the manifest.
+    return {"count": stats.count, "mean": stats.mean.tolist(), "m2": stats.m2.tolist()}
+
+def entry_stats(entry):
+    return RunningStats(METRIC_NAMES, entry["count"], entry["mean"], entry["m2"])
+
+@lru_cache(maxsize=None)
+def open_metrics_store(path=DEFAULT_STORE_PATH):
+    return MetricsStore(path)
+
+def parse_where(expression):
+    match = WHERE_PATTERN.match(expression)
+    if not match:
+        raise argparse.ArgumentTypeError(f"expected COLUMN OP VALUE, e.g. 'Dyslexia-Friendly Score<40', not {expression!r}")
+    column, op, value = match.groups()
+    column = column.strip()
+    if column not in FILE_NAMES and column not in DTYPES:
+        raise argparse.ArgumentTypeError(f"unknown column {column!r}")
+    return column, op, float(value)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query and maintain the catalogue metrics store.")
+    parser.add_argument("--store", default=DEFAULT_STORE_PATH, help="Metrics store directory.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    importer = commands.add_parser("import", help="Load chapter metrics from CSV files.")
+    importer.add_argument("csv", nargs="+")
+    importer.add_argument("--title", default=None, help="Title for CSVs without a Title column.")
+    importer.add_argument("--author", default=None, help="Author for CSVs without an Author column.")
+    scan = commands.add_parser("scan", help="Print or export chapters matching filters.")
+    scan.add_argument("--where", action="append", type=parse_where, default=[],
+                      help="Filter such as 'Dyslexia-Friendly Score<40'; repeat to combine.")
+    scan.add_argument("--title", action="append", default=None, help="Limit to this title; repeatable.")
+    scan.add_argument("--author", action="append", default=None, help="Limit to this author; repeatable.")
+    scan.add_argument("-o", "--output", default=None, help="Write matches to this CSV instead of printing.")
+    commands.add_parser("titles", help="List stored titles.")
+    commands.add_parser("compact", help="Drop rows replaced by newer versions of a title.")
+    baseline = commands.add_parser("baseline", help="Print catalogue mean and standard deviation per metric.")
+    baseline.add_argument("--title", action="append", default=None, help="Limit to this title; repeatable.")
+    baseline.add_argument("--exclude", action="append", default=[], help="Leave out this title; repeatable.")
+    args = parser.parse_args(argv)
+
+    store = MetricsStore(args.store)
+    if args.command == "import":
+        for path in args.csv:
+            rows = store.import_csv(path, title=args.title, author=args.author)
+            print(f"{path}: {rows} chapters")
+    elif args.command == "scan":
+        df = store.scan(args.where, titles=args.title, authors=args.author)
+        if args.output:
+            df.to_csv(args.output, index=False)
+            print(f"Wrote {len(df)} chapters to {args.output}")
+        else:
+            print(df.to_string(index=False))
+    elif args.command == "titles":
+        print(store.titles().to_string(index=False))
+    elif args.command == "baseline":
+        stats = store.baseline(titles=args.title, exclude=args.exclude)
+        print(f"{stats.count} chapters")
+        print(pd.DataFrame({"Mean": stats.mean, "Std": stats.std}, index=stats.columns).to_string())
+    elif args.command == "compact":
+        before = store.rows
+        store.compact()
+        print(f"{before} rows -> {store.rows} rows")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+from io import BytesIO
+from instrumentation import instrumented
+
+def sanitize(text):
+    return text.replace("–", "-").replace("’", "'").replace("“", '"').replace("”", '"')
+
+@instrumented("generate_validation_report")
+def generate_validation_report(df, metadata, stats=None):
+    # `stats`: a running_stats.RunningStats over df's numeric columns, if
+    # one was kept while the chapters were analyzed.
+    # Plotting libraries are imported here so the upload page starts fast.
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    from matplotlib.backends.backend_pdf import PdfPages
+    import numpy as np
+    import pandas as pd
+    from running_stats import OUTLIER_Z, RunningStats
+
+    buffer = BytesIO()
+    with PdfPages(buffer) as pdf:
+        title = sanitize(metadata.get("Title", "Untitled"))
+        author = sanitize(metadata.get("Author", "Unknown"))
+        edition = sanitize(metadata.get("Edition", ""))
+        numeric = list(df.select_dtypes(include='number').columns)
+        if stats is None:
+            stats = RunningStats.from_frame(df, numeric)
+        score_col = stats.columns.index("Dyslexia-Friendly Score")
+        mean_score = stats.mean[score_col]
+        std_score = stats.std[score_col]
+
+        fig, ax = plt.subplots(figsize=(8.5, 11))
+        ax.axis('off')
+        plt.text(0.1, 0.78, "Readability Validation Report", fontsize=22, weight='bold', transform=fig.transFigure)
+        plt.text(0.1, 0.74, title, fontsize=18, transform=fig.transFigure)
+        plt.text(0.1, 0.7, f"Author: {author}", fontsize=12, transform=fig.transFigure)
+        if edition:
+            plt.text(0.1, 0.67, f"Edition: {edition}", fontsize=12, transform=fig.transFigure)
+        plt.text(0.1, 0.62, f"Total Chapters: {len(df)}", fontsize=11, transform=fig.transFigure)
+        plt.text(0.1, 0.59, f"Mean Score: {mean_score:.2f}", fontsize=11, transform=fig.transFigure)
+        plt.text(0.1, 0.56, f"Standard Deviation: {std_score:.2f}", fontsize=11, transform=fig.transFigure)
+        plt.text(0.1, 0.52, "Z-score threshold for concern: +/-2", fontsize=11, transform=fig.transFigure)
+        pdf.savefig()
+        plt.close()
+
+        fig, ax = plt.subplots(figsize=(10, 6))
+        sns.lineplot(data=df, x=range(1, len(df)+1), y="Dyslexia-Friendly Score", marker="o", ax=ax)
+        ax.axhline(mean_score, color='green', linestyle='--', label='Mean')
+        ax.axhline(mean_score + 2*std_score, color='red', linestyle='--', label='+2 SD')
+        ax.axhline(mean_score - 2*std_score, color='red', linestyle='--', label='-2 SD')
+        ax.set_title("Dyslexia-Friendly Score by Chapter")
+        ax.set_xlabel("Chapter")
+        ax.set_ylabel("Score")
+        ax.legend()
+        pdf.savefig()
+        plt.close()
+
+        features = [col for col in stats.columns if col != "Dyslexia-Friendly Score"]
+        z = stats.z_scores(df[stats.columns].to_numpy(dtype=np.float64))
+        z_scores = pd.DataFrame(np.delete(z, score_col, axis=1), columns=features, index=df.index)
+        fig, ax = plt.subplots(figsize=(12, 8))
+        sns.heatmap(z_scores.T, cmap="vlag", center=0, cbar_kws={"label": "Z-score"}, ax=ax)
+        ax.set_xticks(np.arange(len(df)))
+        ax.set_xticklabels([str(i+1) for i in range(len(df))], rotation=0)
+        ax.set_title("Z-score Heatmap by Feature and Chapter")
+        ax.set_xlabel("Chapter")
+        ax.set_ylabel("Feature (Z)")
+        pdf.savefig()
+        plt.close()
+
+        flagged = np.abs(np.nan_to_num(z_scores.to_numpy())) > OUTLIER_Z
+        outliers = z_scores.where(flagged)[flagged.any(axis=1)]
+        fig, ax = plt.subplots(figsize=(8.5, 11))
+        ax.axis('off')
+        ax.set_title("Outlier Chapters (Z > 2 or Z < -2)", fontsize=16, weight='bold', pad=20)
+        if not outliers.empty:
+            table_data = outliers.round(2).reset_index().values.tolist()
+            col_labels = ["Feature"] + [f"Chapter {i+1}" for i in range(len(df))]
+            table = ax.table(cellText=table_data, colLabels=col_labels, loc='center', cellLoc='center')
+            table.auto_set_font_size(False)
+            table.set_fontsize(8)
+            table.scale(1.2, 1.2)
+        else:
+            ax.text(0.2, 0.5, "No chapters with extreme Z-scores found.", fontsize=12)
+        pdf.savefig()
+        plt.close()
+
+        fig, ax = plt.subplots(figsize=(8.5, 11))
+        ax.axis('off')
+        ax.set_title("Appendix: Feature Descriptions", fontsize=16, weight='bold', pad=20)
+        appendix_text = sanitize("""Sentence Count: Number of sentences. Higher count helps segmentation.
+Word Count: Total word count. Neutral by itself.
+Avg Sentence Length: Lower is easier. (Lower Z = better)
+Avg Word Length: Fewer characters per word helps. (Lower Z = better)
+Avg Syllables per Word: Less complex is better. (Lower Z = better)
+Passive Sentences: Avoid too many. (Lower Z = better)
+Rare/Abstract Words: Lower is more accessible. (Lower Z = better)
+Sensory Words: More engagement. (Higher Z = better)
+Score: Higher is better.
+""")
+        ax.text(0.05, 0.95, appendix_text, va='top', wrap=True, fontsize=10)
+        pdf.savefig()
+        plt.close()
+
+    buffer.seek(0)
+    return buffer
@@ -1,60 +1,20 @@
 import streamlit as st
 import pandas as pd
-import docx2txt
-import re
 from io import StringIO
+from docx_stream import read_docx_text
+from features import FEATURE_TOTALS, Document
+from governor import upload_error
+from readability_utils import metrics_from_features
 
-# === Helper Functions ===
-def count_sentences(text):
-    return len(re.findall(r'[.!?]', text))
+# === Analysis ===
+# Every number comes from the shared feature engine, so this page agrees with
+# the novel analyzer and the reports: Punkt sentences, whole-token sensory
+# counts, and one split of the text into words for all of them.
+APP_FEATURES = FEATURE_TOTALS + ("sentence_count", "unique_words", "sense_counts")
 
-def count_words(text):
-    return len(re.findall(r'\b\w+\b', text))
-
-def count_syllables(word):
-    return len(re.findall(r'[aeiouy]+', word.lower()))
-
-def average_sentence_length(text):
-    return count_words(text) / max(1, count_sentences(text))
-
-def average_word_length(text):
-    words = re.findall(r'\b\w+\b', text)
-    return sum(len(word) for word in words) / max(1, len(words))
-
-def average_syllables_per_word(text):
-    words = re.findall(r'\b\w+\b', text)
-    return sum(count_syllables(word) for word in words) / max(1, len(words))
-
-def detect_passive_sentences(text):
-    return len(re.findall(r'\b(is|was|were|been|being|are|am|be)\b\s+\w+ed\b', text))
-
-def lexical_analysis(text):
-    words = re.findall(r'\b\w+\b', text.lower())
-    unique_words = len(set(words))
-    rare_words = sum(1 for w in words if len(w) > 10 or w.endswith(('ion', 'ity', 'ment')))
-    return unique_words, rare_words
-
-def count_sensory_words(text):
-    senses = {
-        'sight': ['look', 'see', 'glance', 'watch', 'glow', 'color', 'shine'],
-        'sound': ['hear', 'sound', 'ring', 'roar', 'echo', 'clang'],
-        'touch': ['feel', 'touch', 'warm', 'cold', 'rough', 'smooth'],
-        'smell': ['smell', 'scent', 'odor', 'fragrance'],
-        'taste': ['taste', 'flavor', 'bitter', 'sweet']
-    }
-    sense_counts = {sense: sum(text.lower().count(word) for word in words) for sense, words in senses.items()}
-    return sense_counts
-
-def compute_readability_score(avg_sentence_len, avg_word_len, avg_syllables, passive_ratio, sensory_ratio, rare_word_ratio):
-    score = (
-        30 * (1 - min(avg_sentence_len / 20, 1)) +
-        15 * (1 - min(avg_word_len / 8, 1)) +
-        15 * (1 - min(avg_syllables / 3, 1)) +
-        10 * (1 - passive_ratio) +
-        10 * sensory_ratio +
-        20 * (1 - rare_word_ratio)
-    )
-    return round(score, 2)
+def analyze_upload(text):
+    values = Document(text).extract(APP_FEATURES)
+    return values, metrics_from_features(values, values["sentence_count"])
 
 # === Streamlit UI ===
 st.set_page_config(page_title="Dyslexia-Friendly Readability Analyzer")
@@ -74,44 +34,33 @@ Upload a `.docx` or `.txt` file, and this tool will evaluate:
 uploaded_file = st.file_uploader("Choose a .docx or .txt file", type=["docx", "txt"])
 
 if uploaded_file:
+    too_large = upload_error(uploaded_file.size)
+    if too_large:
+        st.error(too_large)
+        st.stop()
     if uploaded_file.name.endswith(".docx"):
-        text = docx2txt.process(uploaded_file)
+        text = read_docx_text(uploaded_file)
     else:
         text = StringIO(uploaded_file.getvalue().decode("utf-8")).read()
 
-    sentence_count = count_sentences(text)
-    word_count = count_words(text)
-    avg_sentence_len = average_sentence_length(text)
-    avg_word_len = average_word_length(text)
-    avg_syllables = average_syllables_per_word(text)
-    passive_count = detect_passive_sentences(text)
-    passive_ratio = passive_count / max(1, sentence_count)
-    unique_words, rare_words = lexical_analysis(text)
-    rare_word_ratio = rare_words / max(1, word_count)
-    sensory_counts = count_sensory_words(text)
-    sensory_total = sum(sensory_counts.values())
-    sensory_ratio = sensory_total / max(1, word_count)
-
-    readability_score = compute_readability_score(
-        avg_sentence_len, avg_word_len, avg_syllables,
-        passive_ratio, sensory_ratio, rare_word_ratio
-    )
+    values, metrics = analyze_upload(text)
+    sensory_counts = values["sense_counts"]
 
     full_analysis = {
-        "Sentence Count": sentence_count,
-        "Word Count": word_count,
-        "Avg Sentence Length (words)": avg_sentence_len,
-        "Avg Word Length (characters)": avg_word_len,
-        "Avg Syllables per Word": avg_syllables,
-        "Passive Voice Sentences": passive_count,
-        "Unique Word Count": unique_words,
-        "Rare/Abstract Words": rare_words,
+        "Sentence Count": metrics["Sentence Count"],
+        "Word Count": metrics["Word Count"],
+        "Avg Sentence Length (words)": metrics["Avg Sentence Length"],
+        "Avg Word Length (characters)": metrics["Avg Word Length"],
+        "Avg Syllables per Word": metrics["Avg Syllables per Word"],
+        "Passive Voice Sentences": metrics["Passive Sentences"],
+        "Unique Word Count": values["unique_words"],
+        "Rare/Abstract Words": metrics["Rare/Abstract Words"],
         "Sight Words": sensory_counts["sight"],
         "Sound Words": sensory_counts["sound"],
         "Touch Words": sensory_counts["touch"],
         "Smell Words": sensory_counts["smell"],
         "Taste Words": sensory_counts["taste"],
-        "Dyslexia-Friendly Score (0–100)": readability_score
+        "Dyslexia-Friendly Score (0–100)": metrics["Dyslexia-Friendly Score"]
     }
 
     analysis_df = pd.DataFrame.from_dict(full_analysis, orient='index', columns=["Value"])
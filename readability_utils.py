@@ -1,31 +1,145 @@
-
+import io
+import os
 import re
 import pickle
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
+from docx_stream import iter_docx_paragraphs
+from features import (
+    FEATURE_TOTALS, PASSIVE_AUXILIARIES, RARE_SUFFIXES, SENSORY_WORDS, WORD_PATTERN, Document,
+)
+from instrumentation import StageRecorder, current_recorder, instrumented, recording, stage
+from sentence_splitter import CLOSING_CHARS, SentenceSplitter
 
-# Load local sentence tokenizer from file
-with open("tokenizers/punkt/english.pickle", "rb") as f:
-    sentence_tokenizer = pickle.load(f)
+PUNKT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tokenizers", "punkt", "english.pickle")
 
-def count_syllables(word):
-    return len(re.findall(r'[aeiouy]+', word.lower()))
+@lru_cache(maxsize=None)
+def get_sentence_tokenizer():
+    # The Punkt model's tables in sentence_splitter's faster engine, loaded
+    # on first use. Same sentences as get_punkt_tokenizer(), without nltk.
+    return SentenceSplitter.from_pickle(PUNKT_PATH)
 
-def analyze_text(text):
-    sentences = sentence_tokenizer.tokenize(text)
-    words = re.findall(r'\b\w+\b', text)
-    word_count = len(words)
-    sentence_count = len(sentences)
+@lru_cache(maxsize=None)
+def get_punkt_tokenizer():
+    # The original NLTK tokenizer, kept as the reference the fast splitter
+    # is checked against; unpickling it pulls in nltk.
+    with open(PUNKT_PATH, "rb") as f:
+        return pickle.load(f)
+
+def __getattr__(name):
+    # Keep `readability_utils.sentence_tokenizer` working without loading it at import.
+    if name == "sentence_tokenizer":
+        return get_sentence_tokenizer()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Bump whenever a change to analyze_text alters its output, so cached
+# chapter metrics from older scoring code are not reused.
+ANALYSIS_VERSION = "1"
+
+# Below this many characters a process pool costs more to start than it saves
+PARALLEL_MIN_CHARS = 200_000
+
+def extract_features(text):
+    # The additive per-word totals (features.FEATURE_TOTALS) of a text:
+    # word count, total length and syllables, rare and sensory words and
+    # passive pairs, all from one split of the text into words.
+    return Document(text).extract(FEATURE_TOTALS)
+
+CHAPTER_MARKER = re.compile(r"### CHAPTER (\d+)")
+METADATA_START = "### METADATA START"
+METADATA_END = "### METADATA END"
+
+class ChapterStream:
+    # Iterates (title, text) chapters from an iterable of lines (kept with
+    # their line endings), so only the chapter being assembled is held in
+    # memory. `metadata` is filled in once the metadata block has been read,
+    # which in practice is before the first chapter is yielded.
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.metadata = {
+            "Title": "Untitled",
+            "Author": "Unknown",
+            "Chapters": None,
+            "Edition": ""
+        }
+
+    def __iter__(self):
+        meta_parts = None
+        meta_done = False
+        chapter_number = None
+        chapter_parts = []
+
+        for line in self.lines:
+            if not meta_done:
+                rest = line
+                if meta_parts is None:
+                    pos = line.find(METADATA_START)
+                    if pos != -1:
+                        meta_parts = []
+                        rest = line[pos + len(METADATA_START):]
+                if meta_parts is not None:
+                    end = rest.find(METADATA_END)
+                    if end == -1:
+                        meta_parts.append(rest)
+                    else:
+                        meta_parts.append(rest[:end])
+                        self._read_metadata("".join(meta_parts))
+                        meta_done = True
+
+            pieces = CHAPTER_MARKER.split(line)
+            if chapter_number is not None:
+                chapter_parts.append(pieces[0])
+            for i in range(1, len(pieces), 2):
+                if chapter_number is not None:
+                    yield f"Chapter {chapter_number}", "".join(chapter_parts).strip()
+                chapter_number = pieces[i]
+                chapter_parts = [pieces[i+1]]
+
+        if chapter_number is not None:
+            yield f"Chapter {chapter_number}", "".join(chapter_parts).strip()
+
+    def _read_metadata(self, block):
+        lines = block.strip().splitlines()
+        for line in lines:
+            if ':' in line:
+                key, val = line.split(':', 1)
+                self.metadata[key.strip()] = val.strip()
+
+def iter_manuscript_lines(source, ext):
+    # `source` is a path or binary file object. Text files are read line by
+    # line with their original line endings, .docx files paragraph by paragraph.
+    if ext == "docx":
+        for paragraph in iter_docx_paragraphs(source):
+            yield paragraph + "\n"
+    elif isinstance(source, str):
+        with open(source, encoding="utf-8", newline="") as f:
+            yield from f
+    else:
+        reader = io.TextIOWrapper(source, encoding="utf-8", newline="")
+        try:
+            yield from reader
+        finally:
+            # Hand the caller's file object back open.
+            reader.detach()
+
+@instrumented("parse_metadata_and_chapters")
+def parse_metadata_and_chapters(text):
+    stream = ChapterStream(text.splitlines(keepends=True))
+    chapters = list(stream)
+    return stream.metadata, chapters
+
+def metrics_from_features(features, sentence_count):
+    # Turns extract_features() totals (or sums of them over several pieces of
+    # text) plus a sentence count into the chapter metrics dict.
+    word_count = features["word_count"]
+    passive_count = features["passive_count"]
+    rare_words = features["rare_words"]
+    sensory_words = features["sensory_words"]
     avg_sentence_len = word_count / max(1, sentence_count)
-    avg_word_len = sum(len(w) for w in words) / max(1, word_count)
-    avg_syllables = sum(count_syllables(w) for w in words) / max(1, word_count)
-    passive_count = len(re.findall(r'\b(is|was|were|been|being|are|am|be)\b\s+\w+ed\b', text))
-    rare_words = sum(1 for w in words if len(w) > 10 or w.endswith(('ion', 'ity', 'ment')))
-    sensory_words = sum(1 for w in words if w.lower() in [
-        'look', 'see', 'glance', 'watch', 'glow', 'color', 'shine',
-        'hear', 'sound', 'ring', 'roar', 'echo', 'clang',
-        'feel', 'touch', 'warm', 'cold', 'rough', 'smooth',
-        'smell', 'scent', 'odor', 'fragrance',
-        'taste', 'flavor', 'bitter', 'sweet'
-    ])
+    avg_word_len = features["total_length"] / max(1, word_count)
+    avg_syllables = features["total_syllables"] / max(1, word_count)
     sensory_ratio = sensory_words / max(1, word_count)
     passive_ratio = passive_count / max(1, sentence_count)
     rare_ratio = rare_words / max(1, word_count)
@@ -50,3 +164,189 @@ def analyze_text(text):
         "Sensory Words": sensory_words,
         "Dyslexia-Friendly Score": round(score, 2)
     }
+
+def analyze_text(text):
+    document = Document(text)
+    with stage("analyze_text.tokenize"):
+        sentences = document.feature("sentence_count")
+    with stage("analyze_text.features") as info:
+        features = document.extract(FEATURE_TOTALS)
+        info["words"] = features["word_count"]
+    with stage("analyze_text.score"):
+        return metrics_from_features(features, sentences)
+
+def analyze_chapter(text, title=None):
+    # analyze_text, recorded as one chapter when a StageRecorder is active.
+    recorder = current_recorder()
+    if recorder is None:
+        return analyze_text(text)
+    with recorder.stage("analyze_text") as info:
+        metrics = analyze_text(text)
+        info["words"] = metrics["Word Count"]
+    recorder.add_chapter(title, info)
+    return metrics
+
+def analyze_text_recorded(text, title=None, profile=False, trace_memory=False):
+    # Pool worker entry point: returns the metrics together with a recorder
+    # holding this chapter's stage timings, for the caller to merge.
+    recorder = StageRecorder(profile=profile, trace_memory=trace_memory)
+    with recording(recorder):
+        metrics = analyze_chapter(text, title)
+    return metrics, recorder
+
+# Chapters longer than this are analyzed as several segments, so one huge
+# chapter is spread over the workers instead of holding one of them.
+SEGMENT_CHARS = 200_000
+# How far either side of a cut the splitter reads to find sentence starts.
+CUT_WINDOW = 2_000
+WHITESPACE_RUN = re.compile(r"\s+")
+TRAILING_WORD = re.compile(r"\w+$")
+
+def segment_bounds(text, max_chars=SEGMENT_CHARS):
+    # (start, end, joined) pieces of at most max_chars characters whose
+    # analyze_segment totals merge_segments turns into exactly
+    # analyze_text(text). Cuts go at sentence starts, so the pieces split
+    # into the same sentences the whole does and no word or passive pair
+    # straddles a cut. Where no sentence starts within reach the cut falls
+    # mid-sentence, at whitespace, and the next piece is marked joined: its
+    # first sentence is the end of the previous piece's last. Only a piece
+    # cut next to a long run without whitespace can exceed max_chars.
+    bounds = []
+    start = 0
+    joined = False
+    while len(text) - start > max_chars:
+        cut, mid_sentence = _find_cut(text, start, start + max_chars)
+        if cut is None:
+            break
+        bounds.append((start, cut, joined))
+        start, joined = cut, mid_sentence
+    bounds.append((start, len(text), joined))
+    return bounds
+
+def _find_cut(text, start, target):
+    # The last safe cut in (start, target]: a sentence start near target,
+    # else any sentence start since `start`, else whitespace inside the
+    # sentence. Each is checked by splitting the text around it, so the
+    # pieces' sentence counts add up to the whole's (plus one mid-sentence).
+    splitter = get_sentence_tokenizer()
+    hi = min(len(text), target + CUT_WINDOW)
+    near = max(start, target - CUT_WINDOW)
+    for lo in dict.fromkeys((near, start)):
+        # A window starting mid-text may start mid-abbreviation; its first
+        # sentence starts are not trusted.
+        first = start + 1 if lo == start else lo + 100
+        whole = None
+        for cut in reversed([lo + s for s, _ in splitter.span_tokenize(text[lo:hi])]):
+            if cut < first:
+                break
+            if cut > target or not _clean_cut(text, cut):
+                continue
+            if whole is None:
+                whole = splitter.count(text[lo:hi])
+            if splitter.count(text[lo:cut]) + splitter.count(text[cut:hi]) == whole:
+                return cut, False
+    window = text[near:hi]
+    whole = splitter.count(window)
+    gaps = [near + m.end() for m in WHITESPACE_RUN.finditer(window, 0, target - near)]
+    for cut in reversed(gaps):
+        if cut > start and _clean_cut(text, cut) and (
+                splitter.count(text[near:cut]) + splitter.count(text[cut:hi]) == whole + 1):
+            return cut, True
+    # No whitespace in reach: the piece runs on to the first safe cut after
+    # target, or to the end of the text, rather than split a word.
+    for m in WHITESPACE_RUN.finditer(text, target):
+        cut = m.end()
+        if cut >= len(text):
+            break
+        if not _clean_cut(text, cut):
+            continue
+        lo, hi = max(start, cut - CUT_WINDOW), min(len(text), cut + CUT_WINDOW)
+        extra = splitter.count(text[lo:cut]) + splitter.count(text[cut:hi]) - splitter.count(text[lo:hi])
+        if extra in (0, 1):
+            return cut, bool(extra)
+    return None, False
+
+def _clean_cut(text, cut):
+    # Whitespace before, a word (not a closing quote) after, and no passive
+    # auxiliary waiting for its participle.
+    if not text[cut - 1].isspace() or text[cut].isspace() or text[cut] in CLOSING_CHARS:
+        return False
+    word = TRAILING_WORD.search(text[max(0, cut - 64):cut].rstrip())
+    return word is None or word.group() not in PASSIVE_AUXILIARIES
+
+def analyze_segment(text):
+    # extract_features totals and the sentence count of one segment_bounds
+    # piece, for merge_segments.
+    document = Document(text)
+    with stage("analyze_text.tokenize"):
+        sentences = document.feature("sentence_count")
+    with stage("analyze_text.features") as info:
+        features = document.extract(FEATURE_TOTALS)
+        info["words"] = features["word_count"]
+    return features, sentences
+
+def analyze_segment_recorded(text, title=None, profile=False, trace_memory=False):
+    # Pool worker entry point for a segment, like analyze_text_recorded.
+    recorder = StageRecorder(profile=profile, trace_memory=trace_memory)
+    with recording(recorder):
+        with recorder.stage("analyze_segment") as info:
+            features, sentences = analyze_segment(text)
+            info["words"] = features["word_count"]
+        recorder.add_chapter(title, info)
+    return (features, sentences), recorder
+
+def merge_segments(parts):
+    # Chapter metrics from the (features, sentence_count, joined) of every
+    # piece, in order.
+    features = {}
+    sentences = 0
+    for part, count, joined in parts:
+        for name, value in part.items():
+            features[name] = features.get(name, 0) + value
+        sentences += count - joined
+    return metrics_from_features(features, sentences)
+
+def analyze_chapters(chapters, max_workers=None, min_parallel_chars=PARALLEL_MIN_CHARS, cache=None):
+    # Each worker loads the Punkt pickle once, in its initializer; chapters
+    # are then handed out in chunks and returned in input order.
+    # With a result_cache.ResultCache, only chapters whose text is not
+    # already cached are analyzed.
+    texts = [chap_text for _, chap_text in chapters]
+    titles = [chap_title for chap_title, _ in chapters]
+    recorder = current_recorder()
+    metrics_list = [None] * len(texts)
+    keys = []
+    if cache is not None:
+        keys = [cache.key(t) for t in texts]
+        metrics_list = [cache.get(k) for k in keys]
+    todo = [i for i, metrics in enumerate(metrics_list) if metrics is None]
+    todo_texts = [texts[i] for i in todo]
+    todo_titles = [titles[i] for i in todo]
+
+    workers = min(max_workers or os.cpu_count() or 1, len(todo_texts))
+    if workers <= 1 or sum(len(t) for t in todo_texts) < min_parallel_chars:
+        computed = [analyze_chapter(t, title) for t, title in zip(todo_texts, todo_titles)]
+    else:
+        chunksize = max(1, len(todo_texts) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers, initializer=get_sentence_tokenizer) as pool:
+            if recorder is None:
+                computed = list(pool.map(analyze_text, todo_texts, chunksize=chunksize))
+            else:
+                computed = []
+                for metrics, worker_recorder in pool.map(
+                    analyze_text_recorded, todo_texts, todo_titles, repeat(recorder.profile),
+                    repeat(recorder.trace_memory), chunksize=chunksize,
+                ):
+                    recorder.merge(worker_recorder)
+                    computed.append(metrics)
+
+    for i, metrics in zip(todo, computed):
+        metrics_list[i] = metrics
+        if cache is not None:
+            cache.put(keys[i], metrics)
+
+    results = []
+    for (chap_title, _), metrics in zip(chapters, metrics_list):
+        metrics["Chapter"] = chap_title
+        results.append(metrics)
+    return results
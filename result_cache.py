@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from readability_utils import ANALYSIS_VERSION
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    "READABILITY_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "dyslexia-readability", "chapter_metrics.sqlite3"),
+)
+DEFAULT_MEMORY_ITEMS = 4096
+DEFAULT_MAX_DISK_BYTES = 64 * 1024 * 1024
+
+def chapter_key(text, version=ANALYSIS_VERSION):
+    digest = hashlib.sha256(version.encode("utf-8") + b"\0" + text.encode("utf-8"))
+    return digest.hexdigest()
+
+class ResultCache:
+    # Two tiers: an in-process LRU dict in front of a SQLite file shared by
+    # every session, worker and CLI run. Entries are chapter metric dicts
+    # keyed by chapter_key(); the disk tier is trimmed oldest-used first
+    # once it grows past max_disk_bytes. The disk tier's total size is kept
+    # in a row of the database, changed only while holding the write lock,
+    # so every process sharing the file sees the same total.
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, memory_items=DEFAULT_MEMORY_ITEMS, max_disk_bytes=DEFAULT_MAX_DISK_BYTES):
+        self.path = path
+        self.memory_items = memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("BEGIN IMMEDIATE")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chapter_metrics ("
+            "key TEXT PRIMARY KEY, metrics TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS chapter_metrics_last_used ON chapter_metrics (last_used)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_size (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER NOT NULL)"
+        )
+        # Caches written before the total was kept start from the sum.
+        self._conn.execute(
+            "INSERT OR IGNORE INTO cache_size (id, bytes) SELECT 0, COALESCE(SUM(size), 0) FROM chapter_metrics"
+        )
+        self._conn.commit()
+
+    key = staticmethod(chapter_key)
+
+    def get(self, key):
+        with self._lock:
+            metrics = self._memory.get(key)
+            if metrics is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return dict(metrics)
+            row = self._conn.execute("SELECT metrics FROM chapter_metrics WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE chapter_metrics SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            metrics = json.loads(row[0])
+            self._remember(key, metrics)
+            self.hits += 1
+            return dict(metrics)
+
+    def put(self, key, metrics):
+        metrics = {k: v for k, v in metrics.items() if k != "Chapter"}
+        payload = json.dumps(metrics)
+        with self._lock:
+            self._remember(key, metrics)
+            # Other processes write to the same file: take the write lock
+            # before reading the old size and the total.
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                old = self._conn.execute("SELECT size FROM chapter_metrics WHERE key = ?", (key,)).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO chapter_metrics (key, metrics, size, last_used) VALUES (?, ?, ?, ?)",
+                    (key, payload, len(payload), time.time()),
+                )
+                self._add_disk_bytes(len(payload) - (old[0] if old else 0))
+                disk_bytes = self._disk_bytes()
+                if disk_bytes > self.max_disk_bytes:
+                    self._evict(disk_bytes)
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute("DELETE FROM chapter_metrics")
+            self._conn.execute("UPDATE cache_size SET bytes = 0")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            disk_bytes = self._disk_bytes()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "memory_items": len(self._memory),
+            "disk_bytes": disk_bytes,
+        }
+
+    def _disk_bytes(self):
+        return self._conn.execute("SELECT bytes FROM cache_size").fetchone()[0]
+
+    def _add_disk_bytes(self, delta):
+        self._conn.execute("UPDATE cache_size SET bytes = bytes + ?", (delta,))
+
+    def _remember(self, key, metrics):
+        self._memory[key] = metrics
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _evict(self, disk_bytes):
+        # Trim to 90% of the budget so every put near the limit does not evict.
+        target = self.max_disk_bytes * 0.9
+        rows = self._conn.execute("SELECT key, size FROM chapter_metrics ORDER BY last_used").fetchall()
+        doomed = []
+        freed = 0
+        for key, size in rows:
+            if disk_bytes - freed <= target:
+                break
+            doomed.append((key,))
+            freed += size
+        self._conn.executemany("DELETE FROM chapter_metrics WHERE key = ?", doomed)
+        self._add_disk_bytes(-freed)
+
+@lru_cache(maxsize=None)
+def open_cache(path=DEFAULT_CACHE_PATH):
+    # One cache object per process and path, e.g. inside pool workers.
+    return ResultCache(path)
@@ -0,0 +1,63 @@
+import pandas as pd
+
+DELTA_COLUMNS = [
+    "Dyslexia-Friendly Score",
+    "Word Count",
+    "Avg Sentence Length",
+    "Avg Word Length",
+    "Passive Sentences",
+    "Rare/Abstract Words",
+    "Sensory Words",
+]
+
+# A revision is {"keys": [...], "results": [...]}: the content key of every
+# chapter alongside its metrics, in order (jobs.JobManager builds them).
+
+def revision_delta(previous, current):
+    prev_results = previous["results"]
+    prev_index_by_key = {key: i for i, key in enumerate(previous["keys"])}
+
+    # Identical text is matched wherever it moved to. A chapter with new text
+    # is paired with the unclaimed previous chapter that directly follows the
+    # last matched one, i.e. the chapter it most likely replaces.
+    matches = {}
+    claimed = set()
+    for i, key in enumerate(current["keys"]):
+        j = prev_index_by_key.get(key)
+        if j is not None and j not in claimed:
+            matches[i] = j
+            claimed.add(j)
+    last = -1
+    for i in range(len(current["keys"])):
+        if i in matches:
+            last = matches[i]
+        elif last + 1 < len(prev_results) and last + 1 not in claimed:
+            last += 1
+            matches[i] = last
+            claimed.add(last)
+
+    rows = []
+    for i, metrics in enumerate(current["results"]):
+        j = matches.get(i)
+        old = prev_results[j] if j is not None else None
+        if old is None:
+            status = "Added"
+        elif current["keys"][i] != previous["keys"][j]:
+            status = "Modified"
+        elif old["Chapter"] != metrics["Chapter"]:
+            status = "Renumbered"
+        else:
+            status = "Unchanged"
+        row = {"Chapter": metrics["Chapter"], "Previous Chapter": old["Chapter"] if old else "", "Status": status}
+        for col in DELTA_COLUMNS:
+            row[f"{col} Change"] = metrics[col] - old[col] if old else None
+        rows.append(row)
+
+    for j, old in enumerate(prev_results):
+        if j not in claimed:
+            row = {"Chapter": "", "Previous Chapter": old["Chapter"], "Status": "Removed"}
+            for col in DELTA_COLUMNS:
+                row[f"{col} Change"] = None
+            rows.append(row)
+
+    return pd.DataFrame(rows)
@@ -0,0 +1,129 @@
+import numpy as np
+
+# Running mean and variance per feature (Welford's update, with Chan et
+# al.'s formula for combining partial results). A RunningStats can be fed
+# one chapter at a time, a block of chapters at once, or merged with
+# another built elsewhere (a pool worker, another title), and gives the
+# same mean and sample standard deviation as pandas' .mean() and .std()
+# over all the rows, up to float rounding. Z-scores and outlier flags
+# come back as whole arrays.
+
+OUTLIER_Z = 2.0
+
+class RunningStats:
+    def __init__(self, columns, count=0, mean=None, m2=None):
+        self.columns = list(columns)
+        self.count = int(count)
+        width = len(self.columns)
+        self.mean = np.zeros(width) if mean is None else np.asarray(mean, dtype=np.float64).copy()
+        self.m2 = np.zeros(width) if m2 is None else np.asarray(m2, dtype=np.float64).copy()
+
+    @classmethod
+    def from_frame(cls, df, columns=None):
+        columns = list(columns if columns is not None else df.columns)
+        return cls(columns).update_many(df[columns].to_numpy(dtype=np.float64))
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["columns"], data["count"], data["mean"], data["m2"])
+
+    def as_dict(self):
+        return {"columns": self.columns, "count": self.count, "mean": self.mean.tolist(), "m2": self.m2.tolist()}
+
+    def copy(self):
+        return RunningStats(self.columns, self.count, self.mean, self.m2)
+
+    def update(self, row):
+        # One observation: a mapping with every column, or a sequence in
+        # column order.
+        if hasattr(row, "keys"):
+            row = [row[column] for column in self.columns]
+        x = np.asarray(row, dtype=np.float64)
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        return self
+
+    def update_many(self, values):
+        # A 2-D block of observations, one row each, columns in order.
+        values = np.asarray(values, dtype=np.float64).reshape(-1, len(self.columns))
+        if len(values):
+            mean = values.mean(axis=0)
+            block = RunningStats(self.columns, len(values), mean, ((values - mean) ** 2).sum(axis=0))
+            self.merge(block)
+        return self
+
+    def merge(self, other):
+        if other.columns != self.columns:
+            raise ValueError(f"cannot merge statistics over {other.columns} into {self.columns}")
+        if other.count == 0:
+            return self
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * (other.count / total)
+        self.m2 = self.m2 + other.m2 + delta ** 2 * (self.count * other.count / total)
+        self.count = total
+        return self
+
+    @property
+    def variance(self):
+        # Sample variance (ddof=1); NaN below two observations.
+        if self.count < 2:
+            return np.full(len(self.columns), np.nan)
+        return self.m2 / (self.count - 1)
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+    def z_scores(self, values):
+        # Z-scores of a 2-D block of rows (or one row) against these
+        # statistics. A feature with no spread gets NaN, as in pandas.
+        values = np.asarray(values, dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z = (values - self.mean) / self.std
+        z[~np.isfinite(z)] = np.nan
+        return z
+
+    def leave_one_out_z_scores(self, values):
+        # Z-scores of rows that are part of these statistics, each against
+        # the mean and standard deviation of all the other rows. NaN below
+        # three rows or where the other rows have no spread.
+        values = np.asarray(values, dtype=np.float64)
+        rest = self.count - 1
+        if rest < 2:
+            return np.full(values.shape, np.nan)
+        delta = values - self.mean
+        mean = self.mean - delta / rest
+        m2 = self.m2 - delta ** 2 * (self.count / rest)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z = (values - mean) / np.sqrt(np.maximum(m2, 0) / (rest - 1))
+        z[~np.isfinite(z)] = np.nan
+        return z
+
+    def outliers(self, values, threshold=OUTLIER_Z):
+        # True where |z| > threshold; never for NaN z-scores.
+        z = self.z_scores(values)
+        with np.errstate(invalid="ignore"):
+            return np.abs(z) > threshold
+
+def merged(stats, columns):
+    # One RunningStats over everything in `stats`, an iterable of them.
+    total = RunningStats(columns)
+    for part in stats:
+        total.merge(part)
+    return total
+
+def group_stats(values, groups, n_groups, columns):
+    # RunningStats for each group of rows, without a Python loop over rows:
+    # `groups` holds each row's group number, 0 <= group < n_groups.
+    values = np.asarray(values, dtype=np.float64).reshape(len(groups), len(columns))
+    counts = np.bincount(groups, minlength=n_groups)
+    safe = np.maximum(counts, 1)[:, None]
+    sums = np.zeros((n_groups, len(columns)))
+    np.add.at(sums, groups, values)
+    means = sums / safe
+    m2 = np.zeros((n_groups, len(columns)))
+    np.add.at(m2, groups, (values - means[groups]) ** 2)
+    return [RunningStats(columns, counts[g], means[g], m2[g]) for g in range(n_groups)]
@@ -0,0 +1,443 @@
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import aclosing
+from http import HTTPStatus
+
+from governor import MAX_UPLOAD_MB, SEGMENT_CHARS
+from instrumentation import StageRecorder, recording
+from readability_utils import (ChapterStream, analyze_segment, get_sentence_tokenizer, merge_segments,
+                               segment_bounds)
+
+# A local HTTP service for scoring text without the Streamlit apps, so a
+# CMS can score a chapter when it is saved. Runs on asyncio with a process
+# pool whose workers load the Punkt model once, at startup. Scoring requests
+# are coalesced: while every worker is busy, new texts queue up, and the
+# next free worker takes all of them (up to --max-batch) as one task, so a
+# burst of small requests costs one round trip to the pool instead of one
+# each. Long texts are split with segment_bounds and merged, exactly as jobs
+# do.
+#
+#   POST /score        a chapter (text/plain, or JSON {"text": ..., "title": ...});
+#                      answers with analyze_text's metrics as JSON.
+#   POST /manuscript   a whole manuscript in the upload format; streams one
+#                      NDJSON line per chapter as it is scored, then a summary.
+#   POST /report       a whole manuscript; answers with the validation report PDF.
+#   GET  /health       liveness, workers, queue depth and recent latencies.
+#   GET  /metrics      Prometheus text: requests, batches, latency and stage totals.
+#
+#     python scoring_service.py --port 8765 --workers 4
+#     curl --data-binary @chapter.txt http://127.0.0.1:8765/score
+
+DEFAULT_PORT = int(os.environ.get("READABILITY_SERVICE_PORT", "8765"))
+MAX_BATCH = 16
+# Recent /score latencies kept for the percentiles in /health and /metrics.
+LATENCY_WINDOW = 10_000
+QUANTILES = (0.5, 0.9, 0.99)
+
+def score_batch(texts):
+    # Pool worker entry point: analyze_segment totals for each text, and the
+    # stage timings of the batch.
+    recorder = StageRecorder()
+    with recording(recorder):
+        results = [analyze_segment(text) for text in texts]
+    return results, recorder
+
+def render_report(results, metadata):
+    # Report pool entry point; kept off the scoring workers.
+    import pandas as pd
+    from validation_report_generator_wrapped import generate_enhanced_report
+
+    df = pd.DataFrame(results)
+    df = df[["Chapter"] + [col for col in df.columns if col != "Chapter"]]
+    return generate_enhanced_report(df, metadata).getvalue()
+
+def warm_up():
+    get_sentence_tokenizer()
+    return os.getpid()
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+class Batcher:
+    # Hands queued texts to the pool in batches, with at most one batch per
+    # worker in flight.
+
+    def __init__(self, pool, workers, max_batch=MAX_BATCH, recorder=None):
+        self.pool = pool
+        self.max_batch = max_batch
+        self.recorder = recorder
+        self.batches = 0
+        self.batched_texts = 0
+        self.largest_batch = 0
+        self._pending = deque()
+        self._wakeup = asyncio.Event()
+        self._free = asyncio.Semaphore(workers)
+        self._task = None
+        # The loop only keeps weak references to tasks.
+        self._dispatches = set()
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    def depth(self):
+        return len(self._pending)
+
+    async def score(self, text):
+        # (features, sentence_count) of one piece of text.
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((text, future))
+        self._wakeup.set()
+        return await future
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._pending:
+                await self._free.acquire()
+                batch = [self._pending.popleft() for _ in range(min(self.max_batch, len(self._pending)))]
+                task = asyncio.ensure_future(self._dispatch(batch))
+                self._dispatches.add(task)
+                task.add_done_callback(self._dispatches.discard)
+
+    async def close(self):
+        # Stops taking batches, waits for the ones already with the pool
+        # and fails the texts still queued.
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        await asyncio.gather(*self._dispatches, return_exceptions=True)
+        while self._pending:
+            _, future = self._pending.popleft()
+            future.cancel()
+
+    async def _dispatch(self, batch):
+        self.batches += 1
+        self.batched_texts += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        try:
+            results, recorder = await asyncio.get_running_loop().run_in_executor(
+                self.pool, score_batch, [text for text, _ in batch])
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+        else:
+            if self.recorder is not None:
+                self.recorder.merge(recorder, chapters=False)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._free.release()
+
+class ScoringService:
+    def __init__(self, workers=None, max_batch=MAX_BATCH, max_upload_mb=MAX_UPLOAD_MB,
+                 segment_chars=SEGMENT_CHARS):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_batch = max_batch
+        self.max_body = int(max_upload_mb * 1024 * 1024) if max_upload_mb else None
+        self.segment_chars = segment_chars
+        self.recorder = StageRecorder()
+        self.started = time.time()
+        self.requests = {}
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.pool = None
+        self.report_pool = None
+        self.batcher = None
+
+    async def start(self):
+        # Starts the workers and waits until each has the model loaded.
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=get_sentence_tokenizer)
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[loop.run_in_executor(self.pool, warm_up) for _ in range(self.workers)])
+        self.batcher = Batcher(self.pool, self.workers, self.max_batch, self.recorder)
+        self.batcher.start()
+
+    async def close(self):
+        if self.batcher is not None:
+            await self.batcher.close()
+        for pool in (self.pool, self.report_pool):
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+    async def score_text(self, text):
+        # analyze_text(text), by way of the batcher. Splitting a long text
+        # runs in a thread, off the event loop.
+        if len(text) > self.segment_chars:
+            bounds = await asyncio.get_running_loop().run_in_executor(None, segment_bounds, text, self.segment_chars)
+        else:
+            bounds = [(0, len(text), False)]
+        parts = await asyncio.gather(*[self.batcher.score(text[start:end]) for start, end, _ in bounds])
+        return merge_segments([(features, sentences, joined)
+                               for (features, sentences), (_, _, joined) in zip(parts, bounds)])
+
+    async def score_chapters(self, text):
+        # Yields (metadata, metrics) per chapter in order, a few chapters
+        # ahead, so one manuscript cannot fill the queue ahead of everyone.
+        # The manuscript is split into chapters in a thread, a chapter at a
+        # time, so a large body does not hold up other connections.
+        loop = asyncio.get_running_loop()
+        stream = ChapterStream(await loop.run_in_executor(None, str.splitlines, text, True))
+        chapters = iter(stream)
+        window = deque()
+        try:
+            while True:
+                chapter = await loop.run_in_executor(None, next, chapters, None)
+                if chapter is None:
+                    break
+                chap_title, chap_text = chapter
+                window.append((chap_title, asyncio.ensure_future(self.score_text(chap_text))))
+                if len(window) > self.workers * 2:
+                    yield stream.metadata, await self._chapter(window.popleft())
+            while window:
+                yield stream.metadata, await self._chapter(window.popleft())
+        finally:
+            # Chapters still scoring when a caller gives up are not wanted.
+            for _, task in window:
+                task.cancel()
+
+    async def _chapter(self, entry):
+        chap_title, task = entry
+        metrics = dict(await task)
+        metrics["Chapter"] = chap_title
+        return metrics
+
+    # HTTP
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                path = None
+                try:
+                    request = await self.read_request(reader)
+                    if request is None:
+                        break
+                    method, path, headers, body = request
+                    await self.dispatch(method, path, body, writer)
+                except HTTPError as exc:
+                    # The rest of the connection may be unread; drop it.
+                    await self.send_error(writer, exc.status, exc.message, path)
+                    break
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    raise
+                except Exception as exc:
+                    await self.send_error(writer, 500, f"{type(exc).__name__}: {exc}", path)
+                    break
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def read_request(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, _ = line.decode("latin-1").split()
+        except ValueError:
+            raise HTTPError(400, "malformed request line") from None
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if method == "POST" and "content-length" not in headers:
+            raise HTTPError(411, "POST needs a Content-Length")
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise HTTPError(400, "bad Content-Length") from None
+        if self.max_body and length > self.max_body:
+            raise HTTPError(413, f"request body over {self.max_body} bytes")
+        body = await reader.readexactly(length) if length else b""
+        return method, target.split("?")[0], headers, body
+
+    async def dispatch(self, method, path, body, writer):
+        routes = {
+            ("POST", "/score"): self.post_score,
+            ("POST", "/manuscript"): self.post_manuscript,
+            ("POST", "/report"): self.post_report,
+            ("GET", "/health"): self.get_health,
+            ("GET", "/metrics"): self.get_metrics,
+        }
+        handler = routes.get((method, path))
+        if handler is None:
+            known = path in {route for _, route in routes}
+            raise HTTPError(405 if known else 404, f"no route for {method} {path}")
+        await handler(body, writer)
+        self.count(200, path)
+
+    async def post_score(self, body, writer):
+        started = time.perf_counter()
+        text, title = self.read_text(body)
+        metrics = await self.score_text(text)
+        if title is not None:
+            metrics["Chapter"] = title
+        await self.send(writer, 200, json.dumps(metrics).encode("utf-8"))
+        self.latencies.append(time.perf_counter() - started)
+
+    async def post_manuscript(self, body, writer):
+        text, _ = self.read_text(body)
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nTransfer-Encoding: chunked\r\n\r\n")
+        count = 0
+        metadata = {}
+        total_words = 0
+        score_sum = 0.0
+        # Once the 200 is out, a failure can only be reported in the stream.
+        try:
+            async with aclosing(self.score_chapters(text)) as chapters:
+                async for metadata, metrics in chapters:
+                    count += 1
+                    total_words += metrics["Word Count"]
+                    score_sum += metrics["Dyslexia-Friendly Score"]
+                    await self.send_chunk(writer, metrics)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            raise
+        except Exception as exc:
+            await self.send_chunk(writer, {"error": f"{type(exc).__name__}: {exc}", "chapters": count})
+        else:
+            await self.send_chunk(writer, {"done": True, "metadata": metadata, "chapters": count,
+                                           "words": total_words, "mean_score": score_sum / count if count else None})
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def post_report(self, body, writer):
+        text, _ = self.read_text(body)
+        results = []
+        metadata = {}
+        async with aclosing(self.score_chapters(text)) as chapters:
+            async for metadata, metrics in chapters:
+                results.append(metrics)
+        if not results:
+            raise HTTPError(422, "no '### CHAPTER' sections found")
+        if self.report_pool is None:
+            self.report_pool = ProcessPoolExecutor(max_workers=1)
+        pdf = await asyncio.get_running_loop().run_in_executor(self.report_pool, render_report, results, metadata)
+        await self.send(writer, 200, pdf, "application/pdf")
+
+    async def get_health(self, body, writer):
+        health = {
+            "status": "ok",
+            "workers": self.workers,
+            "uptime_s": time.time() - self.started,
+            "queue_depth": self.batcher.depth(),
+            "batches": self.batcher.batches,
+            "mean_batch": self.batcher.batched_texts / self.batcher.batches if self.batcher.batches else None,
+            "score_latency_ms": {f"p{int(q * 100)}": value * 1000 for q, value in self.quantiles().items()},
+        }
+        await self.send(writer, 200, json.dumps(health).encode("utf-8"))
+
+    async def get_metrics(self, body, writer):
+        prefix = "readability_service"
+        lines = [
+            f"# HELP {prefix}_requests_total Requests answered, by path and status.",
+            f"# TYPE {prefix}_requests_total counter",
+        ]
+        for (status, path), n in sorted(self.requests.items(), key=lambda item: (item[0][1] or "", item[0][0])):
+            lines.append(f'{prefix}_requests_total{{path="{path or ""}",status="{status}"}} {n}')
+        lines += [
+            f"# HELP {prefix}_batches_total Batches sent to the worker pool.",
+            f"# TYPE {prefix}_batches_total counter",
+            f"{prefix}_batches_total {self.batcher.batches}",
+            f"# HELP {prefix}_batched_texts_total Texts scored in batches.",
+            f"# TYPE {prefix}_batched_texts_total counter",
+            f"{prefix}_batched_texts_total {self.batcher.batched_texts}",
+            f"# HELP {prefix}_queue_depth Texts waiting for a worker.",
+            f"# TYPE {prefix}_queue_depth gauge",
+            f"{prefix}_queue_depth {self.batcher.depth()}",
+            f"# HELP {prefix}_score_latency_seconds Recent /score latencies.",
+            f"# TYPE {prefix}_score_latency_seconds summary",
+        ]
+        for q, value in self.quantiles().items():
+            lines.append(f'{prefix}_score_latency_seconds{{quantile="{q}"}} {value}')
+        lines.append(f"{prefix}_score_latency_seconds_count {len(self.latencies)}")
+        body = "\n".join(lines) + "\n" + self.recorder.to_prometheus()
+        await self.send(writer, 200, body.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+
+    def read_text(self, body):
+        # (text, title) from a text/plain body or a JSON {"text", "title"} one.
+        try:
+            raw = body.decode("utf-8")
+        except UnicodeDecodeError:
+            raise HTTPError(400, "body is not UTF-8") from None
+        if raw.lstrip().startswith("{"):
+            try:
+                data = json.loads(raw)
+            except json.JSONDecodeError:
+                raise HTTPError(400, "body is not valid JSON") from None
+            if not isinstance(data.get("text"), str):
+                raise HTTPError(400, "JSON body needs a \"text\" string")
+            return data["text"], data.get("title")
+        return raw, None
+
+    def quantiles(self):
+        if not self.latencies:
+            return {}
+        ordered = sorted(self.latencies)
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in QUANTILES}
+
+    def count(self, status, path=None):
+        key = (status, path)
+        self.requests[key] = self.requests.get(key, 0) + 1
+
+    async def send_error(self, writer, status, message, path=None):
+        self.count(status, path)
+        await self.send(writer, status, json.dumps({"error": message}).encode("utf-8"))
+
+    async def send(self, writer, status, body, content_type="application/json"):
+        reason = HTTPStatus(status).phrase
+        writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: {content_type}\r\n"
+                     f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+        await writer.drain()
+
+    async def send_chunk(self, writer, obj):
+        line = json.dumps(obj).encode("utf-8") + b"\n"
+        writer.write(f"{len(line):x}\r\n".encode("latin-1") + line + b"\r\n")
+        await writer.drain()
+
+async def serve(host, port, workers=None, max_batch=MAX_BATCH):
+    service = ScoringService(workers=workers, max_batch=max_batch)
+    await service.start()
+    server = await asyncio.start_server(service.handle, host, port)
+    # Stop on SIGTERM as on Ctrl-C, so the pool's workers are shut down too.
+    task = asyncio.current_task()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, task.cancel)
+    print(f"Scoring service on http://{host}:{port} ({service.workers} workers)", flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    except asyncio.CancelledError:
+        pass
+    finally:
+        await service.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve readability scoring over HTTP on localhost.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("READABILITY_WORKERS", "0")) or None,
+                        help="Scoring processes (default: READABILITY_WORKERS or CPU count).")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="Most texts sent to a worker at once.")
+    args = parser.parse_args(argv)
+    asyncio.run(serve(args.host, args.port, args.workers, args.max_batch))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
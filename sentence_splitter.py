@@ -0,0 +1,250 @@
+import pickle
+import re
+import sys
+
+# A faster stand-in for NLTK's PunktSentenceTokenizer that gives the same
+# sentence spans. The trained tables (abbreviations, collocations, frequent
+# sentence starters and orthographic context) are read out of the Punkt
+# pickle once, without importing nltk, into frozensets and a dict. Text is
+# then scanned with Punkt's own candidate regex, and each candidate's
+# context is classified with plain string tests and table lookups, in
+# place of Punkt's generator pipeline and per-token objects. The regexes
+# and heuristics below follow nltk.tokenize.punkt (3.9+) for English;
+# benchmarks/sentence_split.py checks agreement span for span.
+
+NON_WORD_CHARS = r"(?:[)\";}\]\*:@\'\({\[‘’“”\xab\xbb\?!])"
+MULTI_CHAR_PUNCT = r"(?:\-{2,}|\.{2,}|(?:\.\s){2,}\.)"
+WORD_START = r"[^\(\"\`{\[:;&\#\*@\)}\]\-,]"
+PERIOD_CONTEXT = re.compile(
+    rf"[\.\?!](?=(?P<after_tok>{NON_WORD_CHARS}|\s+(?P<next_tok>\S+)))"
+)
+WORD_TOKENIZER = re.compile(
+    rf"({MULTI_CHAR_PUNCT}"
+    rf"|(?={WORD_START})\S+?(?=\s|$|{NON_WORD_CHARS}|{MULTI_CHAR_PUNCT}"
+    rf"|,(?=$|\s|{NON_WORD_CHARS}|{MULTI_CHAR_PUNCT}))"
+    rf"|\S)"
+)
+BOUNDARY_REALIGNMENT = re.compile(r'["\')\]}‘’“”\xab\xbb]+?(?:\s+|(?=--)|$)', re.MULTILINE)
+LAST_WHITESPACE = re.compile(r"[ \t\n\r\x0b\x0c](?=[^ \t\n\r\x0b\x0c]*\Z)")
+ELLIPSIS = re.compile(r"\.\.+$")
+NUMERIC = re.compile(r"^-?[\.,]?\d[\d,\.-]*\.?$")
+INITIAL = re.compile(r"[^\W\d]\.$")
+
+SENT_END_CHARS = frozenset(".?!")
+PUNCTUATION = frozenset(";:,.!?")
+CLOSING_CHARS = frozenset("\"')]}‘’“”\xab\xbb")
+# Orthographic context bit masks, as in Punkt.
+ORTHO_MID_UC = 1 << 2
+ORTHO_BEG_LC = 1 << 4
+ORTHO_UC = (1 << 1) | (1 << 2) | (1 << 3)
+ORTHO_LC = (1 << 4) | (1 << 5) | (1 << 6)
+
+class SentenceSplitter:
+    def __init__(self, abbrev_types=(), collocations=(), sent_starters=(), ortho_context=None):
+        self.abbrev_types = frozenset(abbrev_types)
+        self.collocations = frozenset(tuple(pair) for pair in collocations)
+        self.collocation_starts = frozenset(first for first, _ in self.collocations)
+        self.sent_starters = frozenset(sent_starters)
+        self.ortho_context = dict(ortho_context or {})
+
+    @classmethod
+    def from_pickle(cls, path):
+        with open(path, "rb") as f:
+            model = PunktPickleReader(f).load()
+        params = model.state["_params"].state
+        lang_vars = model.state.get("_lang_vars")
+        if lang_vars is not None and lang_vars.name != "PunktLanguageVars":
+            raise ValueError(f"{path} uses {lang_vars.name}; only the default English rules are supported")
+        return cls(params["abbrev_types"], params["collocations"], params["sent_starters"], params["ortho_context"])
+
+    def tokenize(self, text):
+        return [text[start:end] for start, end in self.span_tokenize(text)]
+
+    def count(self, text):
+        return sum(1 for _ in self.span_tokenize(text))
+
+    def span_tokenize(self, text):
+        # Punkt's _realign_boundaries over _slices_from_text: closing quotes
+        # and brackets after a break move back into the sentence they close.
+        realign = 0
+        pending = None
+        for start, end in self._slices(text):
+            if pending is not None:
+                first_start, first_end = pending
+                first_start += realign
+                m = None
+                if start < end and text[start] in CLOSING_CHARS:
+                    m = BOUNDARY_REALIGNMENT.match(text, start, end)
+                if m:
+                    yield first_start, start + len(m.group(0).rstrip())
+                    realign = m.end() - start
+                else:
+                    realign = 0
+                    if first_start < first_end:
+                        yield first_start, first_end
+            pending = (start, end)
+        first_start, first_end = pending
+        first_start += realign
+        if first_start < first_end:
+            yield first_start, first_end
+
+    def _slices(self, text):
+        # Punkt's _slices_from_text over _match_potential_end_contexts. Each
+        # candidate is judged on the word before it and the token after it;
+        # a candidate whose preceding word overlaps the next candidate's is
+        # dropped ("acting!!!" is judged once, at the last "!").
+        last_break = 0
+        prev_start = prev_stop = 0
+        prev_match = None
+        for match in PERIOD_CONTEXT.finditer(text):
+            stop = match.start()
+            space = text.rfind(" ", prev_stop, stop)
+            other = LAST_WHITESPACE.search(text, space + 1 if space >= 0 else prev_stop, stop)
+            if other:
+                space = other.start()
+            # Punkt reports "no whitespace" and "whitespace at offset 0" alike.
+            word_start = space + 1 if space > prev_stop else prev_start
+            if prev_match is not None and prev_stop <= word_start and self._breaks(text, prev_start, prev_stop, prev_match):
+                yield last_break, prev_match.end()
+                next_tok = prev_match.start("next_tok")
+                last_break = next_tok if next_tok >= 0 else prev_match.end()
+            prev_match = match
+            prev_start, prev_stop = word_start, stop
+        if prev_match is not None and self._breaks(text, prev_start, prev_stop, prev_match):
+            yield last_break, prev_match.end()
+            next_tok = prev_match.start("next_tok")
+            last_break = next_tok if next_tok >= 0 else prev_match.end()
+        yield last_break, len(text.rstrip())
+
+    def _breaks(self, text, start, stop, match):
+        word = text[start:stop]
+        end_char = match.group()
+        # Fast path for the usual case, a plain word before the candidate:
+        # Punkt tokenizes it as one token ending at the candidate, which is
+        # a break for "?" and "!", and for "." unless the word is an
+        # initial, an abbreviation or starts a collocation.
+        if word.isalpha():
+            if end_char != ".":
+                return True
+            if len(word) > 1:
+                typ = word.lower()
+                if typ not in self.abbrev_types and typ not in self.collocation_starts:
+                    return True
+        return self._contains_sentbreak(word + end_char + match.group("after_tok"))
+
+    def _contains_sentbreak(self, context):
+        # True if some token but the last is a sentence break after Punkt's
+        # first (type-based) and second (context-based) annotation passes.
+        if "\n" in context:
+            tokens = []
+            for line in context.split("\n"):
+                if line.strip():
+                    tokens.extend(WORD_TOKENIZER.findall(line))
+        else:
+            tokens = WORD_TOKENIZER.findall(context)
+        if len(tokens) < 2:
+            return False
+        marks = [self._first_pass(tok) for tok in tokens]
+        for i in range(len(tokens) - 1):
+            sentbreak, abbr, ellipsis = marks[i]
+            tok = tokens[i]
+            if tok[-1] == ".":
+                sentbreak = self._second_pass(tok, sentbreak, abbr, ellipsis, tokens[i + 1], marks[i + 1][0])
+            if sentbreak:
+                return True
+        return False
+
+    def _first_pass(self, tok):
+        # (sentbreak, abbr, ellipsis)
+        if tok in SENT_END_CHARS:
+            return True, False, False
+        if ELLIPSIS.match(tok):
+            return False, False, True
+        if tok[-1] == "." and not tok.endswith(".."):
+            stem = tok[:-1].lower()
+            if stem in self.abbrev_types or stem.split("-")[-1] in self.abbrev_types:
+                return False, True, False
+            return True, False, False
+        return False, False, False
+
+    def _second_pass(self, tok, sentbreak, abbr, ellipsis, next_tok, next_sentbreak):
+        # Punkt's _second_pass_annotation for a period-final token; returns
+        # its final sentbreak flag.
+        typ = token_type(tok)
+        if len(typ) > 1 and typ[-1] == ".":
+            typ = typ[:-1]
+        next_typ = token_type(next_tok)
+        if next_sentbreak and len(next_typ) > 1 and next_typ[-1] == ".":
+            next_typ = next_typ[:-1]
+        is_initial = INITIAL.match(tok) is not None
+
+        if (typ, next_typ) in self.collocations:
+            return False
+
+        if (abbr or ellipsis) and not is_initial:
+            starter = self._ortho_heuristic(next_tok, next_typ)
+            if starter is True:
+                return True
+            if next_tok[0].isupper() and next_typ in self.sent_starters:
+                return True
+
+        if is_initial or typ == "##number##":
+            starter = self._ortho_heuristic(next_tok, next_typ)
+            if starter is False:
+                return False
+            if (
+                starter == "unknown"
+                and is_initial
+                and next_tok[0].isupper()
+                and not (self.ortho_context.get(next_typ, 0) & ORTHO_LC)
+            ):
+                return False
+        return sentbreak
+
+    def _ortho_heuristic(self, tok, typ):
+        if tok in PUNCTUATION:
+            return False
+        context = self.ortho_context.get(typ, 0)
+        if tok[0].isupper() and (context & ORTHO_LC) and not (context & ORTHO_MID_UC):
+            return True
+        if tok[0].islower() and ((context & ORTHO_UC) or not (context & ORTHO_BEG_LC)):
+            return False
+        return "unknown"
+
+def token_type(tok):
+    lowered = tok.lower()
+    return "##number##" if NUMERIC.match(lowered) else lowered
+
+class PickledObject:
+    # Stand-in for the nltk classes in a Punkt pickle (subclassed once per
+    # class name); keeps the state pickle hands to it.
+    state = {}
+
+    @property
+    def name(self):
+        return type(self).__name__
+
+    def __setstate__(self, state):
+        if isinstance(state, tuple):
+            # (__dict__, __slots__ values)
+            merged = {}
+            for part in state:
+                merged.update(part or {})
+            state = merged
+        self.state = state
+
+class PunktPickleReader(pickle.Unpickler):
+    # Loads a Punkt pickle without importing nltk, and without running any
+    # code a tampered pickle might name: only nltk.tokenize.punkt classes
+    # (as PickledObject) and a few containers are allowed.
+    ALLOWED = {
+        ("collections", "defaultdict"), ("builtins", "int"), ("builtins", "set"),
+        ("builtins", "frozenset"), ("builtins", "tuple"), ("builtins", "dict"),
+    }
+
+    def find_class(self, module, name):
+        if module == "nltk.tokenize.punkt":
+            return type(name, (PickledObject,), {})
+        if (module, name) in self.ALLOWED:
+            return getattr(sys.modules[module], name)
+        raise pickle.UnpicklingError(f"{module}.{name} is not allowed in a Punkt pickle")
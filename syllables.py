@@ -0,0 +1,120 @@
+import argparse
+import mmap
+import os
+import re
+import sys
+from functools import lru_cache
+
+SYLLABLE_PATTERN = re.compile(r'[aeiouy]+')
+WORD_PATTERN = re.compile(r'\b\w+\b')
+
+# A syllable table is a sorted file of fixed-width records: the lowercased
+# word as UTF-8, NUL-padded to WORD_BYTES, followed by one count byte. It is
+# memory-mapped and binary-searched in place, so opening it costs nothing
+# and a large vocabulary is shared between processes through the page cache.
+WORD_BYTES = 31
+RECORD_BYTES = WORD_BYTES + 1
+DEFAULT_TABLE_PATH = os.environ.get("READABILITY_SYLLABLE_TABLE")
+DEFAULT_CACHE_SIZE = 1 << 16
+
+def regex_syllables(word):
+    return len(SYLLABLE_PATTERN.findall(word.lower()))
+
+class SyllableTable:
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.records = size // RECORD_BYTES
+
+    def get(self, word):
+        key = word.lower().encode("utf-8")
+        if len(key) > WORD_BYTES:
+            return None
+        key = key.ljust(WORD_BYTES, b"\0")
+        lo, hi = 0, self.records
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = mid * RECORD_BYTES
+            probe = self._map[start:start + WORD_BYTES]
+            if probe < key:
+                lo = mid + 1
+            elif probe > key:
+                hi = mid
+            else:
+                return self._map[start + WORD_BYTES]
+        return None
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+def build_syllable_table(words, path):
+    records = {}
+    for word in words:
+        key = word.lower().encode("utf-8")
+        if len(key) <= WORD_BYTES and key not in records:
+            records[key] = min(regex_syllables(word), 255)
+    with open(path, "wb") as f:
+        for key in sorted(k.ljust(WORD_BYTES, b"\0") for k in records):
+            f.write(key + bytes([records[key.rstrip(b"\0")]]))
+    return len(records)
+
+class SyllableCounter:
+    # Counts each distinct word once: an LRU memo in front of an optional
+    # precomputed table, with the vowel-group regex as the last resort.
+    # Results always equal regex_syllables(word).
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE, table_path=DEFAULT_TABLE_PATH):
+        self.table = SyllableTable(table_path) if table_path and os.path.exists(table_path) else None
+        self.table_hits = 0
+        self._cached = lru_cache(maxsize=maxsize)(self._lookup)
+
+    def __call__(self, word):
+        return self._cached(word)
+
+    def _lookup(self, word):
+        if self.table is not None:
+            count = self.table.get(word)
+            if count is not None:
+                self.table_hits += 1
+                return count
+        return regex_syllables(word)
+
+    def stats(self):
+        info = self._cached.cache_info()
+        return {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "maxsize": info.maxsize,
+            "table_hits": self.table_hits,
+            "table_records": self.table.records if self.table is not None else 0,
+        }
+
+    def clear(self):
+        self._cached.cache_clear()
+        self.table_hits = 0
+
+count_syllables = SyllableCounter()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a memory-mapped syllable table from text files.")
+    parser.add_argument("output", help="Table file to write.")
+    parser.add_argument("inputs", nargs="+", help="UTF-8 text files whose vocabulary goes into the table.")
+    args = parser.parse_args(argv)
+
+    def words():
+        for path in args.inputs:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    yield from WORD_PATTERN.findall(line)
+
+    n = build_syllable_table(words(), args.output)
+    print(f"Wrote {n} words to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+# Deterministic text generators shared by the tests and the benchmarks.
+# generate_novel writes manuscripts in the app's upload format: a metadata
+# block followed by "### CHAPTER N" sections of plain prose; the same seed
+# and settings always produce the same text. fuzz_text writes a stream of
+# awkward prose (abbreviations, initials, numbers, ellipses, runs of "!?",
+# quotes and brackets after a break, dashes and hard line breaks) for
+# checking sentence splitting and feature extraction at the edges.
+import pickle
+import random
+
+SUBJECTS = ["William", "Hannah", "the smith", "the old mare", "a stranger", "the children", "the foreman", "she", "he"]
+VERBS = ["walked", "stopped", "waited", "turned", "called", "followed", "counted", "carried", "crossed", "pulled"]
+OBJECTS = ["the gate", "the bellows", "a lantern", "the ledger", "the cart", "a letter", "the river road", "the anvil"]
+FILLER = [
+    "slowly", "across", "the", "yard", "before", "morning", "again", "near", "quiet", "field", "stone",
+    "under", "bridge", "while", "rain", "fell", "without", "word", "long", "after", "supper", "hills",
+]
+LONG_WORDS = ["consideration", "responsibility", "establishment", "extraordinarily", "understanding", "arrangement"]
+SENSORY = ["look", "see", "glow", "hear", "roar", "echo", "feel", "warm", "cold", "smell", "scent", "taste", "bitter", "sweet"]
+PASSIVE = ["was stopped", "were called", "is needed", "was carried", "been painted", "are covered", "was finished"]
+
+def generate_sentence(rng, sensory_density, passive_density, rare_density):
+    words = [rng.choice(SUBJECTS)]
+    if rng.random() < passive_density:
+        words.append(rng.choice(PASSIVE))
+    else:
+        words.append(rng.choice(VERBS))
+        words.append(rng.choice(OBJECTS))
+    for _ in range(rng.randint(2, 16)):
+        roll = rng.random()
+        if roll < sensory_density:
+            words.append(rng.choice(SENSORY))
+        elif roll < sensory_density + rare_density:
+            words.append(rng.choice(LONG_WORDS))
+        else:
+            words.append(rng.choice(FILLER))
+    sentence = " ".join(words)
+    return sentence[0].upper() + sentence[1:] + rng.choice([".", ".", ".", "!", "?"])
+
+def generate_chapter(rng, words_per_chapter, sensory_density, passive_density, rare_density):
+    paragraphs = []
+    sentences = []
+    count = 0
+    while count < words_per_chapter:
+        sentence = generate_sentence(rng, sensory_density, passive_density, rare_density)
+        sentences.append(sentence)
+        count += len(sentence.split())
+        if len(sentences) >= rng.randint(3, 7):
+            paragraphs.append(" ".join(sentences))
+            sentences = []
+    if sentences:
+        paragraphs.append(" ".join(sentences))
+    return "\n\n".join(paragraphs)
+
+def generate_novel(chapters=40, words_per_chapter=3000, sensory_density=0.04, passive_density=0.1,
+                   rare_density=0.03, seed=0, title="Synthetic Novel"):
+    rng = random.Random(seed)
+    parts = [
+        "### METADATA START",
+        f"Title: {title}",
+        "Author: Benchmark Generator",
+        f"Chapters: {chapters}",
+        f"Edition: seed {seed}",
+        "### METADATA END",
+        "",
+    ]
+    for number in range(1, chapters + 1):
+        parts.append(f"### CHAPTER {number}")
+        parts.append(generate_chapter(rng, words_per_chapter, sensory_density, passive_density, rare_density))
+        parts.append("")
+    return "\n".join(parts)
+
+WORDS = [
+    "the", "river", "was", "cold", "and", "she", "waited", "by", "gate", "for", "Hannah", "William", "London",
+    "while", "rain", "fell", "on", "stone", "He", "They", "It", "a", "letter", "came", "from", "i", "co",
+]
+ABBREVIATIONS = ["Mr.", "Mrs.", "Dr.", "St.", "etc.", "e.g.", "i.e.", "Jan.", "No.", "vs.", "Co.", "Lt.-Col.", "U.S.", "p.m."]
+ODD_TOKENS = [
+    "J.", "R.", "3.", "1.5", "12,000.", "-4.", ".5", "...", "..", ". . .", "--", "(see", "above)", "[sic]",
+    "“Yes!”", "‘no.’", "«non»", "\"Well.\"", "'quite'", "Why?!", "no!!!", "wait?",
+    "word.)", "end.]", "}", ";", ":", ",", "@home.", "*note*", "&c.", "#4.", "x.y.", "A.", "the.", "CAPS.",
+]
+ENDINGS = [".", ".", ".", "?", "!", "...", ".”", "!”", "?)", ".'", ".]", ".\"", " .", "!!", "?!", ".--"]
+SEPARATORS = [" ", " ", " ", "  ", "\n", "\n\n", "\t", " \n", "\r\n", "\x0c"]
+
+def fuzz_text(sentences, seed=0):
+    rng = random.Random(seed)
+    parts = []
+    for _ in range(sentences):
+        words = []
+        for _ in range(rng.randint(1, 14)):
+            roll = rng.random()
+            if roll < 0.12:
+                words.append(rng.choice(ABBREVIATIONS))
+            elif roll < 0.25:
+                words.append(rng.choice(ODD_TOKENS))
+            else:
+                word = rng.choice(WORDS)
+                words.append(word.capitalize() if rng.random() < 0.15 else word)
+        if rng.random() < 0.1:
+            words[0] = "“" + words[0]
+        parts.append(" ".join(words) + rng.choice(ENDINGS))
+        parts.append(rng.choice(SEPARATORS))
+    return "".join(parts)
+
+def train_model(text, path):
+    # A Punkt model trained on `text`, pickled the way english.pickle is.
+    from nltk.tokenize.punkt import PunktSentenceTokenizer, PunktTrainer
+    trainer = PunktTrainer()
+    trainer.INCLUDE_ALL_COLLOCS = True
+    trainer.train(text, finalize=True)
+    with open(path, "wb") as f:
+        pickle.dump(PunktSentenceTokenizer(trainer.get_params()), f)
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+def paragraphs(text, size):
+    # Cut at blank lines into pieces of about `size` characters, so edge
+    # cases land at text ends as well as mid-text.
+    pieces, start = [], 0
+    while start < len(text):
+        cut = text.find("\n\n", start + size)
+        end = len(text) if cut < 0 else cut + 2
+        pieces.append(text[start:end])
+        start = end
+    return pieces
@@ -0,0 +1,50 @@
+# compare_titles must give the per-title numbers a pandas groupby gives, and
+# z-score each title's mean against the means of the other titles only.
+import os
+import random
+import sys
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from tests.corpora import generate_novel
+from comparison_report import METRICS, SCORE, compare_titles
+from feature_matrix import chapter_frame
+from readability_utils import parse_metadata_and_chapters
+
+def pooled_frame(n_titles):
+    frames = []
+    for i in range(n_titles):
+        rng = random.Random(i)
+        text = generate_novel(chapters=rng.randint(2, 6), words_per_chapter=rng.randint(150, 400), seed=i)
+        _, chapters = parse_metadata_and_chapters(text)
+        frames.append(chapter_frame(chapters).assign(Title=f"Title {i}", Author=f"Author {i % 2}"))
+    return pd.concat(frames, ignore_index=True)
+
+def test_matches_groupby():
+    frame = pooled_frame(5)
+    summary, pooled = compare_titles(frame)
+    grouped = frame.groupby("Title")
+    assert pooled.count == len(frame)
+    pd.testing.assert_frame_equal(summary[METRICS].sort_index(), grouped[METRICS].mean(), check_names=False)
+    assert summary["Chapters"].sort_index().tolist() == grouped.size().tolist()
+    assert summary["Words"].sort_index().tolist() == grouped["Word Count"].sum().tolist()
+    assert summary["Lowest Chapter Score"].sort_index().tolist() == grouped[SCORE].min().tolist()
+    assert summary["Author"].sort_index().tolist() == grouped["Author"].first().tolist()
+    assert summary["Rank"].is_monotonic_increasing
+
+def test_leave_one_out_z():
+    summary, _ = compare_titles(pooled_frame(6))
+    means = summary[METRICS]
+    for title in summary.index:
+        others = means.drop(title)
+        expected = (means.loc[title] - others.mean()) / others.std()
+        z = summary.loc[title, [f"{col} Z" for col in METRICS]].to_numpy(dtype=np.float64)
+        np.testing.assert_allclose(z, expected.to_numpy(dtype=np.float64), rtol=1e-9)
+
+def test_two_titles_have_no_z():
+    summary, _ = compare_titles(pooled_frame(2))
+    assert summary[f"{SCORE} Z"].isna().all()
@@ -0,0 +1,63 @@
+# feature_matrix must give every text exactly the metrics analyze_text
+# gives it, score rounding included, and chapter_frame must give the same
+# rows whether chapters come from the cache or are scored.
+import os
+import random
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from tests.corpora import fuzz_text, generate_novel, paragraphs
+from feature_matrix import chapter_frame, feature_matrix
+from readability_utils import analyze_text, parse_metadata_and_chapters
+from result_cache import ResultCache
+
+# Scores whose unrounded value sits on a halfway point, where np.round and
+# round() disagree.
+HALFWAY_TEXTS = [
+    "! ccc. ! stopped bb Mr. was ddddd",
+    "was look look was bb Mr. was ddddd Mr. ccc. a extraordinarily ddddd stopped ccc. Mr.",
+    "Mr. Mr. extraordinarily bb Mr. bb ddddd a extraordinarily ccc. stopped was bb a stopped ccc.",
+]
+SHORT_WORDS = ["a", "bb", "ccc.", "ddddd", "extraordinarily", "was", "stopped", "look", "the", "Mr.", "!"]
+
+def short_texts(count, seed):
+    # Many tiny texts, so the score ratios land on many exact fractions.
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(SHORT_WORDS) for _ in range(rng.randint(1, 40))) for _ in range(count)]
+
+def assert_matches_analyze_text(texts):
+    frame = feature_matrix(texts)
+    assert len(frame) == len(texts)
+    for text, row in zip(texts, frame.to_dict("records")):
+        assert row == analyze_text(text), text
+
+def test_halfway_scores():
+    assert_matches_analyze_text(HALFWAY_TEXTS)
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_fuzz_text(seed):
+    assert_matches_analyze_text(paragraphs(fuzz_text(4000, seed=seed), 300) + ["", " ", "."])
+
+def test_short_texts():
+    assert_matches_analyze_text(short_texts(5000, seed=2))
+
+def test_chapter_frame_matches_analyze_text(tmp_path):
+    _, chapters = parse_metadata_and_chapters(generate_novel(chapters=8, words_per_chapter=400))
+    expected = [{"Chapter": title, **analyze_text(text)} for title, text in chapters]
+
+    # Small blocks, so the chapters are scored over several calls.
+    assert chapter_frame(chapters, block_chars=5000).to_dict("records") == expected
+
+    cache = ResultCache(str(tmp_path / "cache.sqlite3"))
+    cache.put(cache.key(chapters[2][1]), analyze_text(chapters[2][1]))
+    assert chapter_frame(chapters, cache=cache, block_chars=5000).to_dict("records") == expected
+    # Everything is cached now.
+    assert chapter_frame(chapters, cache=cache).to_dict("records") == expected
+
+def test_empty_input():
+    assert feature_matrix([]).empty
+    assert list(chapter_frame([]).columns)[0] == "Chapter"
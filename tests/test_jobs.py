@@ -0,0 +1,83 @@
+# Heavy-job admission in jobs.JobManager: heavy jobs queue for their own
+# slots without holding the runners light jobs use. _analyze is replaced
+# by a stand-in that blocks until released, so no chapters are scored.
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from jobs import JobManager, JobStore
+
+HEAVY_CHARS = 100
+TIMEOUT = 5.0
+
+class BlockingAnalysis:
+    # Stands in for JobManager._analyze: each job runs until released.
+
+    def __init__(self):
+        self.started = []
+        self.release = {}
+
+    def __call__(self, job_id, chapters, metadata, previous, window_size, budget):
+        self.release[job_id] = threading.Event()
+        self.started.append(job_id)
+        self.release[job_id].wait(TIMEOUT)
+        return "done"
+
+def wait_for(predicate):
+    deadline = time.monotonic() + TIMEOUT
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+@pytest.fixture
+def manager():
+    manager = JobManager(store=JobStore(":memory:"), max_workers=1, max_jobs=2, heavy_job_chars=HEAVY_CHARS,
+                         max_heavy_jobs=1)
+    manager._analyze = BlockingAnalysis()
+    yield manager
+    for event in manager._analyze.release.values():
+        event.set()
+    manager.shutdown()
+
+def submit(manager, chars):
+    return manager.submit([("Chapter 1", "x" * chars)], {"Title": "T"})
+
+def status(manager, job_id):
+    return manager.store.get(job_id)["status"]
+
+def test_light_job_starts_while_heavy_jobs_queue(manager):
+    analysis = manager._analyze
+    heavy = [submit(manager, HEAVY_CHARS * 2) for _ in range(3)]
+    assert wait_for(lambda: heavy[0] in analysis.started)
+    # Every heavy slot is taken and more heavy jobs than light runners wait.
+    assert [status(manager, job_id) for job_id in heavy[1:]] == ["queued", "queued"]
+
+    light = submit(manager, 10)
+    assert wait_for(lambda: light in analysis.started)
+    assert heavy[1] not in analysis.started
+
+    analysis.release[light].set()
+    assert wait_for(lambda: status(manager, light) == "done")
+    analysis.release[heavy[0]].set()
+    assert wait_for(lambda: heavy[1] in analysis.started)
+    assert heavy[2] not in analysis.started
+
+def test_cancelling_a_queued_heavy_job(manager):
+    analysis = manager._analyze
+    running = submit(manager, HEAVY_CHARS * 2)
+    queued = submit(manager, HEAVY_CHARS * 2)
+    assert wait_for(lambda: running in analysis.started)
+
+    manager.cancel(queued)
+    assert status(manager, queued) == "cancelled"
+    analysis.release[running].set()
+    assert wait_for(lambda: status(manager, running) == "done")
+    assert queued not in analysis.started
@@ -0,0 +1,47 @@
+# ResultCache's disk budget must hold when several caches (processes, in
+# practice) write to one SQLite file.
+import json
+import os
+import sqlite3
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from result_cache import ResultCache
+
+METRICS = {"Word Count": 100, "Dyslexia-Friendly Score": 61.25}
+ROW_BYTES = len(json.dumps(METRICS))
+
+def table_bytes(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COALESCE(SUM(size), 0) FROM chapter_metrics").fetchone()[0]
+
+def test_shared_file_stays_under_budget(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    budget = ROW_BYTES * 20
+    caches = [ResultCache(path, memory_items=1, max_disk_bytes=budget) for _ in range(3)]
+    for i in range(60):
+        caches[i % 3].put(f"key-{i}", METRICS)
+        assert table_bytes(path) <= budget
+    for cache in caches:
+        assert cache.stats()["disk_bytes"] == table_bytes(path)
+    # The newest rows survive.
+    assert caches[0].get("key-59") == METRICS
+
+def test_replacing_a_row_and_clear(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    first, second = ResultCache(path), ResultCache(path)
+    first.put("key", METRICS)
+    second.put("key", METRICS)
+    assert first.stats()["disk_bytes"] == ROW_BYTES
+    second.clear()
+    assert first.stats()["disk_bytes"] == table_bytes(path) == 0
+
+def test_existing_cache_file(tmp_path):
+    # A file written before the total was kept starts from its rows' sizes.
+    path = str(tmp_path / "cache.sqlite3")
+    ResultCache(path).put("key", METRICS)
+    with sqlite3.connect(path) as conn:
+        conn.execute("DROP TABLE cache_size")
+    assert ResultCache(path).stats()["disk_bytes"] == ROW_BYTES
@@ -0,0 +1,34 @@
+# ScoringService end to end without HTTP: chapters come back in order with
+# analyze_text's metrics, and close() leaves no dispatch task behind.
+import asyncio
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from tests.corpora import generate_novel
+from readability_utils import analyze_text, parse_metadata_and_chapters
+from scoring_service import ScoringService
+
+def test_score_chapters_and_close():
+    text = generate_novel(chapters=6, words_per_chapter=600)
+    metadata, chapters = parse_metadata_and_chapters(text)
+
+    async def run():
+        # Small segments, so long chapters go through segment_bounds too.
+        service = ScoringService(workers=1, max_batch=4, segment_chars=1000)
+        await service.start()
+        try:
+            results = [(meta, metrics) async for meta, metrics in service.score_chapters(text)]
+        finally:
+            await service.close()
+        return service, results
+
+    service, results = asyncio.run(run())
+    assert [meta for meta, _ in results] == [metadata] * len(chapters)
+    assert [metrics for _, metrics in results] == [{**analyze_text(chap_text), "Chapter": chap_title}
+                                                   for chap_title, chap_text in chapters]
+    assert service.batcher.batches > 0
+    assert not service.batcher._dispatches
+    assert service.batcher._task.done()
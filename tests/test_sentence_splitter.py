@@ -0,0 +1,90 @@
+# sentence_splitter must find exactly the sentence spans NLTK's Punkt finds,
+# with the shipped english.pickle and with a model trained on awkward text.
+# The corpora (tests/corpora.py) are the ones benchmarks/sentence_split.py times.
+#
+#     python -m pytest tests/test_sentence_splitter.py
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+pytest.importorskip("nltk")
+
+from tests.corpora import fuzz_text, generate_novel, paragraphs, train_model
+from readability_utils import PUNKT_PATH, get_punkt_tokenizer
+from sentence_splitter import SentenceSplitter
+
+EDGE_CASES = [
+    # empty and near-empty input
+    "", " ", "\n\n", ".", "!!!", "a.", "end. ",
+    # abbreviations and initials
+    "Mr. Smith met Dr. Jones at St. Paul's. They spoke.",
+    "Send it to the U.S. office, i.e. the one in Boston. It arrived at 5 p.m. on Jan. 3.",
+    "J. R. R. Tolkien wrote it. A. B. C. are letters.",
+    "Prices rose, e.g. bread and milk etc. Then they fell.",
+    "Lt.-Col. Hart arrived. No. 4 was empty.",
+    # ellipses
+    "She waited... Nobody came.",
+    "He paused . . . then left. Silence.",
+    "Wait.. what? Yes...",
+    "...",
+    # quotes and brackets after a break
+    "“No.” She turned away.",
+    "He said, “Stop!” Then he ran.",
+    "‘Quite so.’ He nodded.",
+    "\"Well.\" That was all.",
+    "It ended (mostly.) The rest followed.",
+    "See the note [sic.] below. Then stop.",
+    "Why?! Nobody knows!! Really?",
+    # numbers and line breaks
+    "It cost 12,000. The rest was 1.5 more.",
+    "First line.\nSecond line.\r\nThird line.\x0cFourth.",
+]
+
+@pytest.fixture(scope="module")
+def shipped():
+    return get_punkt_tokenizer(), SentenceSplitter.from_pickle(PUNKT_PATH)
+
+@pytest.fixture(scope="module")
+def trained(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("punkt") / "trained.pickle")
+    return train_model(fuzz_text(5000, seed=1), path), SentenceSplitter.from_pickle(path)
+
+def assert_same_spans(reference, splitter, text):
+    assert list(splitter.span_tokenize(text)) == list(reference.span_tokenize(text)), text
+
+@pytest.mark.parametrize("text", EDGE_CASES)
+def test_edge_cases(shipped, text):
+    reference, splitter = shipped
+    assert_same_spans(reference, splitter, text)
+    assert splitter.tokenize(text) == reference.tokenize(text)
+    assert splitter.count(text) == len(reference.tokenize(text))
+
+def test_empty_input(shipped):
+    _, splitter = shipped
+    assert list(splitter.span_tokenize("")) == []
+    assert splitter.count("") == 0
+
+def test_novel_chapters(shipped):
+    reference, splitter = shipped
+    for chapter in generate_novel(chapters=10, words_per_chapter=1500).split("### "):
+        assert_same_spans(reference, splitter, chapter)
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_fuzz_text(shipped, seed):
+    reference, splitter = shipped
+    for piece in paragraphs(fuzz_text(3000, seed=seed), 400):
+        assert_same_spans(reference, splitter, piece)
+
+@pytest.mark.parametrize("text", EDGE_CASES)
+def test_trained_model_edge_cases(trained, text):
+    reference, splitter = trained
+    assert_same_spans(reference, splitter, text)
+
+def test_trained_model_fuzz_text(trained):
+    reference, splitter = trained
+    for piece in paragraphs(fuzz_text(3000, seed=3), 400):
+        assert_same_spans(reference, splitter, piece)
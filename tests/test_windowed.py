@@ -0,0 +1,37 @@
+# window_score_table keeps one row per chapter, in order, even when
+# chapters share a title, and the report's hotspot page draws from it.
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from tests.corpora import generate_novel
+from feature_matrix import chapter_frame
+from readability_utils import parse_metadata_and_chapters
+from windowed import chapter_window_scores, window_score_frame, window_score_table
+
+def chapters_with_shared_titles():
+    _, chapters = parse_metadata_and_chapters(generate_novel(chapters=4, words_per_chapter=400))
+    return [("Interlude" if i % 2 else chap_title, chap_text) for i, (chap_title, chap_text) in enumerate(chapters)]
+
+def test_duplicate_titles_keep_their_rows():
+    chapters = chapters_with_shared_titles()
+    table = window_score_table(chapters, window=5, step=2)
+    assert list(table.index) == [(i, chap_title) for i, (chap_title, _) in enumerate(chapters)]
+    for (_, row), (_, chap_text) in zip(table.iterrows(), chapters):
+        assert row.dropna().tolist() == chapter_window_scores(chap_text, 5, 2)
+
+def test_empty_and_windowless_chapters():
+    assert window_score_frame([]).empty
+    table = window_score_frame([("A", [60.0]), ("A", []), ("B", [50.0, 55.0])])
+    assert len(table) == 3
+    assert table.iloc[1].isna().all()
+
+def test_report_draws_duplicate_titles():
+    from validation_report_generator_wrapped import generate_enhanced_report
+
+    chapters = chapters_with_shared_titles()
+    table = window_score_table(chapters, window=5, step=2)
+    pdf = generate_enhanced_report(chapter_frame(chapters), {"Title": "T"}, window_scores=table)
+    assert pdf.getvalue().startswith(b"%PDF")
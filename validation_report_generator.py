@@ -1,23 +1,23 @@
 
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from fpdf import FPDF
 import os
+from metrics_store import open_metrics_store
+from validation_report_generator_wrapped import (add_chart, cached_chart, chapter_z_scores, draw_heatmap, outlier_messages,
+                                                  sanitize_text)
 
-def generate_validation_report(csv_path, title="Readability Validation Report", output_path="validation_report.pdf", logo_path=None):
-    df = pd.read_csv(csv_path)
-    feature_cols = df.columns.drop("Chapter")
+def generate_validation_report(csv_path=None, title="Readability Validation Report", output_path="validation_report.pdf", logo_path=None, store=None):
+    # Without a CSV, the title's chapters are read from the metrics store.
+    if csv_path is None:
+        df = (store or open_metrics_store()).title_frame(title)
+        if df.empty:
+            raise ValueError(f"{title!r} is not in the metrics store")
+    else:
+        df = pd.read_csv(csv_path)
 
-    # Compute z-scores
-    z_scores = df[feature_cols].apply(lambda x: (x - x.mean()) / x.std())
-    z_scores["Chapter"] = df["Chapter"]
-
-    # Detect outliers
-    outliers = z_scores[feature_cols].abs() > 2
-    outlier_rows = z_scores[outliers.any(axis=1)]
-    outlier_data = df.loc[outlier_rows.index]
+    # Compute z-scores and detect outliers
+    z_scores, outliers = chapter_z_scores(df)
 
     # Summary info
     lowest = df.loc[df["Dyslexia-Friendly Score"].idxmin()]
@@ -62,36 +62,20 @@ def generate_validation_report(csv_path, title="Readability Validation Report",
         f"Strong performance in {df.drop(columns=['Chapter']).iloc[highest.name].idxmax()} helped readability.")
 
     # Heatmap
-    plt.figure(figsize=(10, 4))
-    sns.heatmap(z_scores.set_index("Chapter").transpose(), cmap="coolwarm", center=0, cbar_kws={'label': 'Z-score'})
-    plt.title("Z-Score Heatmap")
-    heatmap_path = "heatmap_temp.png"
-    plt.tight_layout()
-    plt.savefig(heatmap_path)
-    plt.close()
-
+    heatmap_image = cached_chart("heatmap", z_scores, draw_heatmap)
     pdf.add_page()
     pdf.set_font("Arial", 'B', 16)
     pdf.cell(0, 10, "Z-Score Heatmap", ln=True)
-    pdf.image(heatmap_path, x=10, y=25, w=180)
+    add_chart(pdf, "heatmap", heatmap_image, x=10, y=25, w=180)
 
     # Outlier explanations
     pdf.add_page()
     pdf.set_font("Arial", 'B', 16)
     pdf.cell(0, 10, "Chapter Outlier Explanations", ln=True)
     pdf.set_font("Arial", '', 12)
-    for _, row in outlier_rows.iterrows():
-        chap = row["Chapter"]
-        explanation = []
-        for col in feature_cols:
-            if abs(row[col]) > 2:
-                direction = "high" if row[col] > 0 else "low"
-                explanation.append(f"{direction} {col}")
-        if explanation:
-            feat_list = ", ".join(explanation)
-            impact = "improve" if df.loc[row.name, "Dyslexia-Friendly Score"] > 55 else "reduce"
-            pdf.multi_cell(0, 8, f"Chapter {chap} has outliers in: {feat_list}. These may {impact} the DF Score.")
-            pdf.ln(1)
+    for msg in outlier_messages(df, z_scores, outliers):
+        pdf.multi_cell(0, 8, msg)
+        pdf.ln(1)
 
     # Appendix
     appendix_text = """Appendix: Explanation of Features
@@ -109,8 +93,6 @@ def generate_validation_report(csv_path, title="Readability Validation Report",
     pdf.set_font("Arial", 'B', 16)
     pdf.cell(0, 10, "Appendix: Feature Definitions", ln=True)
     pdf.set_font("Arial", '', 11)
-    pdf.multi_cell(0, 8, appendix_text)
+    pdf.multi_cell(0, 8, sanitize_text(appendix_text))
 
     pdf.output(output_path)
-    if os.path.exists(heatmap_path):
-        os.remove(heatmap_path)
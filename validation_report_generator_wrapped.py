@@ -1,11 +1,24 @@
 
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 import seaborn as sns
 from fpdf import FPDF
 import os
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
 from io import BytesIO
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from instrumentation import instrumented, stage
+from running_stats import OUTLIER_Z, RunningStats
+
+# Rendered charts keyed by (chart, DataFrame hash), so re-running a report on
+# unchanged data skips matplotlib entirely.
+CHART_CACHE_SIZE = 32
+_chart_cache = OrderedDict()
+_chart_cache_lock = threading.Lock()
 
 def sanitize_text(text):
     if not isinstance(text, str):
@@ -20,15 +33,117 @@ def sanitize_text(text):
             .replace("…", "...")
     )
 
-def generate_enhanced_report(df, metadata=None, logo_path=None):
-    feature_cols = df.columns.drop("Chapter")
+def dataframe_hash(df):
+    digest = hashlib.sha256(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    digest.update(repr(list(df.columns)).encode("utf-8"))
+    return digest.hexdigest()
+
+@instrumented("report.render_chart")
+def render_figure(fig):
+    # Rasterize on the Agg canvas and encode the pixels the way FPDF stores a
+    # PNG (Flate with a per-row filter byte), skipping the PNG round trip and
+    # FPDF's slow per-row alpha extraction. No pyplot state, no files.
+    canvas = FigureCanvasAgg(fig)
+    canvas.draw()
+    rgba = np.asarray(canvas.buffer_rgba())
+    height, width = rgba.shape[:2]
+    rows = np.zeros((height, 1 + width * 3), dtype=np.uint8)
+    rows[:, 1:] = rgba[:, :, :3].reshape(height, width * 3)
+    return {
+        'w': width, 'h': height, 'cs': 'DeviceRGB', 'bpc': 8, 'f': 'FlateDecode',
+        'dp': f'/Predictor 15 /Colors 3 /BitsPerComponent 8 /Columns {width}',
+        'pal': '', 'trns': '', 'data': zlib.compress(rows.tobytes()),
+    }
+
+def cached_chart(kind, df, draw):
+    key = (kind, dataframe_hash(df))
+    with _chart_cache_lock:
+        if key in _chart_cache:
+            _chart_cache.move_to_end(key)
+            return _chart_cache[key]
+    image = draw(df)
+    with _chart_cache_lock:
+        _chart_cache[key] = image
+        while len(_chart_cache) > CHART_CACHE_SIZE:
+            _chart_cache.popitem(last=False)
+    return image
+
+def add_chart(pdf, name, image, x, y, w):
+    # Register the pre-encoded image under `name` so FPDF.image() uses it
+    # instead of opening a file.
+    if name not in pdf.images:
+        pdf.images[name] = dict(image, i=len(pdf.images) + 1)
+    pdf.image(name, x=x, y=y, w=w)
+
+def draw_trend_chart(df):
+    fig = Figure(figsize=(10, 4))
+    ax = fig.subplots()
+    ax.plot(df["Chapter"], df["Dyslexia-Friendly Score"], marker='o', linestyle='-')
+    ax.tick_params(axis='x', labelrotation=90)
+    ax.axhline(55, color='green', linestyle='--', label="Dyslexia-Friendly Threshold")
+    ax.set_title("Dyslexia-Friendly Score by Chapter")
+    ax.set_xlabel("Chapter")
+    ax.set_ylabel("Score")
+    ax.grid(True)
+    ax.legend()
+    fig.tight_layout()
+    return render_figure(fig)
+
+def draw_heatmap(z_scores):
+    fig = Figure(figsize=(10, 4))
+    ax = fig.subplots()
+    sns.heatmap(z_scores.set_index("Chapter").transpose(), cmap="coolwarm", center=0, cbar_kws={'label': 'Z-score'}, ax=ax)
+    ax.set_title("Z-Score Heatmap")
+    fig.tight_layout()
+    return render_figure(fig)
+
+def draw_window_heatmap(window_scores):
+    fig = Figure(figsize=(10, max(3, 0.25 * len(window_scores) + 1.5)))
+    ax = fig.subplots()
+    sns.heatmap(window_scores, cmap="RdYlGn", center=55, cbar_kws={'label': 'DF Score'}, ax=ax,
+                yticklabels=list(window_scores.index.get_level_values("Chapter")))
+    ax.set_title("Dyslexia-Friendly Score by Passage")
+    ax.set_xlabel("Window (start position within chapter)")
+    ax.set_ylabel("Chapter")
+    fig.tight_layout()
+    return render_figure(fig)
 
-    z_scores = df[feature_cols].apply(lambda x: (x - x.mean()) / x.std())
+def chapter_z_scores(df, stats=None):
+    # (z-score frame with a Chapter column, outlier flags) for the report
+    # pages. `stats` is a running_stats.RunningStats over the feature
+    # columns, e.g. built chapter by chapter while the book was analyzed;
+    # without one it is computed from df.
+    feature_cols = list(df.columns.drop("Chapter"))
+    values = df[feature_cols].to_numpy(dtype=np.float64)
+    if stats is None:
+        stats = RunningStats(feature_cols).update_many(values)
+    elif stats.columns != feature_cols:
+        values = df[stats.columns].to_numpy(dtype=np.float64)
+    z = stats.z_scores(values)
+    z_scores = pd.DataFrame(z, columns=stats.columns, index=df.index)
     z_scores["Chapter"] = df["Chapter"]
+    return z_scores, np.abs(np.nan_to_num(z)) > OUTLIER_Z
 
-    outliers = z_scores[feature_cols].abs() > 2
-    outlier_rows = z_scores[outliers.any(axis=1)]
-    outlier_data = df.loc[outlier_rows.index]
+def outlier_messages(df, z_scores, flags, threshold=55):
+    # One sentence per chapter with any outlying feature, in chapter order.
+    columns = [col for col in z_scores.columns if col != "Chapter"]
+    z = z_scores[columns].to_numpy()
+    chapters = df["Chapter"].to_numpy()
+    improves = df["Dyslexia-Friendly Score"].to_numpy() > threshold
+    messages = []
+    for i in np.flatnonzero(flags.any(axis=1)):
+        feat_list = ", ".join(
+            f"{'high' if z[i, j] > 0 else 'low'} {columns[j]}" for j in np.flatnonzero(flags[i])
+        )
+        impact = "improve" if improves[i] else "reduce"
+        messages.append(f"Chapter {chapters[i]} has outliers in: {feat_list}. These may {impact} the DF Score.")
+    return messages
+
+@instrumented("generate_enhanced_report")
+def generate_enhanced_report(df, metadata=None, logo_path=None, window_scores=None, stats=None, baseline=None):
+    # `baseline`, a RunningStats over catalogue chapters (see
+    # MetricsStore.baseline), adds a page comparing each chapter with it.
+    z_scores, outliers = chapter_z_scores(df, stats)
 
     lowest = df.loc[df["Dyslexia-Friendly Score"].idxmin()]
     highest = df.loc[df["Dyslexia-Friendly Score"].idxmax()]
@@ -75,54 +190,55 @@ def generate_enhanced_report(df, metadata=None, logo_path=None):
     pdf.multi_cell(0, 8, sanitize_text(highest_text))
 
     # Add DF Score trend graph
-    plt.figure(figsize=(10, 4))
-    plt.plot(df["Chapter"], df["Dyslexia-Friendly Score"], marker='o', linestyle='-')
-    plt.xticks(rotation=90)
-    plt.axhline(55, color='green', linestyle='--', label="Dyslexia-Friendly Threshold")
-    plt.title("Dyslexia-Friendly Score by Chapter")
-    plt.xlabel("Chapter")
-    plt.ylabel("Score")
-    plt.grid(True)
-    plt.legend()
-    trend_path = "df_trend_temp.png"
-    plt.tight_layout()
-    plt.savefig(trend_path)
-    plt.close()
-
+    trend_image = cached_chart("trend", df[["Chapter", "Dyslexia-Friendly Score"]], draw_trend_chart)
     pdf.add_page()
     pdf.set_font("Arial", 'B', 16)
     pdf.cell(0, 10, sanitize_text("Dyslexia-Friendly Score Trend"), ln=True)
-    pdf.image(trend_path, x=10, y=25, w=180)
+    add_chart(pdf, "df_trend", trend_image, x=10, y=25, w=180)
 
     # Z-Score Heatmap
-    plt.figure(figsize=(10, 4))
-    sns.heatmap(z_scores.set_index("Chapter").transpose(), cmap="coolwarm", center=0, cbar_kws={'label': 'Z-score'})
-    plt.title("Z-Score Heatmap")
-    heatmap_path = "heatmap_temp.png"
-    plt.tight_layout()
-    plt.savefig(heatmap_path)
-    plt.close()
-
+    heatmap_image = cached_chart("heatmap", z_scores, draw_heatmap)
     pdf.add_page()
     pdf.set_font("Arial", 'B', 16)
     pdf.cell(0, 10, sanitize_text("Z-Score Heatmap"), ln=True)
-    pdf.image(heatmap_path, x=10, y=25, w=180)
+    add_chart(pdf, "heatmap", heatmap_image, x=10, y=25, w=180)
+
+    # Passage hotspots from windowed.window_score_table
+    if window_scores is not None and not window_scores.empty:
+        window_image = cached_chart("windows", window_scores, draw_window_heatmap)
+        pdf.add_page()
+        pdf.set_font("Arial", 'B', 16)
+        pdf.cell(0, 10, sanitize_text("Passage Hotspots"), ln=True)
+        pdf.set_font("Arial", '', 11)
+        pdf.multi_cell(0, 6, sanitize_text(
+            "Each cell scores a sliding window of sentences within the chapter. "
+            "Red cells mark passages below the Dyslexia-Friendly threshold of 55."))
+        height = 180 * window_image['h'] / window_image['w']
+        add_chart(pdf, "windows", window_image, x=10, y=pdf.get_y() + 2, w=180 if height <= 240 else 180 * 240 / height)
 
     pdf.add_page()
     pdf.set_font("Arial", 'B', 16)
     pdf.cell(0, 10, sanitize_text("Chapter Outlier Explanations"), ln=True)
     pdf.set_font("Arial", '', 12)
-    for _, row in outlier_rows.iterrows():
-        chap = row["Chapter"]
-        explanation = []
-        for col in feature_cols:
-            if abs(row[col]) > 2:
-                direction = "high" if row[col] > 0 else "low"
-                explanation.append(f"{direction} {col}")
-        if explanation:
-            feat_list = ", ".join(explanation)
-            impact = "improve" if df.loc[row.name, "Dyslexia-Friendly Score"] > 55 else "reduce"
-            msg = f"Chapter {chap} has outliers in: {feat_list}. These may {impact} the DF Score."
+    for msg in outlier_messages(df, z_scores, outliers):
+        pdf.multi_cell(0, 8, sanitize_text(msg))
+        pdf.ln(1)
+
+    if baseline is not None and baseline.count > 1:
+        catalogue_z, catalogue_outliers = chapter_z_scores(df, baseline)
+        pdf.add_page()
+        pdf.set_font("Arial", 'B', 16)
+        pdf.cell(0, 10, sanitize_text("Catalogue Comparison"), ln=True)
+        pdf.set_font("Arial", '', 12)
+        score_col = baseline.columns.index("Dyslexia-Friendly Score")
+        pdf.multi_cell(0, 8, sanitize_text(
+            f"Compared with {baseline.count} chapters in the catalogue, whose mean DF Score is "
+            f"{baseline.mean[score_col]:.2f} (SD {baseline.std[score_col]:.2f}). This title's mean is {avg_score:.2f}."))
+        pdf.ln(2)
+        messages = outlier_messages(df, catalogue_z, catalogue_outliers)
+        if not messages:
+            messages = ["No chapter is more than 2 standard deviations from the catalogue on any feature."]
+        for msg in messages:
             pdf.multi_cell(0, 8, sanitize_text(msg))
             pdf.ln(1)
 
@@ -143,13 +259,9 @@ def generate_enhanced_report(df, metadata=None, logo_path=None):
     pdf.set_font("Arial", '', 11)
     pdf.multi_cell(0, 8, sanitize_text(appendix_text))
 
-    pdf_output = pdf.output(dest='S').encode('latin1')
+    with stage("report.pdf_output"):
+        pdf_output = pdf.output(dest='S').encode('latin1')
     pdf_buffer = BytesIO()
     pdf_buffer.write(pdf_output)
     pdf_buffer.seek(0)
-
-    for path in [trend_path, heatmap_path]:
-        if os.path.exists(path):
-            os.remove(path)
-
     return pdf_buffer
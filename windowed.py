@@ -0,0 +1,98 @@
+import re
+from collections import deque
+
+import pandas as pd
+from features import FEATURE_TOTALS
+from readability_utils import extract_features, get_sentence_tokenizer, metrics_from_features
+
+PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+DEFAULT_WINDOW = 20
+DEFAULT_STEP = 5
+
+def iter_window_scores(text, window=DEFAULT_WINDOW, step=DEFAULT_STEP, unit="sentences"):
+    # Streams Dyslexia-Friendly Scores over a sliding window of `window`
+    # sentences (or of at least `window` words with unit="words") moving
+    # `step` sentences at a time. Each sentence's feature totals are added to
+    # running sums on entry and subtracted on exit, so the cost is O(text)
+    # and memory O(window) however many windows are produced.
+    if unit not in ("sentences", "words"):
+        raise ValueError(f"unit must be 'sentences' or 'words', not {unit!r}")
+    sums = dict.fromkeys(FEATURE_TOTALS, 0)
+    held = deque()
+    paragraph = 0
+    prev_end = 0
+    index = 0
+    since_emit = 0
+    emitted = False
+
+    def snapshot():
+        first, last = held[0], held[-1]
+        metrics = metrics_from_features(sums, len(held))
+        return {
+            "Window": index,
+            "Start Sentence": first[0],
+            "End Sentence": last[0],
+            "Start Offset": first[1],
+            "End Offset": last[2],
+            "Paragraph": first[3],
+            "Word Count": sums["word_count"],
+            "Dyslexia-Friendly Score": metrics["Dyslexia-Friendly Score"],
+        }
+
+    for number, (start, end) in enumerate(get_sentence_tokenizer().span_tokenize(text)):
+        paragraph += len(PARAGRAPH_BREAK.findall(text, prev_end, start))
+        features = extract_features(text[start:end])
+        held.append((number, start, end, paragraph, features))
+        for key in FEATURE_TOTALS:
+            sums[key] += features[key]
+        paragraph += len(PARAGRAPH_BREAK.findall(text, start, end))
+        prev_end = end
+
+        if unit == "sentences":
+            while len(held) > window:
+                evict(held, sums)
+            full = len(held) == window
+        else:
+            while len(held) > 1 and sums["word_count"] - held[0][4]["word_count"] >= window:
+                evict(held, sums)
+            full = sums["word_count"] >= window
+
+        since_emit += 1
+        if full and (not emitted or since_emit >= step):
+            yield snapshot()
+            index += 1
+            since_emit = 0
+            emitted = True
+
+    # Texts shorter than one window still get a single score, and a tail
+    # shorter than `step` is not dropped.
+    if held and (not emitted or since_emit):
+        yield snapshot()
+
+def evict(held, sums):
+    features = held.popleft()[4]
+    for key in FEATURE_TOTALS:
+        sums[key] -= features[key]
+
+def chapter_window_scores(text, window=DEFAULT_WINDOW, step=DEFAULT_STEP, unit="sentences"):
+    # Just the scores; small enough to send back from a pool worker.
+    return [w["Dyslexia-Friendly Score"] for w in iter_window_scores(text, window, step, unit)]
+
+def window_score_table(chapters, window=DEFAULT_WINDOW, step=DEFAULT_STEP, unit="sentences"):
+    # One row per chapter, one column per window position; chapters with
+    # fewer windows are padded with NaN. Feeds the report's hotspot heatmap.
+    return window_score_frame(
+        (chap_title, chapter_window_scores(chap_text, window, step, unit)) for chap_title, chap_text in chapters
+    )
+
+def window_score_frame(rows):
+    # window_score_table from (chapter title, chapter_window_scores) pairs.
+    # Rows are indexed by (position, title), so chapters sharing a title
+    # each keep their own row.
+    titles = []
+    scores = []
+    for chap_title, chapter_scores in rows:
+        titles.append(chap_title)
+        scores.append(chapter_scores)
+    index = pd.MultiIndex.from_arrays([range(len(titles)), titles], names=["Position", "Chapter"])
+    return pd.DataFrame(scores, index=index)